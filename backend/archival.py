@@ -0,0 +1,99 @@
+"""
+Фонове архівування історії дзвінків
+Місяці, старші за ARCHIVE_HOT_MONTHS, переносяться з call_history в
+архівні бази (файл на місяць), архіви поза ARCHIVE_RETENTION_MONTHS
+видаляються. Читання історії та пошук охоплюють архіви прозоро.
+Архівування вмикається явно (ARCHIVE_HOT_MONTHS > 0, за замовчуванням 0)
+"""
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+from config import settings
+from storage import StorageService, shift_month
+
+
+# Як часто перевіряти, чи є місяці для архівування (секунд)
+ARCHIVE_INTERVAL = 3600
+
+
+class HistoryArchiver:
+    """
+    Періодичне архівування історії одного сховища (тенанта)
+
+    Власний потік, а не потік запису дзвінків: перенесення місяця триває
+    секунди, а між порціями (ARCHIVE_BATCH_SIZE записів) гаряча база
+    вільна - запис дзвінків лише коротко чекає на блокування. Перший
+    прохід - одразу після запуску, далі раз на ARCHIVE_INTERVAL.
+    """
+
+    def __init__(self, store: StorageService, interval: float = ARCHIVE_INTERVAL):
+        self.storage = store
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last_run: Optional[Dict] = None
+
+    def start(self):
+        """Запустити фоновий потік (якщо архівування увімкнено)"""
+        if not settings.ARCHIVE_HOT_MONTHS or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="history-archiver", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except RuntimeError:
+                pass  # прохід, запущений вручну, ще виконується
+            except Exception as e:
+                print(f"[Archiver] ⚠️ Помилка архівування {self.storage.db_path}: {e}")
+            self._stop.wait(self.interval)
+
+    def run_once(self) -> Dict:
+        """
+        Архівувати місяці поза гарячим розділом та застосувати політику зберігання
+
+        Raises:
+            RuntimeError: якщо прохід уже виконується
+        """
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("Архівування вже виконується")
+        try:
+            current = datetime.now().strftime("%Y-%m")
+            started = time.perf_counter()
+            result = {"started_at": datetime.now().isoformat(), "archived": {}, "deleted": []}
+            if settings.ARCHIVE_HOT_MONTHS:
+                result["archived"] = self.storage.archive_call_history(
+                    shift_month(current, 1 - settings.ARCHIVE_HOT_MONTHS), should_stop=self._stop.is_set
+                )
+            if settings.ARCHIVE_RETENTION_MONTHS:
+                # Політика зберігання не видаляє гарячі місяці
+                keep = max(settings.ARCHIVE_RETENTION_MONTHS, settings.ARCHIVE_HOT_MONTHS)
+                result["deleted"] = self.storage.delete_call_archives(shift_month(current, 1 - keep))
+            result["seconds"] = round(time.perf_counter() - started, 2)
+            self.last_run = result
+            return result
+        finally:
+            self._lock.release()
+
+    @property
+    def threads(self) -> int:
+        """Кількість живих фонових потоків (для оцінки пам'яті тенанта)"""
+        return int(self._thread is not None and self._thread.is_alive())
+
+    def close(self, timeout: Optional[float] = None):
+        """Зупинити потік (прохід завершується після поточної порції)"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": bool(settings.ARCHIVE_HOT_MONTHS),
+            "running": self._lock.locked(),
+            "last_run": self.last_run,
+        }
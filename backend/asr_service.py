@@ -3,11 +3,9 @@ ASR Service - Speech-to-Text для української мови
 Розпізнавання голосу громадян
 """
 import random
-import io
-import tempfile
-import os
-import subprocess
-from typing import Optional
+from typing import Optional, Union
+
+from audio_buffer import AudioBuffer
 
 # Спроба імпорту OpenAI Whisper (рекомендовано для української)
 try:
@@ -22,7 +20,6 @@ except ImportError:
 # Спроба імпорту torch (опціонально)
 try:
     import torch
-    import torchaudio
     TORCH_AVAILABLE = True
     print(f"[ASR] PyTorch {torch.__version__} доступний")
 except ImportError as e:
@@ -121,72 +118,50 @@ class ASRService:
         print("[ASR] transcribe_file: моделі недоступні, демо-режим")
         return self._demo_transcribe()
     
-    def transcribe_bytes(self, audio_bytes: bytes) -> str:
-        """Транскрибування аудіо з байтів"""
+    def transcribe_bytes(self, audio: Union[bytes, AudioBuffer]) -> str:
+        """Транскрибування аудіо з байтів або AudioBuffer"""
         print(f"[ASR] transcribe_bytes викликано")
+        audio = AudioBuffer.coerce(audio)
         
         # Спочатку пробуємо Whisper
         if self.whisper_model is not None:
             print("[ASR] 🎤 Використовую Whisper")
-            return self._transcribe_with_whisper_bytes(audio_bytes)
+            return self._transcribe_with_whisper_bytes(audio)
         
         # Потім Silero
         if self.silero_model is not None:
             print("[ASR] 🎤 Використовую Silero")
-            return self._transcribe_with_silero_bytes(audio_bytes)
+            return self._transcribe_with_silero_bytes(audio)
         
         # Демо-режим
         print("[ASR] ⚠️ Моделі недоступні - демо-режим")
         return self._demo_transcribe()
     
-    def _convert_audio_to_wav(self, audio_bytes: bytes, input_format: str = 'webm') -> str:
-        """Конвертація аудіо у WAV формат"""
-        try:
-            with tempfile.NamedTemporaryFile(suffix=f'.{input_format}', delete=False) as f_in:
-                f_in.write(audio_bytes)
-                input_path = f_in.name
-            
-            output_path = input_path.replace(f'.{input_format}', '.wav')
-            subprocess.run([
-                'ffmpeg', '-y', '-i', input_path,
-                '-ar', '16000', '-ac', '1', '-f', 'wav', output_path
-            ], capture_output=True, check=True)
-            
-            if os.path.exists(input_path):
-                os.remove(input_path)
-            
-            return output_path
-        except Exception as e:
-            print(f"[ASR] Помилка конвертації: {e}")
+    def _decode_audio(self, audio: AudioBuffer) -> Optional[AudioBuffer]:
+        """Декодування у моно PCM 16 кГц (ffmpeg через pipe, без тимчасових файлів)"""
+        pcm = audio.decode(sample_rate=16000)
+        if pcm is None or pcm.nbytes == 0:
+            print(f"[ASR] Помилка конвертації: {audio}")
             return None
+        return pcm
     
-    def _transcribe_with_whisper_bytes(self, audio_bytes: bytes) -> str:
+    def _transcribe_with_whisper_bytes(self, audio: AudioBuffer) -> str:
         """Розпізнавання через Whisper з байтів"""
         try:
-            import numpy as np
-            
-            # Конвертуємо у WAV
-            wav_path = self._convert_audio_to_wav(audio_bytes)
-            if wav_path is None:
+            pcm = self._decode_audio(audio)
+            if pcm is None:
                 return self._demo_transcribe()
             
-            try:
-                # Whisper очікує numpy array або шлях до файлу
-                result = self.whisper_model.transcribe(wav_path, language="Ukrainian")
-                transcript = result["text"].strip()
-                
-                os.remove(wav_path)
-                
-                if transcript:
-                    print(f"[ASR] ✅ Whisper розпізнав: \"{transcript}\"")
-                    return transcript
-                else:
-                    print("[ASR] ⚠️ Whisper повернув порожній результат")
-                    return self._demo_transcribe()
-                    
-            finally:
-                if os.path.exists(wav_path):
-                    os.remove(wav_path)
+            # Whisper приймає float32 масив 16 кГц напряму
+            result = self.whisper_model.transcribe(pcm.as_float32(), language="Ukrainian")
+            transcript = result["text"].strip()
+            
+            if transcript:
+                print(f"[ASR] ✅ Whisper розпізнав: \"{transcript}\"")
+                return transcript
+            else:
+                print("[ASR] ⚠️ Whisper повернув порожній результат")
+                return self._demo_transcribe()
                     
         except Exception as e:
             print(f"[ASR] ❌ Помилка Whisper: {e}")
@@ -205,40 +180,24 @@ class ASRService:
             print(f"[ASR] Помилка Whisper: {e}")
             return self._demo_transcribe()
     
-    def _transcribe_with_silero_bytes(self, audio_bytes: bytes) -> str:
+    def _transcribe_with_silero_bytes(self, audio: AudioBuffer) -> str:
         """Розпізнавання через Silero з байтів"""
         try:
-            import numpy as np
-            
-            # Конвертуємо у WAV
-            wav_path = self._convert_audio_to_wav(audio_bytes)
-            if wav_path is None:
+            pcm = self._decode_audio(audio)
+            if pcm is None:
                 return self._demo_transcribe()
             
-            try:
-                waveform, sample_rate = torchaudio.load(wav_path)
-                
-                if sample_rate != 16000:
-                    resampler = torchaudio.transforms.Resample(sample_rate, 16000)
-                    waveform = resampler(waveform)
-                
-                if waveform.shape[0] > 1:
-                    waveform = waveform.mean(dim=0, keepdim=True)
-                
-                (read_batch, split_into_batches, read_audio, prepare_model_input) = self.utils
-                input_data = prepare_model_input([waveform.squeeze()], device=self.device)
-                output = self.silero_model(input_data)
-                transcript = self.decoder(output[0].cpu())
-                result = transcript.strip()
-                
-                os.remove(wav_path)
-                
-                print(f"[ASR] ✅ Silero розпізнав: \"{result}\"")
-                return result
-                    
-            finally:
-                if os.path.exists(wav_path):
-                    os.remove(wav_path)
+            # torch.from_numpy використовує ту ж пам'ять, що й масив
+            waveform = torch.from_numpy(pcm.as_float32())
+            
+            (read_batch, split_into_batches, read_audio, prepare_model_input) = self.utils
+            input_data = prepare_model_input([waveform], device=self.device)
+            output = self.silero_model(input_data)
+            transcript = self.decoder(output[0].cpu())
+            result = transcript.strip()
+            
+            print(f"[ASR] ✅ Silero розпізнав: \"{result}\"")
+            return result
                     
         except Exception as e:
             print(f"[ASR] ❌ Помилка Silero: {e}")
@@ -275,6 +234,6 @@ def transcribe_audio(audio_path: str) -> str:
     return asr_service.transcribe_file(audio_path)
 
 
-def transcribe_audio_bytes(audio_bytes: bytes) -> str:
-    """Транскрибувати аудіо з байтів"""
-    return asr_service.transcribe_bytes(audio_bytes)
+def transcribe_audio_bytes(audio: Union[bytes, AudioBuffer]) -> str:
+    """Транскрибувати аудіо з байтів або AudioBuffer"""
+    return asr_service.transcribe_bytes(audio)
@@ -0,0 +1,331 @@
+"""
+AudioBuffer - спільне представлення аудіо для ASR, TTS та WebSocket
+Компактна обгортка над memoryview/NumPy без зайвого копіювання даних
+"""
+import struct
+import subprocess
+from typing import Iterator, Optional, Union
+
+# NumPy потрібен лише для перетворення PCM у масиви
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+
+# Формати сирого PCM: назва -> (dtype NumPy, байт на семпл)
+PCM_FORMATS = {
+    "pcm_s16": ("int16", 2),
+    "pcm_f32": ("float32", 4),
+}
+
+# Контейнери/кодеки, які декодуються через ffmpeg
+ENCODED_FORMATS = {"wav", "mp3", "webm", "ogg", "flac"}
+
+BytesLike = Union[bytes, bytearray, memoryview]
+
+
+class AudioBuffer:
+    """
+    Аудіо буфер з метаданими (sample rate, канали, формат)
+
+    Дані зберігаються як memoryview над початковим об'єктом (bytes,
+    bytearray або масив NumPy), тому зрізи та фрагментація не копіюють
+    пам'ять. Перетворення формату виконуються ліниво, лише коли вони
+    справді потрібні (декодування контейнера, кодування у WAV, float32
+    для моделі ASR).
+    """
+
+    __slots__ = ("_view", "_owner", "format", "sample_rate", "channels")
+
+    def __init__(
+        self,
+        data: BytesLike,
+        format: str = "pcm_s16",
+        sample_rate: Optional[int] = None,
+        channels: int = 1,
+        owner=None
+    ):
+        """
+        Args:
+            data: Байти аудіо (без копіювання)
+            format: pcm_s16, pcm_f32 або контейнер (wav, mp3, webm, ogg, flac)
+            sample_rate: Частота дискретизації (для контейнерів може бути невідома)
+            channels: Кількість каналів
+            owner: Об'єкт, що володіє пам'яттю (напр. масив NumPy)
+        """
+        if format not in PCM_FORMATS and format not in ENCODED_FORMATS:
+            raise ValueError(f"Непідтримуваний формат аудіо: {format}")
+
+        view = data if isinstance(data, memoryview) else memoryview(data)
+        if view.format != "B" or view.ndim != 1:
+            view = view.cast("B")
+
+        self._view = view
+        self._owner = owner if owner is not None else data
+        self.format = format
+        self.sample_rate = sample_rate
+        self.channels = channels
+
+    # === Конструктори ===
+
+    @classmethod
+    def from_bytes(
+        cls,
+        data: BytesLike,
+        format: str = "webm",
+        sample_rate: Optional[int] = None,
+        channels: int = 1
+    ) -> "AudioBuffer":
+        """Обгорнути байти без копіювання"""
+        return cls(data, format=format, sample_rate=sample_rate, channels=channels)
+
+    @classmethod
+    def from_array(cls, array, sample_rate: int, channels: int = 1) -> "AudioBuffer":
+        """Обгорнути масив NumPy (int16 або float32) без копіювання"""
+        if array.dtype == np.int16:
+            format = "pcm_s16"
+        elif array.dtype == np.float32:
+            format = "pcm_f32"
+        else:
+            # float64 та інші типи моделей - одне перетворення у float32
+            array = array.astype(np.float32)
+            format = "pcm_f32"
+
+        array = np.ascontiguousarray(array)
+        return cls(memoryview(array).cast("B"), format=format,
+                   sample_rate=sample_rate, channels=channels, owner=array)
+
+    @classmethod
+    def silence(cls, duration: float, sample_rate: int) -> "AudioBuffer":
+        """Тиша заданої тривалості (PCM int16)"""
+        return cls(bytes(int(sample_rate * duration) * 2), format="pcm_s16", sample_rate=sample_rate)
+
+    @classmethod
+    def coerce(cls, audio: Union["AudioBuffer", BytesLike], format: str = "webm") -> "AudioBuffer":
+        """Привести байти або AudioBuffer до AudioBuffer"""
+        if isinstance(audio, AudioBuffer):
+            return audio
+        return cls.from_bytes(audio, format=format)
+
+    # === Властивості ===
+
+    @property
+    def view(self) -> memoryview:
+        """Байтове представлення (без копіювання)"""
+        return self._view
+
+    @property
+    def nbytes(self) -> int:
+        return self._view.nbytes
+
+    def __len__(self) -> int:
+        return self._view.nbytes
+
+    @property
+    def is_pcm(self) -> bool:
+        return self.format in PCM_FORMATS
+
+    @property
+    def sample_width(self) -> int:
+        """Байт на семпл (лише для PCM)"""
+        return PCM_FORMATS[self.format][1]
+
+    @property
+    def num_frames(self) -> int:
+        """Кількість фреймів (лише для PCM)"""
+        return self.nbytes // (self.sample_width * self.channels)
+
+    @property
+    def duration(self) -> float:
+        """Тривалість у секундах (лише для PCM)"""
+        return self.num_frames / self.sample_rate if self.sample_rate else 0.0
+
+    @property
+    def media_type(self) -> str:
+        """MIME тип для HTTP відповіді"""
+        return {
+            "mp3": "audio/mpeg",
+            "webm": "audio/webm",
+            "ogg": "audio/ogg",
+            "flac": "audio/flac",
+        }.get(self.format, "audio/wav")
+
+    @property
+    def extension(self) -> str:
+        return ".wav" if self.is_pcm else f".{self.format}"
+
+    # === Зрізи та фрагменти ===
+
+    def __getitem__(self, key: slice) -> "AudioBuffer":
+        """
+        Зріз без копіювання
+
+        Для PCM індекси задаються у фреймах, для контейнерів - у байтах.
+        """
+        if not isinstance(key, slice):
+            raise TypeError("AudioBuffer підтримує лише зрізи")
+
+        if self.is_pcm:
+            frame_size = self.sample_width * self.channels
+            start, stop, step = key.indices(self.num_frames)
+            if step != 1:
+                raise ValueError("Крок зрізу не підтримується")
+            view = self._view[start * frame_size:stop * frame_size]
+        else:
+            view = self._view[key]
+
+        return AudioBuffer(view, format=self.format, sample_rate=self.sample_rate,
+                           channels=self.channels, owner=self._owner)
+
+    def chunks(self, chunk_size: int) -> Iterator[memoryview]:
+        """Ітерація по байтових фрагментах без копіювання"""
+        for start in range(0, self.nbytes, chunk_size):
+            yield self._view[start:start + chunk_size]
+
+    # === Перетворення формату ===
+
+    def as_array(self):
+        """Масив NumPy поверх буфера (без копіювання, лише для PCM)"""
+        if not self.is_pcm:
+            raise ValueError(f"Формат {self.format} потребує декодування")
+        dtype = PCM_FORMATS[self.format][0]
+        array = np.frombuffer(self._view, dtype=dtype)
+        if self.channels > 1:
+            array = array.reshape(-1, self.channels)
+        return array
+
+    def as_float32(self):
+        """
+        Моно float32 у діапазоні [-1, 1] для моделей ASR
+
+        Для pcm_f32 моно повертається представлення без копіювання,
+        для int16 виконується одне перетворення.
+        """
+        array = self.as_array()
+        if self.channels > 1:
+            array = array.mean(axis=1, dtype=np.float32)
+            if self.format == "pcm_s16":
+                array *= 1.0 / 32768.0
+            return array
+        if self.format == "pcm_f32":
+            return array
+        return np.multiply(array, 1.0 / 32768.0, dtype=np.float32)
+
+    def to_pcm16(self) -> "AudioBuffer":
+        """
+        Конвертація у PCM int16
+
+        Замість ланцюжка clip -> multiply -> astype -> tobytes (чотири
+        нові масиви) використовується один проміжний float32 буфер та
+        запис одразу у результуючий масив int16.
+        """
+        if self.format == "pcm_s16":
+            return self
+        if not self.is_pcm:
+            raise ValueError(f"Формат {self.format} потребує декодування")
+
+        source = self.as_array()
+        scratch = np.clip(source, -1.0, 1.0)
+        out = np.empty(scratch.shape, dtype=np.int16)
+        np.multiply(scratch, 32767, out=out, casting="unsafe")
+        return AudioBuffer.from_array(out, self.sample_rate, self.channels)
+
+    def encode_wav(self) -> "AudioBuffer":
+        """
+        Кодування у WAV контейнер
+
+        Межа кодека: заголовок та PCM дані копіюються один раз у
+        попередньо виділений bytearray (без BytesIO та buffer.read()).
+        """
+        if self.format == "wav":
+            return self
+
+        pcm = self.to_pcm16()
+        data_size = pcm.nbytes
+        block_align = pcm.channels * 2
+
+        out = bytearray(44 + data_size)
+        struct.pack_into(
+            "<4sI4s4sIHHIIHH4sI", out, 0,
+            b"RIFF", 36 + data_size, b"WAVE",
+            b"fmt ", 16, 1, pcm.channels, pcm.sample_rate,
+            pcm.sample_rate * block_align, block_align, 16,
+            b"data", data_size
+        )
+        out[44:] = pcm.view
+        return AudioBuffer(out, format="wav", sample_rate=pcm.sample_rate, channels=pcm.channels)
+
+    def _wav_pcm(self) -> Optional["AudioBuffer"]:
+        """PCM дані WAV файлу як зріз без копіювання (лише 16-bit PCM)"""
+        view = self._view
+        if view.nbytes < 44 or bytes(view[0:4]) != b"RIFF" or bytes(view[8:12]) != b"WAVE":
+            return None
+
+        offset = 12
+        fmt = None
+        while offset + 8 <= view.nbytes:
+            chunk_id = bytes(view[offset:offset + 4])
+            (chunk_size,) = struct.unpack_from("<I", view, offset + 4)
+            body = offset + 8
+            if chunk_id == b"fmt ":
+                fmt = struct.unpack_from("<HHIIHH", view, body)
+            elif chunk_id == b"data" and fmt is not None:
+                audio_format, channels, sample_rate, _, _, bits = fmt
+                if audio_format != 1 or bits != 16:
+                    return None
+                end = min(body + chunk_size, view.nbytes)
+                return AudioBuffer(view[body:end], format="pcm_s16", sample_rate=sample_rate,
+                                   channels=channels, owner=self._owner)
+            offset = body + chunk_size + (chunk_size & 1)
+        return None
+
+    def decode(self, sample_rate: int = 16000) -> Optional["AudioBuffer"]:
+        """
+        Декодування у моно PCM int16 з заданою частотою
+
+        WAV з потрібними параметрами розбирається без копіювання, інші
+        контейнери передаються у ffmpeg через pipe (без тимчасових файлів).
+
+        Returns:
+            AudioBuffer у форматі pcm_s16 або None у разі помилки
+        """
+        if self.is_pcm and self.sample_rate == sample_rate and self.channels == 1:
+            return self.to_pcm16()
+
+        if self.format == "wav":
+            pcm = self._wav_pcm()
+            if pcm is not None and pcm.sample_rate == sample_rate and pcm.channels == 1:
+                return pcm
+
+        source = self.encode_wav() if self.is_pcm else self
+        try:
+            result = subprocess.run([
+                'ffmpeg', '-loglevel', 'error', '-i', 'pipe:0',
+                '-ar', str(sample_rate), '-ac', '1', '-f', 's16le', 'pipe:1'
+            ], input=source.view, capture_output=True, check=True)
+        except Exception as e:
+            print(f"[Audio] Помилка декодування {self.format}: {e}")
+            return None
+
+        return AudioBuffer(result.stdout, format="pcm_s16", sample_rate=sample_rate)
+
+    def tobytes(self) -> bytes:
+        """
+        Байти для API, що вимагають bytes
+
+        Якщо буфер вже повністю покриває об'єкт bytes, копія не створюється.
+        """
+        owner = self._owner
+        if isinstance(owner, bytes) and len(owner) == self.nbytes:
+            return owner
+        return self._view.tobytes()
+
+    def write_to(self, file) -> int:
+        """Записати буфер у файловий об'єкт без проміжної копії"""
+        return file.write(self._view)
+
+    def __repr__(self) -> str:
+        return (f"AudioBuffer(format={self.format}, sample_rate={self.sample_rate}, "
+                f"channels={self.channels}, nbytes={self.nbytes})")
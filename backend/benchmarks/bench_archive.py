@@ -0,0 +1,102 @@
+"""
+Бенчмарк архівування історії по місяцях
+
+Історія рівномірно розподілена на --days днів. Вимірюється:
+- швидкість перенесення старих місяців в архівні бази
+- затримка вставки дзвінка з іншого потоку під час архівування
+  (письменник чекає лише на поточну порцію)
+- читання до і після: перша сторінка (лише гарячий розділ), сторінка
+  за діапазоном в архівному місяці, keyset-обхід через межу розділів,
+  пошук, статистика
+
+Запуск: python benchmarks/bench_archive.py [--rows 1000000] [--days 365] [--hot-months 3]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_history import latency_ms
+from bench_timeseries import fill
+from storage import CallRecordCreate, StorageService, shift_month
+
+
+def read_cases(store: StorageService, start: datetime, hot_start: str) -> dict:
+    archived_day = (start + timedelta(days=40)).isoformat()[:10]
+    boundary = store.get_call_history(limit=1, end=hot_start)[0]
+    return {
+        "перша сторінка": lambda: store.get_call_history(limit=50),
+        "сторінка за добу в архівному місяці": lambda: store.get_call_history(
+            limit=50, start=archived_day, end=archived_day + "T23:59:59"),
+        "сторінка через межу розділів": lambda: store.get_call_history(
+            limit=50, before=(boundary["timestamp"] + "0", "")),
+        "пошук, нові": lambda: store.search_call_history("гарячої води", order="recent"),
+        "пошук за місяць в архіві": lambda: store.search_call_history(
+            "гарячої води", order="recent", start=shift_month(start.isoformat()[:7], 1), end=shift_month(start.isoformat()[:7], 2)),
+        "статистика": store.get_statistics,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--hot-months", type=int, default=3)
+    args = parser.parse_args()
+
+    start = datetime.now() - timedelta(days=args.days)
+    hot_start = shift_month(datetime.now().strftime("%Y-%m"), 1 - args.hot_months)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "archive.db")
+        store = StorageService(path)
+        fill(store, args.rows, start, args.days)
+        size_before = os.path.getsize(path)
+
+        before = {label: latency_ms(case) for label, case in read_cases(store, start, hot_start).items()}
+        stats_before = store.get_statistics()
+
+        # Живий трафік під час архівування: вставка раз на 10 мс з іншого потоку
+        latencies, stop = [], threading.Event()
+
+        def traffic():
+            while not stop.is_set():
+                started = time.perf_counter()
+                store.create_call_record(CallRecordCreate(transcript="Немає світла", status="resolved"))
+                latencies.append((time.perf_counter() - started) * 1000)
+                time.sleep(0.01)
+
+        writer = threading.Thread(target=traffic)
+        writer.start()
+        started = time.perf_counter()
+        moved = store.archive_call_history(hot_start)
+        elapsed = time.perf_counter() - started
+        stop.set()
+        writer.join()
+
+        after = {label: latency_ms(case) for label, case in read_cases(store, start, hot_start).items()}
+        assert store.get_statistics()["total_calls"] == stats_before["total_calls"] + len(latencies)
+
+        total = sum(moved.values())
+        hot = store.get_calls_count() - total
+        print(f"\nАрхівування: {total} записів за {len(moved)} місяців, {elapsed:.1f} с ({total / elapsed:.0f} записів/с)")
+        print(f"Гаряча таблиця: {hot} записів; архіви: "
+              f"{sum(archive['size_bytes'] for archive in store.get_call_archives()) / 1024 / 1024:.0f} MB, "
+              f"база до архівування {size_before / 1024 / 1024:.0f} MB")
+        latencies.sort()
+        print(f"Вставка під час архівування ({len(latencies)}): медіана {latencies[len(latencies) // 2]:.2f} мс, "
+              f"макс. {latencies[-1]:.1f} мс")
+
+        print(f"\n{'Запит, мс':<40}{'до':>10}{'після':>10}")
+        for label in before:
+            print(f"{label:<40}{before[label]:>10.2f}{after[label]:>10.2f}")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
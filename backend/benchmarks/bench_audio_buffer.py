@@ -0,0 +1,125 @@
+"""
+Бенчмарк алокацій аудіо: bytes-шлях vs AudioBuffer
+
+Порівнює пікові тимчасові алокації (tracemalloc) та час типових операцій:
+- кодування відповіді Fish Speech (float -> WAV)
+- фрагментація відповіді для WebSocket
+- підготовка WAV 16 кГц для моделі ASR
+
+Запуск: python benchmarks/bench_audio_buffer.py [--seconds 10]
+"""
+import argparse
+import io
+import os
+import sys
+import time
+import tracemalloc
+import wave
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from audio_buffer import AudioBuffer
+
+
+# === Старий шлях (як у tts_service/asr_service до AudioBuffer) ===
+
+def legacy_float_to_wav(audio: np.ndarray) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(44100)
+        audio_normalized = np.clip(audio, -1.0, 1.0)
+        audio_int16 = (audio_normalized * 32767).astype(np.int16)
+        wav_file.writeframes(audio_int16.tobytes())
+    buffer.seek(0)
+    return buffer.read()
+
+
+def legacy_chunks(audio_bytes: bytes, chunk_size: int) -> int:
+    total = 0
+    for start in range(0, len(audio_bytes), chunk_size):
+        total += len(audio_bytes[start:start + chunk_size])
+    return total
+
+
+def legacy_wav_to_float(wav_bytes: bytes) -> np.ndarray:
+    with wave.open(io.BytesIO(wav_bytes), 'rb') as wav_file:
+        frames = wav_file.readframes(wav_file.getnframes())
+    return np.frombuffer(frames, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+# === Новий шлях ===
+
+def buffer_float_to_wav(audio: np.ndarray) -> AudioBuffer:
+    return AudioBuffer.from_array(audio, sample_rate=44100).encode_wav()
+
+
+def buffer_chunks(audio: AudioBuffer, chunk_size: int) -> int:
+    total = 0
+    for chunk in audio.chunks(chunk_size):
+        total += chunk.nbytes
+    return total
+
+
+def buffer_wav_to_float(wav: AudioBuffer) -> np.ndarray:
+    return wav.decode(sample_rate=16000).as_float32()
+
+
+def measure(func, *args, repeat: int = 20):
+    """
+    Returns:
+        (пікові тимчасові алокації понад результат у байтах, середній час у мс)
+    """
+    tracemalloc.start()
+    result = func(*args)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func(*args)
+    elapsed_ms = (time.perf_counter() - started) * 1000 / repeat
+
+    return peak - retained, elapsed_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seconds", type=float, default=10.0, help="Тривалість тестового аудіо")
+    parser.add_argument("--chunk-size", type=int, default=16384)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    tts_audio = rng.uniform(-1.2, 1.2, int(44100 * args.seconds)).astype(np.float32)
+    asr_pcm = rng.integers(-20000, 20000, int(16000 * args.seconds), dtype=np.int16)
+    asr_wav = AudioBuffer.from_array(asr_pcm, sample_rate=16000).encode_wav()
+    asr_wav_bytes = asr_wav.tobytes()
+
+    legacy_wav = legacy_float_to_wav(tts_audio)
+    new_wav = buffer_float_to_wav(tts_audio)
+    assert legacy_wav == new_wav.tobytes(), "WAV результати відрізняються"
+
+    cases = [
+        ("TTS float -> WAV", (legacy_float_to_wav, tts_audio), (buffer_float_to_wav, tts_audio)),
+        ("WebSocket фрагменти", (legacy_chunks, legacy_wav, args.chunk_size),
+         (buffer_chunks, new_wav, args.chunk_size)),
+        ("ASR WAV -> float32", (legacy_wav_to_float, asr_wav_bytes), (buffer_wav_to_float, asr_wav)),
+    ]
+
+    print(f"Аудіо: {args.seconds:.1f} с\n")
+    print("Тимчасові алокації понад результат (МБ) та час (мс)")
+    print(f"{'Операція':<24}{'bytes МБ':>10}{'AB МБ':>8}{'bytes мс':>10}{'AB мс':>8}")
+    mb = 1024 * 1024
+    for name, legacy, new in cases:
+        legacy_extra, legacy_ms = measure(*legacy)
+        new_extra, new_ms = measure(*new)
+        print(f"{name:<24}{legacy_extra / mb:>10.2f}{new_extra / mb:>8.2f}"
+              f"{legacy_ms:>10.2f}{new_ms:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
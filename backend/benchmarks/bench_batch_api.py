@@ -0,0 +1,81 @@
+"""
+Бенчмарк пакетної класифікації: цикл /api/classify vs /api/classify/batch
+
+Обидва варіанти проходять повний HTTP-стек FastAPI (TestClient):
+аутентифікацію, серіалізацію та класифікацію. Rate limit вимкнено,
+щоб цикл поодиноких запитів не впирався в ліміт.
+
+Запуск: python benchmarks/bench_batch_api.py [--categories 1000] [--queries 2000]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+import main_fixed
+from classifier import ClassifierSnapshot
+from bench_classifier import generate_categories, generate_queries
+
+
+AUTH = ("bench", "bench")
+
+
+def single_requests(client: TestClient, queries) -> list:
+    results = []
+    for query in queries:
+        response = client.post("/api/classify", json={"text": query}, auth=AUTH)
+        results.append(response.json()["classification"]["id"])
+    return results
+
+
+def batch_request(client: TestClient, queries, ndjson: bool = False) -> list:
+    if ndjson:
+        body = "\n".join(json.dumps(query, ensure_ascii=False) for query in queries)
+        response = client.post("/api/classify/batch", content=body.encode("utf-8"), auth=AUTH,
+                               headers={"Content-Type": "application/x-ndjson"})
+    else:
+        response = client.post("/api/classify/batch", json={"queries": queries}, auth=AUTH)
+    return [json.loads(line)["classification"]["id"] for line in response.text.splitlines()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--categories", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    main_fixed.check_rate_limit = lambda *_, **__: True
+    with main_fixed.classifier._lock:
+        main_fixed.classifier._publish(ClassifierSnapshot.compile(generate_categories(args.categories)))
+    queries = generate_queries(main_fixed.classifier.data, args.queries)
+
+    client = TestClient(main_fixed.app)
+    batch_request(client, queries[:10])  # прогрів (побудова TF-IDF)
+
+    cases = [
+        ("цикл /api/classify", lambda: single_requests(client, queries)),
+        ("batch JSON", lambda: batch_request(client, queries)),
+        ("batch NDJSON", lambda: batch_request(client, queries, ndjson=True)),
+    ]
+
+    print(f"{args.categories} категорій, {args.queries} запитів\n")
+    print(f"{'Режим':<22}{'q/s':>10}{'Прискорення':>13}")
+    reference, base_qps = None, None
+    for name, func in cases:
+        started = time.perf_counter()
+        ids = func()
+        qps = len(queries) / (time.perf_counter() - started)
+
+        if reference is None:
+            reference, base_qps = ids, qps
+        assert ids == reference, f"{name}: результати відрізняються від поодиноких запитів"
+        print(f"{name:<22}{qps:>10.0f}{qps / base_qps:>12.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Бенчмарк запису історії дзвінків: INSERT + COMMIT на запис vs CallRecordWriter
+
+Вимірюється пропускна здатність запису з кількох потоків (як паралельні
+WebSocket-сесії):
+- direct: storage.create_call_record - транзакція на кожен запис
+- writer: CallRecordWriter - групова фіксація, виклик не чекає запису
+- durable: CallRecordWriter з durable=True - виклик чекає фіксації пакета
+
+Запуск: python benchmarks/bench_call_writer.py [--records 20000] [--threads 8] [--synchronous NORMAL]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import settings
+from call_writer import CallRecordWriter
+from storage import CallRecordCreate, StorageService
+
+
+def make_record(i: int) -> CallRecordCreate:
+    return CallRecordCreate(
+        transcript=f"Немає гарячої води, вулиця Шевченка {i}",
+        classification={"id": "class-5", "problem": "Інженерні мережі", "confidence": 0.8},
+        status="resolved" if i % 5 else "escalated",
+        response_text="Заявку прийнято. Бригада виїде протягом 2 годин.",
+        executor="Служба водопостачання"
+    )
+
+
+def parallel(records: int, threads: int, write) -> float:
+    """Записати records записів з threads потоків, повернути записів/с"""
+    per_thread = records // threads
+
+    def worker(slot: int):
+        for i in range(per_thread):
+            write(make_record(slot * per_thread + i))
+
+    workers = [threading.Thread(target=worker, args=(slot,)) for slot in range(threads)]
+    started = time.perf_counter()
+    for worker_thread in workers:
+        worker_thread.start()
+    for worker_thread in workers:
+        worker_thread.join()
+    return per_thread * threads / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--synchronous", default=settings.SQLITE_SYNCHRONOUS, help="NORMAL або FULL")
+    args = parser.parse_args()
+    settings.SQLITE_SYNCHRONOUS = args.synchronous
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        store = StorageService(os.path.join(tmp, "direct.db"))
+        results["direct"] = parallel(args.records, args.threads, store.create_call_record)
+        store.close()
+
+        store = StorageService(os.path.join(tmp, "writer.db"))
+        writer = CallRecordWriter(store)
+        started = time.perf_counter()
+        parallel(args.records, args.threads, writer.submit)
+        writer.close()  # включно з дописуванням буфера
+        results["writer"] = args.records // args.threads * args.threads / (time.perf_counter() - started)
+        writer_stats = writer.stats()
+        store.close()
+
+        store = StorageService(os.path.join(tmp, "durable.db"))
+        writer = CallRecordWriter(store)
+        results["durable"] = parallel(args.records, args.threads,
+                                      lambda record: writer.submit(record, durable=True).result())
+        writer.close()
+        durable_stats = writer.stats()
+        store.close()
+
+    labels = {
+        "direct": "транзакція на запис",
+        "writer": "CallRecordWriter",
+        "durable": "CallRecordWriter, durable",
+    }
+    print(f"\nsynchronous={args.synchronous}, {args.threads} потоків, {args.records} записів")
+    print(f"{'Режим':<32}{'записів/с':>12}{'Прискорення':>13}")
+    for key, label in labels.items():
+        print(f"{label:<32}{results[key]:>12.0f}{results[key] / results['direct']:>12.1f}x")
+    print(f"\nСередній пакет: {writer_stats['avg_batch']} (durable: {durable_stats['avg_batch']})")
+
+
+if __name__ == "__main__":
+    main()
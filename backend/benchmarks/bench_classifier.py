@@ -0,0 +1,156 @@
+"""
+Бенчмарк класифікатора: лінійний перебір категорій vs індекс Ахо-Корасік
+
+Генерує синтетичний довідник (резервні категорії + згенеровані),
+перевіряє, що оцінки індексу (разом з нечіткими збігами ключових слів)
+точно збігаються з `_calculate_score`, та вимірює пропускну здатність на
+різній кількості категорій. Лінійний перебір з нечітким пошуком дуже
+повільний, тому він вимірюється на перших --verify запитах. Індекс
+кешує нечіткі збіги слів, тому його пропускна здатність вимірюється
+двічі: для "прогрітого" словника запитів та "холодна" - з очищеним
+кешем слів перед кожним запитом (кожне слово запиту нове).
+
+Запуск: python benchmarks/bench_classifier.py [--sizes 12,1000,10000] [--verify 20] [--fuzzy-weight 0.1]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import settings
+from classifier import FALLBACK_CLASSIFIER_DATA, QueryClassifier
+
+
+SYLLABLES = ["ба", "ве", "ги", "до", "же", "зу", "ко", "ла", "ми", "но", "пе", "ри",
+             "са", "ту", "фе", "хо", "ці", "че", "ша", "ю", "яр", "ін", "ов", "ен"]
+
+QUERIES = [
+    "Доброго дня, у нас немає опалення вже другий день",
+    "На мою машину впало дерево, потрібна допомога",
+    "Протікає стеля у квартирі, вода капає",
+    "Коли відключатимуть світло в нашому районі",
+    "Немає холодної води в будинку з самого ранку",
+    "У нас на території не прибрали сніг",
+    "Хочу поскаржитися на водія маршрутки",
+    "На дорозі величезна яма",
+    "Застряг ліфт у під'їзді, кабіна не рухається",
+    "Сміття не вивозять тиждень, контейнер переповнений",
+]
+
+
+def _word(rng: random.Random) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+
+
+def generate_categories(count: int, seed: int = 42):
+    """Резервні категорії плюс синтетичні до заданої кількості"""
+    rng = random.Random(seed)
+    items = [dict(item) for item in FALLBACK_CLASSIFIER_DATA[:count]]
+
+    for idx in range(len(items), count):
+        items.append({
+            "id": f"synthetic-{idx}",
+            "problem": f"Синтетична проблема {idx % 50}",
+            "type": " ".join(_word(rng) for _ in range(3)),
+            "subtype": " ".join(_word(rng) for _ in range(2)),
+            "location": None,
+            "response": "Заявку прийнято.",
+            "executor": "Синтетична служба",
+            "urgency": "standard",
+            "response_time": 24,
+            "keywords": [_word(rng) for _ in range(rng.randint(4, 10))],
+        })
+    return items
+
+
+def generate_queries(items, count: int, seed: int = 7):
+    """Реальні запити та запити зі словами випадкових категорій"""
+    rng = random.Random(seed)
+    queries = list(QUERIES)
+    while len(queries) < count:
+        item = rng.choice(items)
+        words = rng.sample(item["keywords"], min(2, len(item["keywords"])))
+        queries.append(f"{rng.choice(QUERIES)} {' '.join(words)}")
+    return queries[:count]
+
+
+def linear_classify(classifier: QueryClassifier, query: str):
+    """Вихідний алгоритм: перебір усіх категорій (рівні оцінки - перша в довіднику)"""
+    best_match, highest_score = None, 0.0
+    for item in classifier.snapshot.source_items():
+        score = classifier._calculate_score(query, item)
+        if score > highest_score:
+            highest_score, best_match = score, item
+    return best_match, highest_score
+
+
+def indexed_classify(classifier: QueryClassifier, query: str):
+    return classifier.snapshot.best_match(query)
+
+
+def cold_classify(classifier: QueryClassifier, query: str):
+    """Класифікація без кешу нечітких збігів слів"""
+    snapshot = classifier.snapshot
+    for index in (snapshot.base, snapshot.delta):
+        if index._fuzzy is not None:
+            index._fuzzy._token_cache.clear()
+    return snapshot.best_match(query)
+
+
+def verify(classifier: QueryClassifier, queries):
+    """Оцінки індексу мають точно збігатися з _calculate_score"""
+    for query in queries:
+        expected = {
+            idx: score for idx, item in enumerate(classifier.data)
+            if (score := classifier._calculate_score(query, item)) > 0
+        }
+        actual = classifier.snapshot.scores(query)
+        assert actual == expected, f"Розбіжність оцінок для запиту: {query}"
+        assert linear_classify(classifier, query) == indexed_classify(classifier, query)
+
+
+def throughput(func, classifier, queries, min_seconds: float = 0.5) -> float:
+    done = 0
+    started = time.perf_counter()
+    while True:
+        for query in queries:
+            func(classifier, query)
+        done += len(queries)
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_seconds:
+            return done / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="12,1000,10000", help="Кількість категорій через кому")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--verify", type=int, default=20, help="Запитів для перевірки та лінійного перебору")
+    parser.add_argument("--fuzzy-weight", type=float, default=0.1,
+                        help="FUZZY_KEYWORD_WEIGHT (за замовчуванням у сервісі 0 - нечіткий пошук вимкнено)")
+    args = parser.parse_args()
+    settings.FUZZY_KEYWORD_WEIGHT = args.fuzzy_weight
+
+    print(f"{'Категорій':>10}{'Шаблонів':>10}{'Компіляція мс':>15}{'Лінійно q/s':>14}{'Індекс q/s':>13}{'Холодний q/s':>15}{'Прискорення':>13}")
+    for size in (int(value) for value in args.sizes.split(",")):
+        items = generate_categories(size)
+        queries = generate_queries(items, args.queries)
+
+        started = time.perf_counter()
+        classifier = QueryClassifier(items)
+        compile_ms = (time.perf_counter() - started) * 1000
+
+        verify(classifier, queries[:args.verify])
+
+        linear_qps = throughput(linear_classify, classifier, queries[:args.verify])
+        indexed_qps = throughput(indexed_classify, classifier, queries)
+        cold_qps = throughput(cold_classify, classifier, queries)
+        print(f"{size:>10}{classifier.snapshot.base.patterns_count:>10}{compile_ms:>15.1f}"
+              f"{linear_qps:>14.0f}{indexed_qps:>13.0f}{cold_qps:>15.0f}{indexed_qps / linear_qps:>12.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Бенчмарк потокового експорту історії (NDJSON, CSV, Parquet)
+
+Для кожного розміру таблиці вимірюється швидкість експорту (записів/с,
+MB/с) та пік пам'яті Python (tracemalloc, окремий прохід). Для
+порівняння - експорт "списком": усі записи словниками в пам'яті та
+один json.dumps, як зробив би ендпоінт без курсора. Частина історії
+переноситься в архіви, тож експорт проходить і через злиття розділів.
+
+Запуск: python benchmarks/bench_export.py [--rows 100000,1000000] [--days 365]
+Parquet - лише якщо встановлено pyarrow
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_timeseries import fill
+from history_export import PYARROW_AVAILABLE, export_chunks
+from storage import StorageService, shift_month
+
+
+def export_list(store: StorageService) -> int:
+    """Експорт без курсора: уся історія словниками, потім один документ"""
+    with store._connection() as conn:
+        rows = conn.execute(f"SELECT {', '.join(store.HISTORY_COLUMNS)} FROM call_history ORDER BY timestamp, id").fetchall()
+    records = [dict(zip(store.HISTORY_COLUMNS, row), classification=json.loads(row[4] or "{}")) for row in rows]
+    return len(json.dumps(records, ensure_ascii=False).encode("utf-8"))
+
+
+def export_stream(store: StorageService, export_format: str) -> int:
+    return sum(len(chunk) for chunk in export_chunks(export_format, store.export_call_history()))
+
+
+def measure(func) -> tuple:
+    """(секунд, байт результату, пік пам'яті MB)"""
+    started = time.perf_counter()
+    size = func()
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, size, peak / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", default="100000,1000000", help="розміри таблиці через кому")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--hot-months", type=int, default=3)
+    args = parser.parse_args()
+
+    formats = ["ndjson", "csv"] + (["parquet"] if PYARROW_AVAILABLE else [])
+    start = datetime.now() - timedelta(days=args.days)
+    hot_start = shift_month(datetime.now().strftime("%Y-%m"), 1 - args.hot_months)
+
+    for count in (int(value) for value in args.rows.split(",")):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = StorageService(os.path.join(tmp, "export.db"))
+            fill(store, count, start, args.days)
+
+            print(f"\nЕкспорт {count} записів (гаряча таблиця, без архівів)")
+            print(f"{'Формат':<16}{'записів/с':>12}{'MB/с':>10}{'MB':>10}{'пік пам., MB':>16}")
+            cases = [("список JSON", lambda: export_list(store))]
+            cases += [(export_format, lambda export_format=export_format: export_stream(store, export_format))
+                      for export_format in formats]
+            for label, func in cases:
+                elapsed, size, peak = measure(func)
+                print(f"{label:<16}{count / elapsed:>12.0f}{size / 1024 / 1024 / elapsed:>10.1f}"
+                      f"{size / 1024 / 1024:>10.1f}{peak:>16.1f}")
+
+            store.archive_call_history(hot_start)
+            archived = sum(archive["rows"] for archive in store.get_call_archives())
+            print(f"Після архівування ({archived} записів в архівах)")
+            for export_format in formats:
+                elapsed, size, peak = measure(lambda: export_stream(store, export_format))
+                print(f"{export_format:<16}{count / elapsed:>12.0f}{size / 1024 / 1024 / elapsed:>10.1f}"
+                      f"{size / 1024 / 1024:>10.1f}{peak:>16.1f}")
+            store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Бенчмарк історії дзвінків на великій таблиці
+
+Вимірюється:
+- вставка з uuid4 vs uuid7 первинними ключами (таблиця вже заповнена)
+- сторінка історії на різній глибині: LIMIT/OFFSET vs keyset (before)
+- лічильник за статусом, сторінки за номером абонента та полями
+  класифікації: індекс vs повний перегляд таблиці (NOT INDEXED, для
+  полів класифікації - json_extract з JSON)
+
+Запуск: python benchmarks/bench_history.py [--rows 1000000] [--db /tmp/history.db]
+Для 10M записів: --rows 10000000 (заповнення займає кілька хвилин і ~4 GB диска)
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import StorageService, uuid7
+
+FILL_BATCH = 50000
+CLASSIFICATIONS = [
+    json.dumps({"id": f"class-{i}", "problem": "Інженерні мережі", "urgency": urgency, "confidence": 0.5 + i / 40},
+               ensure_ascii=False)
+    for i, urgency in enumerate(["emergency", "short", "standard", "info"] * 5)
+]
+EXECUTORS = ["Служба водопостачання", "Служба теплопостачання", "Аварійна служба", "Оператор"]
+
+
+def rows(count: int, start: datetime, id_factory):
+    """Записи з часом, що зростає (як реальний потік дзвінків)"""
+    for i in range(count):
+        timestamp = (start + timedelta(seconds=i)).isoformat()
+        yield (
+            id_factory(), timestamp, f"+38050{random.randrange(10000):04d}", f"Немає гарячої води, будинок {i}",
+            CLASSIFICATIONS[i % len(CLASSIFICATIONS)], "escalated" if i % 5 == 0 else "resolved", "Заявку прийнято.",
+            EXECUTORS[i % 7 % len(EXECUTORS)], 0, timestamp
+        )
+
+
+def fill(store: StorageService, count: int, start: datetime, id_factory) -> float:
+    """Вставка пакетами по FILL_BATCH, повертає записів/с"""
+    generator = rows(count, start, id_factory)
+    started = time.perf_counter()
+    for _ in range(0, count, FILL_BATCH):
+        batch = [row for _, row in zip(range(FILL_BATCH), generator)]
+        with store._connection() as conn:
+            conn.executemany(store._INSERT_CALL_RECORD, batch)
+    return count / (time.perf_counter() - started)
+
+
+def latency_ms(func, repeat: int = 20) -> float:
+    """Медіана часу виклику, мс"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return sorted(samples)[len(samples) // 2]
+
+
+def bench_ids(tmp: str, rows_count: int, tail: int) -> dict:
+    """Вставка tail записів у таблицю з rows_count записами"""
+    results = {}
+    start = datetime(2025, 1, 1)
+    for name, factory in (("uuid4", lambda: str(uuid.uuid4())), ("uuid7", uuid7)):
+        store = StorageService(os.path.join(tmp, f"{name}.db"))
+        fill(store, rows_count, start, factory)
+        results[name] = fill(store, tail, start + timedelta(seconds=rows_count), factory)
+        store.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--tail", type=int, default=200000, help="вставка поверх заповненої таблиці")
+    parser.add_argument("--db", default=None, help="файл бази (за замовчуванням - тимчасовий)")
+    parser.add_argument("--skip-ids", action="store_true", help="не порівнювати uuid4/uuid7")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = StorageService(args.db or os.path.join(tmp, "history.db"))
+        existing = store.get_calls_count()
+        if existing < args.rows:
+            print(f"Заповнення: {args.rows - existing} записів...")
+            fill(store, args.rows - existing, datetime(2025, 1, 1) + timedelta(seconds=existing), uuid7)
+        total = store.get_calls_count()
+
+        print(f"\nСторінка історії (50 записів), {total} записів у таблиці, мс")
+        print(f"{'Глибина':>12}{'OFFSET':>12}{'keyset':>12}")
+        for fraction in (0, 0.01, 0.1, 0.5, 0.9):
+            depth = int(total * fraction)
+            with store._connection() as conn:
+                cursor = conn.execute(
+                    "SELECT timestamp, id FROM call_history ORDER BY timestamp DESC, id DESC LIMIT 1 OFFSET ?",
+                    (max(depth - 1, 0),)
+                ).fetchone()
+            offset_ms = latency_ms(lambda: store.get_call_history(limit=50, offset=depth), repeat=5)
+            keyset_ms = latency_ms(lambda: store.get_call_history(limit=50, before=tuple(cursor) if depth else None))
+            print(f"{depth:>12}{offset_ms:>12.2f}{keyset_ms:>12.2f}")
+
+        def scan(sql: str, params: tuple):
+            with store._connection() as conn:
+                return conn.execute(sql, params).fetchall()
+
+        phone = scan("SELECT caller_phone FROM call_history LIMIT 1", ())[0][0]
+        print(f"\n{'Запит, мс':<40}{'без індексу':>14}{'з індексом':>12}")
+        cases = {
+            "COUNT за статусом": (
+                "SELECT COUNT(*) FROM call_history NOT INDEXED WHERE status = ?", ("escalated",),
+                lambda: store.get_calls_count(status="escalated")
+            ),
+            "сторінка за номером абонента": (
+                "SELECT * FROM call_history NOT INDEXED WHERE caller_phone = ? ORDER BY timestamp DESC, id DESC LIMIT 50", (phone,),
+                lambda: store.get_call_history(limit=50, caller_phone=phone)
+            ),
+            "сторінка emergency (поле класифікації)": (
+                "SELECT * FROM call_history NOT INDEXED WHERE json_extract(classification, '$.urgency') = ? "
+                "ORDER BY timestamp DESC, id DESC LIMIT 50", ("emergency",),
+                lambda: store.get_call_history(limit=50, urgency="emergency")
+            ),
+            "сторінка категорії + виконавця": (
+                "SELECT * FROM call_history NOT INDEXED WHERE json_extract(classification, '$.id') = ? AND executor = ? "
+                "ORDER BY timestamp DESC, id DESC LIMIT 50", ("class-7", EXECUTORS[0]),
+                lambda: store.get_call_history(limit=50, category="class-7", executor=EXECUTORS[0])
+            ),
+            "сторінка escalated (keyset)": (
+                "SELECT * FROM call_history NOT INDEXED WHERE status = ? ORDER BY timestamp DESC, id DESC LIMIT 50", ("escalated",),
+                lambda: store.get_call_history(limit=50, status="escalated")
+            ),
+        }
+        for label, (sql, params, indexed) in cases.items():
+            print(f"{label:<40}{latency_ms(lambda: scan(sql, params), repeat=3):>14.2f}{latency_ms(indexed):>12.2f}")
+        store.close()
+
+        if not args.skip_ids:
+            print(f"\nВставка {args.tail} записів поверх {args.rows}, записів/с")
+            ids = bench_ids(tmp, args.rows, args.tail)
+            print(f"uuid4: {ids['uuid4']:.0f}, uuid7: {ids['uuid7']:.0f} ({ids['uuid7'] / ids['uuid4']:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
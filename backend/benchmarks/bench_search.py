@@ -0,0 +1,108 @@
+"""
+Бенчмарк повнотекстового пошуку в історії (FTS5)
+
+Транскрипти складаються з шаблонів звернень зі змінними вулицями,
+об'єктами та словоформами, тож частоти слів різні: від рідкісних фраз
+до слів, що є в кожному п'ятому записі. Для порівняння - пошук LIKE
+(повний перегляд, як грепання історії).
+Корпус навмисно щільний: "вулиця" є майже в кожному записі - це гірший
+випадок для ранжування.
+
+Запуск: python benchmarks/bench_search.py [--rows 2000000] [--db /tmp/search.db]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_history import FILL_BATCH, latency_ms
+from storage import StorageService, uuid7
+
+TEMPLATES = [
+    "На вулиці {street} {obj} впало на {target}, потрібна допомога",
+    "Немає {utility} у будинку на вулиці {street} вже {hours} години",
+    "Прорвало трубу біля {target}, вода заливає {street}",
+    "Сусіди з підвалу скаржаться на запах, будинок {number} по {street}",
+    "Не працює ліфт у під'їзді {number}, вулиця {street}",
+    "Яма на дорозі біля {target} на {street}, пошкоджено {obj}",
+]
+VALUES = {
+    "street": ["Шевченка", "Хрещатику", "Соборній", "Січових Стрільців", "Лесі Українки", "Володимирській",
+               "Антоновича", "Гончара", "Богдана Хмельницького", "Саксаганського"] + [f"Садовій {i}" for i in range(200)],
+    "obj": ["дерево", "дерева", "стовп", "рекламний щит", "гілка", "паркан", "бордюр"],
+    "target": ["машину", "машини", "автомобіль", "зупинку", "школи", "дитячий майданчик", "гаражі"],
+    "utility": ["гарячої води", "холодної води", "опалення", "світла", "газу"],
+    "hours": ["дві", "три", "чотири", "п'ять"],
+    "number": [str(i) for i in range(1, 300)],
+}
+RESPONSES = ["Заявку прийнято. Бригада виїде протягом 2 годин.", "Передано аварійній службі.",
+             "Звернення зареєстровано, очікуйте на дзвінок диспетчера."]
+
+QUERIES = [
+    ("точна фраза", "дерево впало на дитячий майданчик", {"phrase": True}),
+    ("слова, словоформи, bm25", "дерево впало на машину", {}),
+    ("слова, словоформи, нові", "дерево впало на машину", {"order": "recent"}),
+    ("часте слово, bm25", "вулиця", {}),
+    ("часте слово, нові", "вулиця", {"order": "recent"}),
+    ("два слова, bm25", "немає опалення", {}),
+    ("апостроф", "п'ять годин", {}),
+    ("з діапазоном часу", "прорвало трубу", {"start": "2025-06-01", "end": "2025-07-01"}),
+]
+
+
+def fill(store: StorageService, count: int) -> float:
+    started_at = datetime(2025, 1, 1)
+    started = time.perf_counter()
+    for offset in range(0, count, FILL_BATCH):
+        batch = []
+        for i in range(offset, min(offset + FILL_BATCH, count)):
+            template = random.choice(TEMPLATES)
+            transcript = template.format(**{key: random.choice(values) for key, values in VALUES.items()})
+            timestamp = (started_at + timedelta(seconds=i * 15)).isoformat()
+            batch.append((uuid7(), timestamp, None, transcript, "{}", "resolved", random.choice(RESPONSES),
+                          "Аварійна служба", 0, timestamp))
+        with store._connection() as conn:
+            conn.executemany(store._INSERT_CALL_RECORD, batch)
+    return count / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=2000000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--db", default=None, help="файл бази (повторні запуски без заповнення)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = StorageService(args.db or os.path.join(tmp, "search.db"))
+        existing = store.get_calls_count()
+        insert_rate = fill(store, args.rows - existing) if existing < args.rows else None
+
+        print(f"\nПошук, {args.rows} записів, сторінка {args.limit}, мс (медіана)")
+        print(f"{'Запит':<28}{'мс':>10}{'знайдено':>10}")
+        for label, query, options in QUERIES:
+            results = store.search_call_history(query, limit=args.limit, **options)
+            elapsed = latency_ms(lambda: store.search_call_history(query, limit=args.limit, **options))
+            print(f"{label:<28}{elapsed:>10.2f}{len(results):>10}")
+
+        def like():
+            with store._connection() as conn:
+                return conn.execute(
+                    "SELECT id FROM call_history WHERE transcript LIKE ? LIMIT ?",
+                    ("%дерево впало на дитячий майданчик%", args.limit)
+                ).fetchall()
+
+        print(f"{'LIKE (точна фраза)':<28}{latency_ms(like, repeat=3):>10.2f}{len(like()):>10}")
+        store.close()
+
+    if insert_rate:
+        print(f"\nВставка з тригерами FTS: {insert_rate:.0f} записів/с")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Бенчмарк статистики: агрегація всієї історії vs лічильники call_stats
+
+"До" - попередній get_statistics: три COUNT(*) та AVG(duration_seconds)
+по call_history на кожен запит. "Після" - читання лічильників, які
+тригери оновлюють у транзакції вставки. Також вимірюється ціна тригерів
+для вставки.
+
+Запуск: python benchmarks/bench_statistics.py [--rows 1000000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_history import fill, latency_ms
+from storage import StorageService, uuid7
+
+
+def aggregate_statistics(store: StorageService) -> dict:
+    """Попередня реалізація get_statistics"""
+    with store._connection() as conn:
+        total = conn.execute('SELECT COUNT(*) FROM call_history').fetchone()[0]
+        resolved = conn.execute('SELECT COUNT(*) FROM call_history WHERE status = ?', ("resolved",)).fetchone()[0]
+        escalated = conn.execute('SELECT COUNT(*) FROM call_history WHERE status = ?', ("escalated",)).fetchone()[0]
+        avg = conn.execute('SELECT AVG(duration_seconds) FROM call_history WHERE duration_seconds > 0').fetchone()[0]
+    return {"total_calls": total, "ai_resolved": resolved, "escalated": escalated, "avg_response_time": avg}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--inserts", type=int, default=200000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = StorageService(os.path.join(tmp, "stats.db"))
+        fill(store, args.rows, datetime(2025, 1, 1), uuid7)
+
+        before = aggregate_statistics(store)
+        after = store.get_statistics()
+        assert (before["total_calls"], before["ai_resolved"], before["escalated"]) == \
+            (after["total_calls"], after["ai_resolved"], after["escalated"])
+
+        print(f"\nСтатистика, {args.rows} записів, мс")
+        print(f"агрегація історії: {latency_ms(lambda: aggregate_statistics(store), repeat=5):.2f}")
+        print(f"лічильники:        {latency_ms(store.get_statistics, repeat=200):.3f}")
+
+        with_triggers = fill(store, args.inserts, datetime(2026, 1, 1), uuid7)
+        with store._connection() as conn:
+            for name in ("insert", "delete", "update"):
+                conn.execute(f"DROP TRIGGER trg_call_stats_{name}")
+        without_triggers = fill(store, args.inserts, datetime(2027, 1, 1), uuid7)
+        store.close()
+
+    print(f"\nВставка {args.inserts} записів, записів/с")
+    print(f"без тригерів: {without_triggers:.0f}, з тригерами: {with_triggers:.0f} "
+          f"({(1 - with_triggers / without_triggers) * 100:.0f}% повільніше)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Бенчмарк StorageService: з'єднання на кожен виклик vs персистентні з'єднання
+
+"До" - попередня поведінка: sqlite3.connect на кожен метод, журнал
+відкату (DELETE), налаштування SQLite за замовчуванням. "Після" -
+ConnectionManager: з'єднання на потік, WAL, synchronous=NORMAL, кеш
+сторінок, mmap та кеш підготовлених запитів.
+
+Вимірюється:
+- вставка записів історії (одна транзакція на дзвінок, як у WebSocket)
+- читання: сторінка історії, статистика (4 запити), виконавець за ID
+- читання з кількох потоків під час безперервного запису
+
+Запуск: python benchmarks/bench_storage.py [--rows 2000] [--reads 2000] [--threads 4]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import CallRecordCreate, ExecutorBase, StorageService
+
+
+class PerCallStorage(StorageService):
+    """Попередня поведінка: нове з'єднання на кожен виклик, налаштування за замовчуванням"""
+
+    @contextmanager
+    def _connection(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+
+def make_record(i: int) -> CallRecordCreate:
+    return CallRecordCreate(
+        transcript=f"Немає гарячої води, вулиця Шевченка {i}",
+        classification={"id": "class-5", "problem": "Інженерні мережі", "confidence": 0.8},
+        status="resolved" if i % 5 else "escalated",
+        response_text="Заявку прийнято. Бригада виїде протягом 2 годин.",
+        executor="Служба водопостачання"
+    )
+
+
+def rate(count: int, func) -> float:
+    started = time.perf_counter()
+    for i in range(count):
+        func(i)
+    return count / (time.perf_counter() - started)
+
+
+def concurrent_reads(store: StorageService, threads: int, seconds: float) -> float:
+    """Читання статистики з кількох потоків, поки окремий потік пише"""
+    stop = threading.Event()
+    counts = [0] * threads
+
+    def writer():
+        i = 0
+        while not stop.is_set():
+            store.create_call_record(make_record(i))
+            i += 1
+
+    def reader(slot: int):
+        while not stop.is_set():
+            store.get_statistics()
+            counts[slot] += 1
+
+    workers = [threading.Thread(target=writer)]
+    workers += [threading.Thread(target=reader, args=(slot,)) for slot in range(threads)]
+    for worker in workers:
+        worker.start()
+    time.sleep(seconds)
+    stop.set()
+    for worker in workers:
+        worker.join()
+    return sum(counts) / seconds
+
+
+def run(store: StorageService, args) -> dict:
+    executor = store.create_executor(ExecutorBase(name="Аварійна служба", phone="104"))
+    return {
+        "insert": rate(args.rows, lambda i: store.create_call_record(make_record(i))),
+        "history": rate(args.reads, lambda i: store.get_call_history(limit=50)),
+        "stats": rate(args.reads, lambda i: store.get_statistics()),
+        "executor": rate(args.reads, lambda i: store.get_executor(executor["id"])),
+        "concurrent": concurrent_reads(store, args.threads, args.seconds),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--reads", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        before = run(PerCallStorage(os.path.join(tmp, "before.db")), args)
+        after_store = StorageService(os.path.join(tmp, "after.db"))
+        after = run(after_store, args)
+        after_store.close()
+
+    labels = {
+        "insert": f"вставка ({args.rows} записів)",
+        "history": "історія, 50 записів",
+        "stats": "статистика",
+        "executor": "виконавець за ID",
+        "concurrent": f"статистика, {args.threads} потоки + запис",
+    }
+    print(f"\n{'Операція, оп/с':<36}{'До':>10}{'Після':>10}{'Прискорення':>13}")
+    for key, label in labels.items():
+        print(f"{label:<36}{before[key]:>10.0f}{after[key]:>10.0f}{after[key] / before[key]:>12.1f}x")
+
+
+if __name__ == "__main__":
+    main()
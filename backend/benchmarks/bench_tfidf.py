@@ -0,0 +1,125 @@
+"""
+Бенчмарк TF-IDF бекенда проти ключових слів
+
+Точність на розмічених запитах (з відмінками та помилками ASR) та
+пропускна здатність: поодинокі запити і пакет одним множенням матриць.
+
+Запуск: python benchmarks/bench_tfidf.py [--categories 1000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classifier import FALLBACK_CLASSIFIER_DATA, QueryClassifier
+from bench_classifier import generate_categories, generate_queries
+
+
+# (запит, id категорії з FALLBACK_CLASSIFIER_DATA; 0 - має піти на оператора)
+LABELED_QUERIES = [
+    ("Доброго дня, у нас немає опалення вже другий день", 4),
+    ("холодні батареї в квартирі", 4),
+    ("батарея ледь тепла, в квартирі холодно", 4),
+    ("не гріють радіатори", 4),
+    ("на мою машину впало дерево", 2),
+    ("впала гілка на автомобіль", 2),
+    ("велике дерево перегородило дорогу після вітру", 2),
+    ("протікає стеля у квартирі, вода капає", 3),
+    ("дах протікає після дощу", 3),
+    ("з покрівлі тече на стелю", 3),
+    ("коли відключатимуть світло в нашому районі", 8),
+    ("немає світла з ранку", 8),
+    ("пропала електрика в будинку", 8),
+    ("немає холодної води в будинку з самого ранку", 6),
+    ("відключили воду, кран сухий", 6),
+    ("у нас на території не прибрали сніг", 1),
+    ("двір замело снігом, пройти неможливо", 1),
+    ("хочу поскаржитися на водія маршрутки", 10),
+    ("автобус не зупинився на зупинці", 10),
+    ("маршрутка їде не за розкладом", 10),
+    ("на дорозі величезна яма", 11),
+    ("обвалився міст через річку", 11),
+    ("застряг ліфт у під'їзді", 9),
+    ("ліфт не працює третій день", 9),
+    ("сміття не вивозять, баки переповнені", 12),
+    ("смердить біля контейнерів", 12),
+    ("прорвало трубу в підвалі", 7),
+    ("затоплює під'їзд водою з труби", 7),
+    ("тече радіатор опалення", 5),
+    # Помилки розпізнавання та відмінки
+    ("немає опаленя", 4),
+    ("батареї холодні", 4),
+    ("ліфта застрягла кабина", 9),
+    ("сміттєві контейнери не вивезли", 12),
+    ("розчистіть сніг у дворі", 1),
+    ("дерева впали на машини", 2),
+    # Поза класифікатором
+    ("яка погода завтра", 0),
+    ("як оплатити податки", 0),
+    ("скільки коштує проїзд", 0),
+]
+
+
+def accuracy(classifier: QueryClassifier, backend: str):
+    results = classifier.classify_batch([query for query, _ in LABELED_QUERIES], backend)
+    correct = sum(1 for result, (_, label) in zip(results, LABELED_QUERIES) if str(result.id) == str(label))
+    escalated = sum(1 for result in results if result.needs_operator)
+    return correct / len(LABELED_QUERIES), escalated / len(LABELED_QUERIES)
+
+
+def throughput(func, min_seconds: float = 0.5) -> float:
+    done = 0
+    started = time.perf_counter()
+    while True:
+        done += func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_seconds:
+            return done / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--categories", type=int, default=1000, help="Розмір довідника для тесту швидкості")
+    parser.add_argument("--batch", type=int, default=256)
+    args = parser.parse_args()
+
+    classifier = QueryClassifier([dict(item) for item in FALLBACK_CLASSIFIER_DATA])
+    print("Точність на розміченому наборі")
+    print(f"{'Бекенд':<10}{'Точність':>10}{'Ескалації':>11}")
+    for backend in ("keyword", "tfidf"):
+        acc, escalated = accuracy(classifier, backend)
+        print(f"{backend:<10}{acc:>10.1%}{escalated:>11.1%}")
+
+    items = generate_categories(args.categories)
+    queries = generate_queries(items, args.batch)
+    large = QueryClassifier(items)
+
+    started = time.perf_counter()
+    large.snapshot.tfidf()
+    build_ms = (time.perf_counter() - started) * 1000
+
+    def keyword_single():
+        for query in queries:
+            large.classify(query, backend="keyword")
+        return len(queries)
+
+    def tfidf_single():
+        for query in queries:
+            large.classify(query, backend="tfidf")
+        return len(queries)
+
+    def tfidf_batch():
+        large.classify_batch(queries, backend="tfidf")
+        return len(queries)
+
+    print(f"\nПропускна здатність: {args.categories} категорій, побудова TF-IDF {build_ms:.0f} мс")
+    print(f"{'Режим':<22}{'q/s':>10}")
+    for name, func in (("keyword", keyword_single), ("tfidf (по одному)", tfidf_single),
+                       (f"tfidf (пакет {args.batch})", tfidf_batch)):
+        print(f"{name:<22}{throughput(func):>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
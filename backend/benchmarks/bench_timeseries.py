@@ -0,0 +1,101 @@
+"""
+Бенчмарк часових рядів: розбір історії vs агрегати call_rollups
+
+"До" - те, що довелося б робити без агрегатів: прочитати всі записи
+діапазону та розібрати JSON класифікації в Python. "Після" -
+get_call_timeseries з агрегатів. Записи рівномірно розподілені на рік.
+
+Запуск: python benchmarks/bench_timeseries.py [--rows 1000000] [--days 365]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_history import FILL_BATCH, latency_ms
+from storage import StorageService, uuid7
+
+CATEGORIES = [(f"class-{i}", urgency) for i, urgency in
+              enumerate(["emergency", "short", "standard", "info"] * 3)]
+EXECUTORS = ["Служба водопостачання", "Служба теплопостачання", "Аварійна служба", "Оператор"]
+
+
+def fill(store: StorageService, count: int, start: datetime, days: int) -> float:
+    step = timedelta(days=days) / count
+    started = time.perf_counter()
+    for offset in range(0, count, FILL_BATCH):
+        batch = []
+        for i in range(offset, min(offset + FILL_BATCH, count)):
+            category, urgency = random.choice(CATEGORIES)
+            timestamp = (start + step * i).isoformat()
+            batch.append((
+                uuid7(), timestamp, None, "Немає гарячої води",
+                json.dumps({"id": category, "urgency": urgency, "confidence": 0.8}),
+                "escalated" if random.random() < 0.2 else "resolved", "Заявку прийнято.",
+                random.choice(EXECUTORS), 0, timestamp
+            ))
+        with store._connection() as conn:
+            conn.executemany(store._INSERT_CALL_RECORD, batch)
+    return count / (time.perf_counter() - started)
+
+
+def parse_history(store: StorageService, start: str, end: str, length: int, group_by: str) -> dict:
+    """Без агрегатів: усі записи діапазону + json.loads на кожен"""
+    calls, escalated = Counter(), Counter()
+    with store._connection() as conn:
+        rows = conn.execute(
+            "SELECT timestamp, classification, status, executor FROM call_history WHERE timestamp >= ? AND timestamp < ?",
+            (start, end)
+        )
+        for timestamp, classification, status, executor in rows:
+            data = json.loads(classification)
+            group = executor if group_by == "executor" else data.get("id" if group_by == "category" else group_by)
+            key = (timestamp[:length], group)
+            calls[key] += 1
+            escalated[key] += status == "escalated"
+    return calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--days", type=int, default=365)
+    args = parser.parse_args()
+
+    start = datetime(2025, 1, 1)
+    end = start + timedelta(days=args.days)
+    queries = [
+        ("hour", "category", end - timedelta(days=1), "доба, по годинах, за категорією"),
+        ("hour", "urgency", end - timedelta(days=7), "тиждень, по годинах, за терміновістю"),
+        ("day", "executor", start, f"{args.days} днів, по днях, за виконавцем"),
+        ("hour", "category", start, f"{args.days} днів, по годинах, за категорією"),
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = StorageService(os.path.join(tmp, "timeseries.db"))
+        insert_rate = fill(store, args.rows, start, args.days)
+
+        print(f"\n{args.rows} записів за {args.days} днів, мс")
+        print(f"{'Запит':<44}{'розбір':>10}{'агрегати':>10}{'точок':>8}")
+        for interval, group_by, since, label in queries:
+            length = store.ROLLUP_BUCKETS[interval]
+            expected = parse_history(store, since.isoformat(), end.isoformat(), length, group_by)
+            series = store.get_call_timeseries(since.isoformat(), end.isoformat(), interval, group_by)
+            assert sum(point["calls"] for point in series) == sum(expected.values())
+            before = latency_ms(lambda: parse_history(store, since.isoformat(), end.isoformat(), length, group_by), repeat=3)
+            after = latency_ms(lambda: store.get_call_timeseries(since.isoformat(), end.isoformat(), interval, group_by))
+            print(f"{label:<44}{before:>10.1f}{after:>10.2f}{len(series):>8}")
+        store.close()
+
+    print(f"\nВставка з тригерами агрегатів: {insert_rate:.0f} записів/с")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+"""
+Оцінка класифікатора: точність та швидкодія на розміченому корпусі
+
+Корпус українських запитів будується детерміновано з:
+- DEMO_QUERIES (asr_service) та розмічених запитів bench_tfidf
+- ключових слів FALLBACK_CLASSIFIER_DATA (лише однозначних) у шаблонах фраз
+- синтетичних перефразувань кожної категорії, частина - з помилками ASR
+- запитів поза класифікатором (мітка 0 - має піти на оператора)
+
+Для кожного бекенда та розміру довідника (резервні категорії плюс
+синтетичні "відволікаючі") звітує точність, частку ескалацій,
+точність серед автоматичних відповідей, матрицю плутанини, пропускну
+здатність пакетом та латентність поодиноких запитів (p50/p99). Кеш
+результатів вимкнено, щоб вимірювалась сама класифікація.
+
+Запуск:
+    python benchmarks/classifier_eval.py [--sizes 12,1000,10000] [--backends keyword,tfidf,cascade]
+    python benchmarks/classifier_eval.py --json eval.json
+    python benchmarks/classifier_eval.py --compare eval.json [--tolerance 0.01]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from asr_service import DEMO_QUERIES
+from classifier import FALLBACK_CLASSIFIER_DATA, QueryClassifier, TFIDF_AVAILABLE
+from embedding_backend import get_embedding_model
+from bench_classifier import generate_categories
+from bench_tfidf import LABELED_QUERIES
+
+
+# Мітки DEMO_QUERIES (id категорій FALLBACK_CLASSIFIER_DATA)
+DEMO_LABELS = [4, 2, 3, 8, 6, 1, 10, 11]
+
+# Перефразування категорій (як говорять абоненти, без ключових слів довідника де можливо)
+PARAPHRASES = {
+    1: ["не почистили подвір'я після снігопаду", "біля під'їзду кучугури снігу",
+        "ніхто не розгрібає сніг біля будинку"],
+    2: ["гілляка звалилася на припарковане авто", "вітром повалило дерево біля дому",
+        "на тротуар впало старе дерево"],
+    3: ["з даху капає просто в кімнату", "після зливи мокра стеля на останньому поверсі",
+        "дах тече, на стелі пляма"],
+    4: ["у квартирі дуже холодно, батареї ледь теплі", "не дали тепло в будинок",
+        "опалення так і не увімкнули"],
+    5: ["під радіатором калюжа", "батарея підтікає на стику",
+        "з радіатора опалення крапає вода"],
+    6: ["з крана нічого не йде", "у всьому будинку пропала вода",
+        "вже добу без холодної води"],
+    7: ["у підвалі прорвало трубу, все заливає", "з труби в під'їзді хлище вода",
+        "затопило підвал через трубу"],
+    8: ["у всьому будинку темно, електрики немає", "вибило світло в під'їзді",
+        "немає електроенергії з ночі"],
+    9: ["ліфт став між поверхами", "кабіна ліфта не їде",
+        "ліфт зламався, не можемо піднятися"],
+    10: ["водій маршрутки грубіянить пасажирам", "автобус пройшов повз зупинку",
+         "маршрутки не ходять за графіком"],
+    11: ["на дорозі провалився асфальт", "тріщина на мосту через річку",
+         "глибока вибоїна посеред дороги"],
+    12: ["сміттєві баки переповнені тиждень", "біля контейнерів гора сміття",
+         "не вивозять сміття з майданчика"],
+}
+
+OUT_OF_SCOPE = [
+    "яка погода завтра", "як оплатити податки", "скільки коштує проїзд у метро",
+    "коли працює ЦНАП", "як записатися до лікаря", "підкажіть номер поліції",
+    "хочу дізнатися про субсидію", "де отримати паспорт", "дякую, до побачення",
+    "як змінити тариф мобільного", "коли буде концерт на площі", "де найближча аптека",
+]
+
+PREFIXES = ["", "Доброго дня, ", "Алло, ", "Скажіть, будь ласка, ", "Хочу повідомити: "]
+SUFFIXES = ["", " вже третій день", " в нашому будинку", ", терміново", " з самого ранку"]
+KEYWORD_TEMPLATES = ["проблема: {kw}", "у нас {kw}", "{kw} біля будинку", "звертаюся щодо: {kw}"]
+
+UKRAINIAN_LETTERS = "абвгґдеєжзиіїйклмнопрстуфхцчшщьюя"
+
+
+def asr_noise(text: str, rng: random.Random) -> str:
+    """Типова помилка розпізнавання: заміна, пропуск або подвоєння літери в довгому слові"""
+    words = text.split()
+    candidates = [idx for idx, word in enumerate(words) if len(word) > 4]
+    if not candidates:
+        return text
+    idx = rng.choice(candidates)
+    word = words[idx]
+    pos = rng.randrange(1, len(word) - 1)
+    operation = rng.choice(("replace", "drop", "double"))
+    if operation == "replace":
+        word = word[:pos] + rng.choice(UKRAINIAN_LETTERS) + word[pos + 1:]
+    elif operation == "drop":
+        word = word[:pos] + word[pos + 1:]
+    else:
+        word = word[:pos] + word[pos] + word[pos:]
+    words[idx] = word
+    return " ".join(words)
+
+
+def build_corpus(seed: int = 13, noise_ratio: float = 0.3):
+    """
+    Розмічений корпус
+
+    Returns:
+        Список (запит, мітка, джерело); мітка - id категорії або 0
+    """
+    rng = random.Random(seed)
+    corpus = []
+
+    corpus.extend((query, label, "demo") for query, label in zip(DEMO_QUERIES, DEMO_LABELS))
+    corpus.extend((query, label, "labeled") for query, label in LABELED_QUERIES)
+
+    # Ключові слова, що належать кільком категоріям, не дають однозначної мітки
+    owners = defaultdict(set)
+    for item in FALLBACK_CLASSIFIER_DATA:
+        for kw in item["keywords"]:
+            owners[kw].add(item["id"])
+    for item in FALLBACK_CLASSIFIER_DATA:
+        for kw in item["keywords"]:
+            if len(owners[kw]) == 1:
+                corpus.append((rng.choice(KEYWORD_TEMPLATES).format(kw=kw), item["id"], "keyword"))
+
+    for label, phrases in PARAPHRASES.items():
+        for phrase in phrases:
+            for _ in range(3):
+                query = rng.choice(PREFIXES) + phrase + rng.choice(SUFFIXES)
+                source = "paraphrase"
+                if rng.random() < noise_ratio:
+                    query, source = asr_noise(query, rng), "paraphrase_asr"
+                corpus.append((query, label, source))
+
+    for query in OUT_OF_SCOPE:
+        corpus.append((rng.choice(PREFIXES) + query, 0, "out_of_scope"))
+
+    # Дублікати однакового тексту не додають інформації
+    seen = set()
+    unique = []
+    for query, label, source in corpus:
+        if query not in seen:
+            seen.add(query)
+            unique.append((query, label, source))
+    return unique
+
+
+def available_backends(requested):
+    backends = []
+    for backend in requested:
+        if backend == "tfidf" and not TFIDF_AVAILABLE:
+            print("[Eval] TF-IDF недоступний (numpy/scipy), пропускаю")
+            continue
+        if backend == "embedding" and get_embedding_model() is None:
+            print("[Eval] Embedding модель недоступна (NLU_MODEL_PATH), пропускаю")
+            continue
+        backends.append(backend)
+    return backends
+
+
+def classify_funcs(classifier: QueryClassifier, backend: str):
+    """(поодинока класифікація, пакетна класифікація) для бекенда"""
+    if backend == "cascade":
+        return classifier.classify_cascade, classifier.classify_cascade_batch
+    return (lambda query: classifier.classify(query, backend),
+            lambda queries: classifier.classify_batch(queries, backend))
+
+
+def percentile(sorted_values, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def evaluate(classifier: QueryClassifier, backend: str, corpus, known_ids):
+    """Метрики одного бекенда на одному довіднику"""
+    single, batch = classify_funcs(classifier, backend)
+    queries = [query for query, _, _ in corpus]
+
+    # Прогрів: ліниві бекенди (TF-IDF) будуються при першому виклику
+    batch(queries[:1])
+
+    started = time.perf_counter()
+    results = batch(queries)
+    batch_seconds = time.perf_counter() - started
+
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        single(query)
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+
+    confusion = defaultdict(Counter)
+    by_source = defaultdict(lambda: [0, 0])
+    correct = escalated = answered_correct = 0
+    for (query, label, source), result in zip(corpus, results):
+        predicted = "0" if result.needs_operator else str(result.id)
+        if predicted not in known_ids:
+            predicted = "other"
+        confusion[str(label)][predicted] += 1
+
+        hit = predicted == str(label)
+        correct += hit
+        escalated += result.needs_operator
+        answered_correct += hit and not result.needs_operator
+        by_source[source][0] += hit
+        by_source[source][1] += 1
+
+    total = len(corpus)
+    answered = total - escalated
+    return {
+        "queries": total,
+        "accuracy": round(correct / total, 4),
+        "escalation_rate": round(escalated / total, 4),
+        "answered_precision": round(answered_correct / answered, 4) if answered else 0.0,
+        "accuracy_by_source": {source: round(hit / count, 4) for source, (hit, count) in sorted(by_source.items())},
+        "batch_qps": round(total / batch_seconds, 1),
+        "single_qps": round(total / sum(latencies), 1),
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "confusion": {label: dict(sorted(row.items())) for label, row in sorted(confusion.items(), key=lambda kv: int(kv[0]))},
+    }
+
+
+def print_confusion(confusion, labels):
+    columns = labels + ["other"]
+    print("\nМатриця плутанини (рядки - мітка, стовпці - результат, 0 - оператор)")
+    print("     " + "".join(f"{column:>6}" for column in columns))
+    for label in labels:
+        row = confusion.get(label, {})
+        print(f"{label:>5}" + "".join(f"{row.get(column, 0) or '.':>6}" for column in columns))
+
+
+def compare(report, baseline, tolerance: float) -> bool:
+    """Порівняння з попереднім звітом; False - якщо точність впала більше ніж на tolerance"""
+    ok = True
+    print(f"\nПорівняння з базовим звітом (допуск точності {tolerance:.1%})")
+    print(f"{'Категорій':>10} {'Бекенд':<10}{'Точність':>18}{'Ескалації':>18}{'q/s пакет':>20}{'p99 мс':>18}")
+    for size, backends in report["results"].items():
+        for backend, metrics in backends.items():
+            base = baseline.get("results", {}).get(size, {}).get(backend)
+            if base is None:
+                print(f"{size:>10} {backend:<10}{'немає в базовому звіті':>18}")
+                continue
+            accuracy_delta = metrics["accuracy"] - base["accuracy"]
+            regression = accuracy_delta < -tolerance
+            ok = ok and not regression
+            print(f"{size:>10} {backend:<10}"
+                  f"{base['accuracy']:>8.1%} -> {metrics['accuracy']:<6.1%}"
+                  f"{base['escalation_rate']:>8.1%} -> {metrics['escalation_rate']:<6.1%}"
+                  f"{base['batch_qps']:>10.0f} -> {metrics['batch_qps']:<7.0f}"
+                  f"{base['p99_ms']:>8.2f} -> {metrics['p99_ms']:<7.2f}"
+                  f"{'  РЕГРЕСІЯ' if regression else ''}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="12,1000,10000", help="Кількість категорій через кому")
+    parser.add_argument("--backends", default="keyword,tfidf,cascade,embedding")
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument("--json", help="Зберегти звіт у JSON")
+    parser.add_argument("--compare", help="Порівняти з попереднім JSON звітом")
+    parser.add_argument("--tolerance", type=float, default=0.01, help="Допустиме падіння точності")
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.seed)
+    backends = available_backends(args.backends.split(","))
+    labels = [str(label) for label in sorted({label for _, label, _ in corpus})]
+    sources = Counter(source for _, _, source in corpus)
+    print(f"Корпус: {len(corpus)} запитів ({', '.join(f'{s}: {n}' for s, n in sorted(sources.items()))})\n")
+
+    report = {
+        "corpus_size": len(corpus),
+        "seed": args.seed,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": {},
+    }
+
+    print(f"{'Категорій':>10} {'Бекенд':<10}{'Точність':>10}{'Ескалації':>11}{'Точн. відп.':>13}"
+          f"{'q/s пакет':>11}{'q/s по 1':>10}{'p50 мс':>9}{'p99 мс':>9}")
+    for size in (int(value) for value in args.sizes.split(",")):
+        classifier = QueryClassifier(generate_categories(size))
+        classifier.cache.max_size = 0
+        report["results"][str(size)] = {}
+
+        for backend in backends:
+            metrics = evaluate(classifier, backend, corpus, set(labels))
+            report["results"][str(size)][backend] = metrics
+            print(f"{size:>10} {backend:<10}{metrics['accuracy']:>10.1%}{metrics['escalation_rate']:>11.1%}"
+                  f"{metrics['answered_precision']:>13.1%}{metrics['batch_qps']:>11.0f}"
+                  f"{metrics['single_qps']:>10.0f}{metrics['p50_ms']:>9.2f}{metrics['p99_ms']:>9.2f}")
+
+    for backend in backends:
+        first_size = next(iter(report["results"]))
+        print(f"\n[{backend}, {first_size} категорій]", end="")
+        print_confusion(report["results"][first_size][backend]["confusion"], labels)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\nЗвіт збережено: {args.json}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if not compare(report, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+Відкладений запис історії дзвінків (write-behind)
+Записи дзвінків накопичуються в обмеженому буфері, фоновий потік
+записує їх пакетами - одна транзакція (і один fsync) на пакет замість
+окремого INSERT + COMMIT на кожну репліку
+"""
+import asyncio
+import atexit
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from config import settings
+from storage import CallRecordCreate, StorageService
+
+# Як часто письменник видаляє застарілі хвилинні агрегати, секунд
+ROLLUP_PRUNE_INTERVAL = 3600
+
+
+class CallRecordWriter:
+    """
+    Фоновий письменник записів дзвінків з груповою фіксацією
+
+    - submit/write ставлять запис у буфер і одразу повертаються
+    - Потік-письменник фіксує буфер через executemany однією транзакцією,
+      щойно набралося CALL_WRITER_BATCH_SIZE записів або найстаріший
+      запис чекає CALL_WRITER_FLUSH_MS
+    - Буфер обмежений CALL_WRITER_MAX_PENDING: якщо письменник не
+      встигає, submit чекає на місце (зворотний тиск), а не росте пам'ять
+    - durable=True: виклик чекає, доки транзакція з записом зафіксована
+    - close() (та завершення процесу) дописують усе з буфера
+    - Раз на ROLLUP_PRUNE_INTERVAL видаляє хвилинні агрегати, старші за
+      ROLLUP_MINUTE_RETENTION_DAYS
+
+    Записи з'являються в історії із затримкою до CALL_WRITER_FLUSH_MS.
+    """
+
+    def __init__(self, store: StorageService,
+                 batch_size: Optional[int] = None,
+                 flush_ms: Optional[int] = None,
+                 max_pending: Optional[int] = None):
+        self.storage = store
+        self.batch_size = batch_size or settings.CALL_WRITER_BATCH_SIZE
+        self.flush_interval = (flush_ms if flush_ms is not None else settings.CALL_WRITER_FLUSH_MS) / 1000
+        self.max_pending = max_pending or settings.CALL_WRITER_MAX_PENDING
+
+        # (запис, Future для durable, час надходження в буфер)
+        self._pending: List[Tuple[CallRecordCreate, Optional[Future], float]] = []
+        self._in_flight = 0  # записи пакета, що зараз фіксується
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._pruned_at = 0.0
+
+        self.written = 0
+        self.batches = 0
+        self.failed = 0
+        self.max_batch = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending) + self._in_flight
+
+    @property
+    def threads(self) -> int:
+        """Кількість живих потоків-письменників (для оцінки пам'яті тенанта)"""
+        return int(self._thread is not None and self._thread.is_alive())
+
+    def _ensure_started(self):
+        """Потік-письменник стартує з першим записом (викликається під self._condition)"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="call-record-writer", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def submit(self, record: CallRecordCreate, durable: bool = False, timeout: Optional[float] = None) -> Optional[Future]:
+        """
+        Поставити запис у буфер
+
+        Args:
+            record: Запис дзвінка
+            durable: Повернути Future, що завершиться після фіксації транзакції
+            timeout: Скільки чекати на місце в повному буфері (None - без обмеження)
+
+        Returns:
+            Future для durable=True, інакше None
+
+        Raises:
+            RuntimeError: письменник закритий
+            TimeoutError: буфер повний довше за timeout
+        """
+        future = Future() if durable else None
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Письменник записів дзвінків закритий")
+            if not self._condition.wait_for(lambda: len(self._pending) < self.max_pending or self._closed, timeout):
+                raise TimeoutError("Буфер записів дзвінків переповнений")
+            self._ensure_started()
+            self._pending.append((record, future, time.monotonic()))
+            # Письменник чекає без тайм-ауту, поки буфер порожній
+            if len(self._pending) in (1, self.batch_size) or durable:
+                self._condition.notify_all()
+        return future
+
+    def full(self) -> bool:
+        return len(self._pending) >= self.max_pending
+
+    async def write(self, record: CallRecordCreate, durable: Optional[bool] = None):
+        """
+        Асинхронний запис для обробників FastAPI
+
+        Не блокує event loop: спершу ставить запис без очікування, на
+        повний буфер чекає в потоці, на фіксацію (durable, за замовчуванням
+        CALL_RECORD_DURABLE) - через Future.
+        """
+        durable = settings.CALL_RECORD_DURABLE if durable is None else durable
+        try:
+            future = self.submit(record, durable, timeout=0)
+        except TimeoutError:
+            # Буфер заповнився - чекаємо на місце поза event loop
+            future = await asyncio.to_thread(self.submit, record, durable)
+        if future is not None:
+            await asyncio.wrap_future(future)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while True:
+                    if self._closed or len(self._pending) >= self.batch_size:
+                        break
+                    if self._pending:
+                        # Durable-записи не чекають на заповнення пакета
+                        if any(future is not None for _, future, _ in self._pending):
+                            break
+                        # Після неповного пакета решта записів чекає від власного надходження
+                        remaining = self._pending[0][2] + self.flush_interval - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._condition.wait(remaining)
+                    else:
+                        self._condition.wait()
+
+                if not self._pending and self._closed:
+                    return
+                batch = [(record, self._claim(future)) for record, future, _ in self._pending[:self.batch_size]]
+                del self._pending[:self.batch_size]
+                self._in_flight = len(batch)
+                # Звільнилось місце - розбудити submit, що чекає
+                self._condition.notify_all()
+
+            try:
+                self._write_batch(batch)
+                self._prune_rollups()
+            except Exception as e:
+                # Потік не повинен завершитись: інакше submit і flush чекатимуть вічно
+                print(f"[CallWriter] ❌ Помилка потоку запису: {e}")
+                for _, future in batch:
+                    if future is not None and not future.done():
+                        future.set_exception(e)
+            finally:
+                with self._condition:
+                    self._in_flight = 0
+                    self._condition.notify_all()
+
+    @staticmethod
+    def _claim(future: Optional[Future]) -> Optional[Future]:
+        """
+        Перевести Future запису у стан виконання перед записом пакета
+
+        Після цього Future не скасувати, тож set_result не кине
+        InvalidStateError. Якщо очікування вже скасовано (обробник
+        перервано), результат нікому не потрібен, але запис зберігається.
+        """
+        if future is None or future.set_running_or_notify_cancel():
+            return future
+        return None
+
+    def _write_batch(self, batch: List[Tuple[CallRecordCreate, Optional[Future]]]):
+        try:
+            self.storage.create_call_records([record for record, _ in batch])
+        except Exception as e:
+            print(f"[CallWriter] ⚠️ Помилка запису пакета ({len(batch)}): {e}, запис поштучно")
+            # Один некоректний запис не повинен втратити весь пакет
+            self.batches += 1
+            for record, future in batch:
+                self._write_one(record, future)
+            return
+
+        self.written += len(batch)
+        self.batches += 1
+        self.max_batch = max(self.max_batch, len(batch))
+        for _, future in batch:
+            if future is not None:
+                future.set_result(True)
+
+    def _write_one(self, record: CallRecordCreate, future: Optional[Future]):
+        try:
+            self.storage.create_call_record(record)
+        except Exception as e:
+            self.failed += 1
+            print(f"[CallWriter] ❌ Запис {record.id} не збережено: {e}")
+            if future is not None:
+                future.set_exception(e)
+            return
+        self.written += 1
+        if future is not None:
+            future.set_result(True)
+
+    def _prune_rollups(self):
+        if not settings.ROLLUP_MINUTE_RETENTION_DAYS or time.monotonic() - self._pruned_at < ROLLUP_PRUNE_INTERVAL:
+            return
+        self._pruned_at = time.monotonic()
+        before = (datetime.now() - timedelta(days=settings.ROLLUP_MINUTE_RETENTION_DAYS)).isoformat()
+        try:
+            deleted = self.storage.delete_minute_rollups(before)
+        except Exception as e:
+            print(f"[CallWriter] ⚠️ Помилка очищення хвилинних агрегатів: {e}")
+            return
+        if deleted:
+            print(f"[CallWriter] Видалено {deleted} хвилинних агрегатів до {before[:10]}")
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Дочекатися запису всього, що вже в буфері"""
+        with self._condition:
+            self._condition.notify_all()
+            return self._condition.wait_for(lambda: self.pending == 0, timeout)
+
+    def close(self, timeout: Optional[float] = None):
+        """Дописати буфер і зупинити потік (нові записи не приймаються)"""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            print(f"[CallWriter] Зупинено: записано {self.written} записів пакетами ({self.batches})")
+
+    def stats(self) -> Dict:
+        return {
+            "pending": self.pending,
+            "written": self.written,
+            "failed": self.failed,
+            "batches": self.batches,
+            "avg_batch": round(self.written / self.batches, 1) if self.batches else 0,
+            "max_batch": self.max_batch,
+        }
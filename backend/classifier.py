@@ -3,9 +3,31 @@
 Універсальний класифікатор контактного центру
 Використовує довідник з references.py
 """
-from typing import Optional, Dict, List
-from dataclasses import dataclass
+from typing import Optional, Dict, List, Tuple, FrozenSet
+from dataclasses import dataclass, replace
+import bisect
+import hashlib
+import itertools
+import json
+import math
 import re
+import threading
+import time
+from collections import OrderedDict, deque
+
+from config import settings
+from keyword_index import KeywordIndex, keyword_features, keyword_score
+from embedding_backend import EmbeddingBackend, get_embedding_model
+from text_utils import normalize_query
+from location_extractor import extract_address
+
+# NumPy/SciPy потрібні лише для TF-IDF бекенда
+try:
+    import numpy as np
+    from scipy import sparse
+    TFIDF_AVAILABLE = True
+except ImportError:
+    TFIDF_AVAILABLE = False
 
 @dataclass
 class ClassificationResult:
@@ -21,6 +43,9 @@ class ClassificationResult:
     response_time: int  # години
     confidence: float
     needs_operator: bool = False
+    snapshot_version: int = 0  # версія знімка класифікатора (для аудиту)
+    backend: str = "keyword"  # бекенд, що дав результат
+    address: Optional[Dict] = None  # вулиця/будинок/квартира з транскрипту
 
 
 # Резервні дані (використовуються якщо довідник порожній)
@@ -172,83 +197,867 @@ FALLBACK_CLASSIFIER_DATA: List[Dict] = [
 ]
 
 
-class QueryClassifier:
-    """Класифікатор запитів громадян"""
+# Слова тексту: літери, цифри та апостроф (під'їзд)
+_WORD_RE = re.compile(r"[\w'ʼ’]+")
+
+
+class TfidfBackend:
+    """
+    Бекенд класифікації на символьних n-грамах TF-IDF
+    
+    Кожна категорія описується текстом з ключових слів, підтипу, типу та
+    проблеми. Символьні n-грами в межах слів (з пробілами по краях)
+    стійкі до відмінків та помилок ASR: "батареї" і "батарея" мають
+    більшість спільних n-грам. Вектори категорій зберігаються у
+    розрідженій матриці з L2-нормалізованими рядками, тож косинусна
+    схожість для пакета запитів - це одне множення матриць.
+    Модель не потребує завантаження.
+    """
+    
+    def __init__(self, items: List[Dict], ngram_range: Tuple[int, int] = (2, 4)):
+        if not TFIDF_AVAILABLE:
+            raise RuntimeError("TF-IDF бекенд потребує numpy та scipy")
+        
+        self.ngram_range = ngram_range
+        self.vocabulary: Dict[str, int] = {}
+        
+        documents = [self._ngram_counts(self._category_text(item), grow=True) for item in items]
+        
+        # Згладжений IDF (як у scikit-learn): log((1 + N) / (1 + df)) + 1
+        doc_freq = np.zeros(len(self.vocabulary), dtype=np.float64)
+        for counts in documents:
+            for col in counts:
+                doc_freq[col] += 1
+        self.idf = np.log((1 + len(items)) / (1 + doc_freq)) + 1.0
+        
+        self.matrix = self._to_matrix(documents)
+        self._matrix_t = self.matrix.T.tocsr()
+    
+    @staticmethod
+    def _category_text(item: Dict) -> str:
+        """Текст категорії у канонічній формі запиту (normalize_query)"""
+        parts = list(item.get("keywords", []))
+        parts.extend(item.get(field) or "" for field in ("subtype", "type", "problem"))
+        return normalize_query(" ".join(parts))
+    
+    def _ngram_counts(self, text: str, grow: bool = False) -> Dict[int, int]:
+        """Частоти символьних n-грам тексту {стовпець: кількість}"""
+        counts: Dict[int, int] = {}
+        vocabulary = self.vocabulary
+        min_n, max_n = self.ngram_range
+        
+        for word in _WORD_RE.findall(text.lower()):
+            padded = f" {word} "
+            for n in range(min_n, max_n + 1):
+                for start in range(len(padded) - n + 1):
+                    ngram = padded[start:start + n]
+                    col = vocabulary.get(ngram)
+                    if col is None:
+                        if not grow:
+                            continue
+                        col = vocabulary[ngram] = len(vocabulary)
+                    counts[col] = counts.get(col, 0) + 1
+        return counts
+    
+    def _to_matrix(self, documents: List[Dict[int, int]]):
+        """CSR матриця з сублінійним TF * IDF та L2-нормалізацією рядків"""
+        indptr = [0]
+        indices: List[int] = []
+        values: List[float] = []
+        for counts in documents:
+            indices.extend(counts)
+            values.extend(1.0 + math.log(count) for count in counts.values())
+            indptr.append(len(indices))
+        
+        matrix = sparse.csr_matrix(
+            (np.asarray(values, dtype=np.float64), np.asarray(indices, dtype=np.int64), np.asarray(indptr)),
+            shape=(len(documents), len(self.vocabulary))
+        )
+        matrix = matrix.multiply(self.idf).tocsr()
+        
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        return sparse.diags(1.0 / norms).dot(matrix).tocsr()
+    
+    def vectorize(self, queries: List[str]):
+        """Матриця TF-IDF векторів запитів (невідомі n-грами ігноруються)"""
+        return self._to_matrix([self._ngram_counts(normalize_query(query)) for query in queries])
+    
+    def similarities(self, queries: List[str], candidates: Optional[List[int]] = None):
+        """
+        Косинусна схожість запитів з категоріями (n_queries x n_categories)
+        
+        Args:
+            queries: Тексти запитів
+            candidates: Обмежити порівняння цими індексами категорій
+        """
+        matrix_t = self._matrix_t if candidates is None else self.matrix[list(candidates)].T
+        return (self.vectorize(queries) @ matrix_t).toarray()
+    
+    def best_matches(self, queries: List[str]) -> List[Tuple[int, float]]:
+        """Найближча категорія для кожного запиту одним множенням матриць"""
+        if self.matrix.shape[0] == 0:
+            return [(-1, 0.0) for _ in queries]
+        sims = self.similarities(queries)
+        best = sims.argmax(axis=1)
+        return [(int(idx), float(sims[row, idx])) for row, idx in enumerate(best)]
+
+
+class CascadeStats:
+    """
+    Метрики каскаду класифікації по етапах
+    
+    Для кожного етапу: кількість запитів, що дійшли до етапу, кількість
+    відповідей етапу (hit rate) та латентність (середня, p50, p99, max
+    по останніх запитах).
+    """
+    
+    WINDOW = 1000
     
     def __init__(self):
-        self._load_data()
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        with self._lock:
+            self._stages: Dict[str, Dict] = {}
+            self.total = 0
+            self.operator = 0
+    
+    def record(self, stage: str, seconds: float, answered: bool):
+        """Зареєструвати проходження запиту через етап"""
+        with self._lock:
+            data = self._stages.get(stage)
+            if data is None:
+                data = self._stages[stage] = {
+                    "calls": 0, "answered": 0, "total_seconds": 0.0,
+                    "max_seconds": 0.0, "recent": deque(maxlen=self.WINDOW)
+                }
+            data["calls"] += 1
+            data["answered"] += 1 if answered else 0
+            data["total_seconds"] += seconds
+            data["max_seconds"] = max(data["max_seconds"], seconds)
+            data["recent"].append(seconds)
+    
+    def record_query(self, needs_operator: bool):
+        with self._lock:
+            self.total += 1
+            self.operator += 1 if needs_operator else 0
+    
+    def to_dict(self) -> Dict:
+        """Метрики для API"""
+        with self._lock:
+            stages = {}
+            for stage, data in self._stages.items():
+                recent = sorted(data["recent"])
+                calls = data["calls"]
+                stages[stage] = {
+                    "calls": calls,
+                    "answered": data["answered"],
+                    "hit_rate": round(data["answered"] / calls, 4) if calls else 0.0,
+                    "share_of_queries": round(calls / self.total, 4) if self.total else 0.0,
+                    "avg_ms": round(data["total_seconds"] / calls * 1000, 3) if calls else 0.0,
+                    "p50_ms": round(recent[len(recent) // 2] * 1000, 3) if recent else 0.0,
+                    "p99_ms": round(recent[min(len(recent) - 1, int(len(recent) * 0.99))] * 1000, 3) if recent else 0.0,
+                    "max_ms": round(data["max_seconds"] * 1000, 3)
+                }
+            return {
+                "queries": self.total,
+                "operator": self.operator,
+                "operator_rate": round(self.operator / self.total, 4) if self.total else 0.0,
+                "stages": stages
+            }
+
+
+class ClassificationCache:
+    """
+    LRU кеш результатів класифікації
+    
+    Ключ - (версія знімка, режим класифікації, нормалізований запит).
+    Версія в ключі гарантує, що після зміни довідника старі результати
+    не повертаються; при публікації знімка кеш також очищається, щоб
+    не тримати недосяжні записи. Розмір обмежено кількістю записів та
+    довжиною запиту (довгі запити майже не повторюються).
+    """
+    
+    # Наближений розмір запису (ключ та результат) для оцінки пам'яті
+    ENTRY_BYTES = 1024
+    
+    def __init__(self, max_size: int, max_query_length: int):
+        self.max_size = max_size
+        self.max_query_length = max_query_length
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple, ClassificationResult]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+    
+    def cacheable(self, normalized: str) -> bool:
+        return self.enabled and len(normalized) <= self.max_query_length
+    
+    def get(self, key: Tuple) -> Optional[ClassificationResult]:
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+    
+    def put(self, key: Tuple, result: ClassificationResult):
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        with self._lock:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+    
+    def to_dict(self) -> Dict:
+        """Метрики для API"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
+
+
+# Лічильник версій знімків класифікатора
+_snapshot_versions = itertools.count(1)
+
+
+class ClassifierSnapshot:
+    """
+    Незмінний скомпільований знімок класифікатора
+    
+    Складається з базового індексу та невеликого дельта-індексу змінених
+    категорій. Категорії бази, що були змінені або видалені, приховуються
+    (tombstones). Зміни створюють новий знімок, перебудовуючи лише дельту;
+    коли дельта розростається, знімок компактується у нову базу.
+    """
+    
+    __slots__ = ("version", "base", "delta", "removed", "items", "_sequence", "_order", "_hidden", "_positions", "_backends", "_backends_lock", "_index_bytes", "_fingerprint")
+    
+    # Індекси ключових слів (Aho-Corasick, варіанти з видаленнями, posting lists) займають
+    # приблизно стільки байт на байт JSON категорій (виміряно tracemalloc)
+    INDEX_MEMORY_FACTOR = 40
+    
+    def __init__(self, base: KeywordIndex, delta: KeywordIndex, removed: FrozenSet[int], sequence: Dict[str, int]):
+        self.version = next(_snapshot_versions)
+        self.base = base
+        self.delta = delta
+        self.removed = removed
+        self._hidden = sorted(removed)
+        
+        # Порядок категорій: база (без прихованих), потім дельта
+        items = [item for idx, item in enumerate(base.items) if idx not in removed]
+        items.extend(delta.items)
+        self.items: Tuple[Dict, ...] = tuple(items)
+        # Рівні оцінки розв'язуються порядком додавання в довідник, а не
+        # позицією в знімку: інакше змінена категорія (у дельті) програвала б
+        # після upsert і вигравала б після повного перезавантаження
+        self._sequence = sequence
+        self._order = [sequence[str(item["id"])] for item in items]
+        
+        self._positions: Dict[str, Tuple[str, int]] = {}
+        for idx, item in enumerate(base.items):
+            if idx not in removed:
+                self._positions[str(item["id"])] = ("base", idx)
+        for idx, item in enumerate(delta.items):
+            self._positions[str(item["id"])] = ("delta", idx)
+        
+        # Важкі бекенди будуються ліниво, один раз на знімок
+        self._backends: Dict[str, object] = {}
+        self._backends_lock = threading.Lock()
+        self._index_bytes: Optional[int] = None
+        self._fingerprint: Optional[str] = None
+    
+    @classmethod
+    def compile(cls, items: List[Dict], sequence: Optional[Dict[str, int]] = None) -> "ClassifierSnapshot":
+        """
+        Повна компіляція знімка
+        
+        Args:
+            items: Категорії у порядку довідника
+            sequence: Порядкові номери категорій (за замовчуванням - позиція в items)
+        """
+        if sequence is None:
+            sequence = {str(item["id"]): idx for idx, item in enumerate(items)}
+        return cls(KeywordIndex(items), KeywordIndex([]), frozenset(), sequence)
+    
+    def __len__(self) -> int:
+        return len(self.items)
+    
+    def __contains__(self, item_id) -> bool:
+        return str(item_id) in self._positions
+    
+    def with_item(self, item: Dict, compact_threshold: int) -> "ClassifierSnapshot":
+        """Новий знімок з доданою або оновленою категорією"""
+        item_id = str(item["id"])
+        removed = self.removed
+        location = self._positions.get(item_id)
+        if location and location[0] == "base":
+            removed = removed | {location[1]}
+        
+        delta_items = [i for i in self.delta.items if str(i["id"]) != item_id]
+        delta_items.append(item)
+        
+        # Оновлена категорія зберігає своє місце в порядку, нова - в кінці
+        sequence = self._sequence
+        if item_id not in sequence:
+            sequence = dict(sequence)
+            sequence[item_id] = max(sequence.values(), default=-1) + 1
+        return self._patched(delta_items, removed, sequence, compact_threshold)
+    
+    def without_item(self, item_id, compact_threshold: int) -> "ClassifierSnapshot":
+        """Новий знімок без категорії"""
+        item_id = str(item_id)
+        location = self._positions.get(item_id)
+        if location is None:
+            return self
+        
+        removed = self.removed
+        delta_items = list(self.delta.items)
+        if location[0] == "base":
+            removed = removed | {location[1]}
+        else:
+            delta_items = [i for i in delta_items if str(i["id"]) != item_id]
+        
+        # Повторно додана категорія стане в кінець, як нова
+        sequence = dict(self._sequence)
+        del sequence[item_id]
+        return self._patched(delta_items, removed, sequence, compact_threshold)
+    
+    def _patched(self, delta_items: List[Dict], removed: FrozenSet[int], sequence: Dict[str, int],
+                 compact_threshold: int) -> "ClassifierSnapshot":
+        if len(delta_items) + len(removed) > compact_threshold:
+            items = [item for idx, item in enumerate(self.base.items) if idx not in removed]
+            items.extend(delta_items)
+            items.sort(key=lambda item: sequence[str(item["id"])])
+            return ClassifierSnapshot.compile(items, sequence)
+        return ClassifierSnapshot(self.base, KeywordIndex(delta_items), removed, sequence)
+    
+    def source_items(self) -> List[Dict]:
+        """Категорії у порядку додавання в довідник (а не в порядку позицій знімка)"""
+        return [self.items[pos] for pos in sorted(range(len(self.items)), key=self._order.__getitem__)]
+    
+    def fingerprint(self) -> str:
+        """
+        Хеш вмісту довідника знімка (не залежить від порядку категорій)
+        
+        На відміну від version (лічильник процесу), однаковий для того
+        самого довідника після перезапуску та в різних процесах.
+        """
+        if self._fingerprint is None:
+            digest = hashlib.sha256()
+            for text in sorted(json.dumps(item, ensure_ascii=False, sort_keys=True, default=str) for item in self.items):
+                digest.update(text.encode("utf-8"))
+                digest.update(b"\0")
+            self._fingerprint = digest.hexdigest()[:32]
+        return self._fingerprint
+    
+    def memory_bytes(self) -> int:
+        """
+        Оцінка пам'яті знімка: індекси ключових слів та побудовані бекенди
+        
+        Наближення для бюджету пам'яті тенантів, а не точний облік.
+        """
+        if self._index_bytes is None:
+            source = sum(len(json.dumps(item, ensure_ascii=False, default=str)) for item in self.items)
+            self._index_bytes = source * self.INDEX_MEMORY_FACTOR
+        
+        size = self._index_bytes
+        for backend in list(self._backends.values()):
+            matrix = getattr(backend, "matrix", None)
+            if matrix is None:
+                continue
+            if hasattr(matrix, "indptr"):
+                # Розріджена матриця TF-IDF та її транспонована копія
+                size += 2 * (matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes)
+            else:
+                size += matrix.nbytes
+            size += 100 * len(getattr(backend, "vocabulary", ()))
+        return size
+    
+    def scores(self, query: str) -> Dict[int, float]:
+        """Оцінки категорій зі збігами: {позиція в items: оцінка}"""
+        scores: Dict[int, float] = {}
+        
+        if self.removed:
+            # Позиція в items зсувається на кількість прихованих категорій перед нею
+            for idx, score in self.base.scores(query).items():
+                if idx not in self.removed:
+                    scores[idx - bisect.bisect_left(self._hidden, idx)] = score
+        else:
+            scores.update(self.base.scores(query))
+        
+        offset = len(self.base) - len(self.removed)
+        for idx, score in self.delta.scores(query).items():
+            scores[offset + idx] = score
+        
+        return scores
+    
+    def tfidf(self) -> TfidfBackend:
+        """TF-IDF бекенд над категоріями знімка"""
+        backend = self._backends.get("tfidf")
+        if backend is None:
+            with self._backends_lock:
+                backend = self._backends.get("tfidf")
+                if backend is None:
+                    backend = self._backends["tfidf"] = TfidfBackend(list(self.items))
+        return backend
+    
+    def embeddings(self, previous: Optional["ClassifierSnapshot"] = None) -> Optional[EmbeddingBackend]:
+        """
+        Embedding бекенд над категоріями знімка
+        
+        Args:
+            previous: Попередній знімок - незмінені категорії не перекодовуються
+        
+        Returns:
+            EmbeddingBackend або None, якщо модель недоступна
+        """
+        backend = self._backends.get("embedding")
+        if backend is None:
+            model = get_embedding_model()
+            if model is None:
+                return None
+            with self._backends_lock:
+                backend = self._backends.get("embedding")
+                if backend is None:
+                    reuse = previous._backends.get("embedding") if previous is not None else None
+                    backend = self._backends["embedding"] = EmbeddingBackend(list(self.items), model, reuse)
+        return backend
+    
+    def ranked(self, scores: Dict[int, float]) -> List[int]:
+        """Позиції за спаданням оцінки; при рівних - у порядку додавання в довідник"""
+        return sorted(scores, key=lambda pos: (-scores[pos], self._order[pos]))
+    
+    def best_match(self, query: str) -> Tuple[Optional[Dict], float]:
+        """Найкраща категорія; при рівних оцінках перемагає та, що раніше в довіднику"""
+        scores = self.scores(query)
+        if not scores:
+            return None, 0.0
+        best = min(scores, key=lambda pos: (-scores[pos], self._order[pos]))
+        return self.items[best], scores[best]
+
+
+class QueryClassifier:
+    """
+    Класифікатор запитів громадян
+    
+    Працює з незмінними знімками: читачі беруть поточний знімок одним
+    посиланням, зміни довідника публікують новий знімок атомарною заміною.
+    """
+    
+    # Максимальний розмір дельти (змінені + видалені) до компактування
+    COMPACT_MIN_THRESHOLD = 64
+    COMPACT_RATIO = 0.1
+    
+    def __init__(self, items: Optional[List[Dict]] = None, source=None):
+        """
+        Args:
+            items: Категорії (інакше завантажуються з довідника)
+            source: Сховище довідника з get_classifiers() (за замовчуванням - SQLite
+                    сховище, у яке пишуть CRUD ендпоінти)
+        """
+        self._lock = threading.Lock()
+        self.source = source
+        self.cascade_stats = CascadeStats()
+        self._embedding_unavailable_logged = False
+        # Один фоновий потік embeddings: зміни довідника поспіль зливаються
+        # в побудову матриці лише для останнього знімка
+        self._embeddings_lock = threading.Lock()
+        self._embeddings_target: Optional[ClassifierSnapshot] = None
+        self._embeddings_thread: Optional[threading.Thread] = None
+        self._embedded: Optional[ClassifierSnapshot] = None
+        self.cache = ClassificationCache(settings.CLASSIFY_CACHE_SIZE, settings.CLASSIFY_CACHE_MAX_QUERY_LENGTH)
+        if items is None:
+            self._load_data()
+        else:
+            self._publish(ClassifierSnapshot.compile(items))
+    
+    @property
+    def snapshot(self) -> ClassifierSnapshot:
+        """Поточний знімок класифікатора"""
+        return self._snapshot
+    
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
+    
+    @property
+    def data(self) -> Tuple[Dict, ...]:
+        """Активні категорії поточного знімка"""
+        return self._snapshot.items
     
     def _load_data(self):
         """Завантаження даних з довідника"""
         try:
-            from references import storage
-            self.data = storage.get_classifiers(active_only=True)
-            if not self.data:
+            source = self.source
+            if source is None:
+                from storage import storage as source
+            data = source.get_classifiers(active_only=True)
+            if not data:
                 print("[Classifier] Довідник порожній, використовую резервні дані")
-                self.data = FALLBACK_CLASSIFIER_DATA
+                data = FALLBACK_CLASSIFIER_DATA
             else:
-                print(f"[Classifier] Завантажено {len(self.data)} категорій з довідника")
+                print(f"[Classifier] Завантажено {len(data)} категорій з довідника")
         except Exception as e:
             print(f"[Classifier] Помилка завантаження довідника: {e}")
-            self.data = FALLBACK_CLASSIFIER_DATA
+            data = FALLBACK_CLASSIFIER_DATA
+        
+        # Компіляція поза блокуванням, публікація - атомарна заміна посилання
+        snapshot = ClassifierSnapshot.compile(data)
+        with self._lock:
+            self._publish(snapshot)
     
     def reload(self):
         """Перезавантажити дані з довідника"""
         self._load_data()
     
+    def _publish(self, snapshot: ClassifierSnapshot) -> int:
+        """
+        Опублікувати новий знімок (викликається під self._lock)
+        
+        Якщо embedding бекенд увімкнено, матриця категорій нового знімка
+        обчислюється у фоні одразу після зміни довідника (_build_embeddings).
+        
+        Returns:
+            Версія опублікованого знімка
+        """
+        previous = getattr(self, "_snapshot", None)
+        self._snapshot = snapshot
+        self.cache.clear()
+        
+        if settings.NLU_EMBEDDINGS_ENABLED and snapshot is not previous:
+            with self._embeddings_lock:
+                self._embeddings_target = snapshot
+                if self._embeddings_thread is None:
+                    self._embeddings_thread = threading.Thread(
+                        target=self._build_embeddings, name="classifier-embeddings", daemon=True
+                    )
+                    self._embeddings_thread.start()
+        
+        return snapshot.version
+    
+    def _build_embeddings(self):
+        """
+        Фонова побудова embeddings для останнього опублікованого знімка
+        
+        Знімки, замінені до початку побудови, пропускаються; незмінені
+        категорії беруться з останнього побудованого знімка.
+        """
+        while True:
+            with self._embeddings_lock:
+                snapshot = self._embeddings_target
+                self._embeddings_target = None
+                if snapshot is None:
+                    self._embeddings_thread = None
+                    return
+            try:
+                if snapshot.embeddings(self._embedded) is not None:
+                    self._embedded = snapshot
+            except Exception as e:
+                print(f"[Classifier] Помилка побудови embeddings v{snapshot.version}: {e}")
+    
+    @property
+    def threads(self) -> int:
+        """Живі фонові потоки класифікатора (для оцінки пам'яті тенанта)"""
+        thread = self._embeddings_thread
+        return int(thread is not None and thread.is_alive())
+    
+    def memory_bytes(self) -> int:
+        """Оцінка пам'яті: поточний знімок та кеш результатів"""
+        return self._snapshot.memory_bytes() + len(self.cache) * ClassificationCache.ENTRY_BYTES
+    
+    def _compact_threshold(self, snapshot: ClassifierSnapshot) -> int:
+        return max(self.COMPACT_MIN_THRESHOLD, int(len(snapshot.base) * self.COMPACT_RATIO))
+    
+    def upsert_item(self, item: Dict) -> int:
+        """
+        Додати або оновити категорію без повного перезавантаження
+        
+        Returns:
+            Версія нового знімка
+        """
+        if not item.get("is_active", True):
+            return self.remove_item(item["id"])
+        
+        with self._lock:
+            snapshot = self._snapshot
+            return self._publish(snapshot.with_item(item, self._compact_threshold(snapshot)))
+    
+    def remove_item(self, item_id) -> int:
+        """
+        Видалити категорію без повного перезавантаження
+        
+        Returns:
+            Версія нового знімка
+        """
+        with self._lock:
+            snapshot = self._snapshot
+            return self._publish(snapshot.without_item(item_id, self._compact_threshold(snapshot)))
+    
     def _calculate_score(self, query: str, item: Dict) -> float:
-        """Розрахунок релевантності запиту до категорії"""
-        query_lower = query.lower()
-        score = 0.0
-        
-        # Перевірка ключових слів
-        keywords = item.get("keywords", [])
-        matched_keywords = sum(1 for kw in keywords if kw in query_lower)
-        
-        if matched_keywords > 0:
-            score += matched_keywords * 0.15
-        
-        # Перевірка підтипу
-        subtype_words = item["subtype"].lower().split()
-        if any(word in query_lower for word in subtype_words):
-            score += 0.2
-        
-        # Перевірка типу
-        type_words = item["type"].lower().split()
-        if any(word in query_lower for word in type_words if len(word) > 3):
-            score += 0.1
-        
-        return min(score, 1.0)
-    
-    def classify(self, query: str) -> ClassificationResult:
-        """Класифікація запиту"""
-        best_match = None
-        highest_score = 0.0
-        
-        for item in self.data:
-            score = self._calculate_score(query, item)
-            if score > highest_score:
-                highest_score = score
-                best_match = item
-        
-        if best_match and highest_score > 0.2:
-            # Підтримка обох форматів: executor та executor_name
-            executor = best_match.get("executor_name") or best_match.get("executor", "Не визначено")
-            return ClassificationResult(
-                id=str(best_match["id"]),
-                problem=best_match["problem"],
-                type=best_match["type"],
-                subtype=best_match["subtype"],
-                location=best_match.get("location"),
-                response=best_match["response"],
-                executor=executor,
-                urgency=best_match["urgency"],
-                response_time=best_match["response_time"],
-                confidence=min(0.95, 0.5 + highest_score),
-                needs_operator=False
+        """
+        Розрахунок релевантності запиту до однієї категорії
+        
+        Прямий пошук підрядків; використовується як еталон для індексу
+        """
+        return keyword_score(*keyword_features(normalize_query(query), item))
+    
+    def classify(self, query: str, backend: Optional[str] = None) -> ClassificationResult:
+        """
+        Класифікація запиту
+        
+        Args:
+            query: Текст запиту
+            backend: keyword або tfidf (за замовчуванням settings.NLU_BACKEND)
+        """
+        return self.classify_batch([query], backend)[0]
+    
+    def classify_batch(self, queries: List[str], backend: Optional[str] = None) -> List[ClassificationResult]:
+        """
+        Класифікація пакета запитів
+        
+        Для TF-IDF та embeddings весь пакет обробляється одним
+        множенням матриць (та одним проходом енкодера).
+        """
+        backend = backend or settings.NLU_BACKEND
+        return self._classify_cached(
+            queries, backend,
+            lambda snapshot, texts: self._classify_batch(snapshot, texts, backend)
+        )
+    
+    def _classify_cached(self, queries: List[str], mode: str, classify_func) -> List[ClassificationResult]:
+        """
+        Класифікація через кеш з ключем - нормалізованим запитом
+        
+        Нормалізований текст лише ключ кешу: класифікується вихідний запит
+        (перший з пакета для кожного ключа), тому бекенди бачать текст так
+        само, як без кешу. Промахи пакета (без повторів) класифікуються
+        одним викликом classify_func(snapshot, texts).
+        """
+        # Один знімок на весь запит - паралельна заміна його не зачіпає
+        snapshot = self._snapshot
+        cache = self.cache
+        results: List[Optional[ClassificationResult]] = [None] * len(queries)
+        
+        missing: Dict[str, List[int]] = {}
+        for pos, query in enumerate(queries):
+            key = normalize_query(query)
+            if key in missing:
+                missing[key].append(pos)
+                continue
+            if cache.cacheable(key):
+                cached = cache.get((snapshot.version, mode, key))
+                if cached is not None:
+                    results[pos] = cached
+                    continue
+            missing[key] = [pos]
+        
+        if missing:
+            keys = list(missing)
+            texts = [queries[missing[key][0]] for key in keys]
+            for key, result in zip(keys, classify_func(snapshot, texts)):
+                if cache.cacheable(key):
+                    cache.put((snapshot.version, mode, key), result)
+                for pos in missing[key]:
+                    results[pos] = result
+        
+        return results
+    
+    def _classify_batch(self, snapshot: ClassifierSnapshot, queries: List[str], backend: str) -> List[ClassificationResult]:
+        """Класифікація пакета одним бекендом без кешу"""
+        similarity_backend = self._similarity_backend(snapshot, backend)
+        if similarity_backend is not None:
+            impl, min_similarity = similarity_backend
+            items = snapshot.items
+            results = []
+            for idx, similarity in impl.best_matches(queries):
+                if idx >= 0 and similarity >= min_similarity:
+                    confidence = min(0.95, 0.5 + similarity / 2)
+                    results.append(self._make_result(items[idx], confidence, snapshot, backend))
+                else:
+                    results.append(self._operator_result(snapshot, backend))
+            return results
+        
+        results = []
+        for query in queries:
+            # Один прохід автомата дає оцінки всіх категорій зі збігами
+            best_match, highest_score = snapshot.best_match(query)
+            if best_match and highest_score > 0.2:
+                confidence = min(0.95, 0.5 + highest_score)
+                results.append(self._make_result(best_match, confidence, snapshot, "keyword"))
+            else:
+                results.append(self._operator_result(snapshot, "keyword"))
+        return results
+    
+    def classify_cascade(self, query: str) -> ClassificationResult:
+        """Класифікація запиту каскадом (див. classify_cascade_batch)"""
+        return self.classify_cascade_batch([query])[0]
+    
+    def classify_cascade_batch(self, queries: List[str]) -> List[ClassificationResult]:
+        """
+        Двоетапна класифікація
+        
+        1. Ключові слова: якщо впевненість >= NLU_CONFIDENCE_THRESHOLD і
+           відрив від другої категорії >= NLU_CASCADE_MARGIN, відповідь
+           повертається одразу.
+        2. Решта запитів (неоднозначні або з низькою впевненістю) пакетом
+           передаються важчому бекенду (embedding або TF-IDF), обмеженому
+           top-k кандидатами першого етапу. Якщо кандидатів немає,
+           порівняння йде з усіма категоріями.
+        
+        Повтори з кешу не проходять етапи і не потрапляють у метрики
+        каскаду (див. метрики кешу).
+        """
+        return self._classify_cached(queries, "cascade", self._classify_cascade_batch)
+    
+    def _classify_cascade_batch(self, snapshot: ClassifierSnapshot, queries: List[str]) -> List[ClassificationResult]:
+        """Каскадна класифікація пакета без кешу"""
+        stats = self.cascade_stats
+        heavy_name = self._cascade_backend_name(snapshot)
+        results: List[Optional[ClassificationResult]] = [None] * len(queries)
+        escalated = []
+        
+        for pos, query in enumerate(queries):
+            started = time.perf_counter()
+            scores = snapshot.scores(query)
+            ranked = snapshot.ranked(scores)
+            top = scores[ranked[0]] if ranked else 0.0
+            second = scores[ranked[1]] if len(ranked) > 1 else 0.0
+            
+            keyword_result = None
+            if top > 0.2:
+                keyword_result = self._make_result(snapshot.items[ranked[0]], min(0.95, 0.5 + top), snapshot, "keyword")
+            
+            confident = (
+                keyword_result is not None
+                and keyword_result.confidence >= settings.NLU_CONFIDENCE_THRESHOLD
+                and top - second >= settings.NLU_CASCADE_MARGIN
             )
+            stats.record("keyword", time.perf_counter() - started, answered=confident or heavy_name is None)
+            
+            if confident or heavy_name is None:
+                results[pos] = keyword_result or self._operator_result(snapshot, "keyword")
+            else:
+                escalated.append((pos, ranked[:settings.NLU_CASCADE_TOP_K], keyword_result))
+        
+        if escalated:
+            self._cascade_second_stage(snapshot, heavy_name, queries, escalated, results)
+        
+        for result in results:
+            stats.record_query(result.needs_operator)
+        return results
+    
+    def _cascade_second_stage(self, snapshot: ClassifierSnapshot, backend: str, queries: List[str], escalated: List, results: List):
+        """Другий етап каскаду для пакета неоднозначних запитів"""
+        started = time.perf_counter()
+        impl, min_similarity = self._similarity_backend(snapshot, backend)
+        
+        # Якщо всі запити мають кандидатів - рахуємо схожість лише з ними
+        columns = None
+        if all(candidates for _, candidates, _ in escalated):
+            columns = sorted({idx for _, candidates, _ in escalated for idx in candidates})
+        column_of = {idx: col for col, idx in enumerate(columns)} if columns else None
+        
+        sims = impl.similarities([queries[pos] for pos, _, _ in escalated], columns)
         
-        # Запит потребує оператора
+        answered = []
+        for row, (pos, candidates, keyword_result) in enumerate(escalated):
+            if candidates:
+                cols = [column_of[idx] if column_of else idx for idx in candidates]
+                best = max(range(len(candidates)), key=lambda i: (sims[row, cols[i]], -i))
+                best_idx, similarity = candidates[best], float(sims[row, cols[best]])
+            else:
+                best_idx = int(sims[row].argmax()) if sims.shape[1] else -1
+                similarity = float(sims[row, best_idx]) if best_idx >= 0 else 0.0
+            
+            if best_idx >= 0 and similarity >= min_similarity:
+                confidence = min(0.95, 0.5 + similarity / 2)
+                results[pos] = self._make_result(snapshot.items[best_idx], confidence, snapshot, backend)
+                answered.append(True)
+            else:
+                # Важкий етап не впевнений - залишаємо відповідь першого етапу
+                results[pos] = keyword_result or self._operator_result(snapshot, backend)
+                answered.append(False)
+        
+        per_query = (time.perf_counter() - started) / len(escalated)
+        for hit in answered:
+            self.cascade_stats.record(backend, per_query, answered=hit)
+    
+    def _cascade_backend_name(self, snapshot: ClassifierSnapshot) -> Optional[str]:
+        """Бекенд другого етапу каскаду (None - каскад лише з ключових слів)"""
+        backend = settings.NLU_CASCADE_BACKEND
+        if backend in ("auto", "embedding") and get_embedding_model() is not None:
+            return "embedding"
+        if backend in ("auto", "tfidf") and TFIDF_AVAILABLE:
+            return "tfidf"
+        return None
+    
+    def _similarity_backend(self, snapshot: ClassifierSnapshot, backend: str):
+        """
+        Бекенд косинусної схожості та його поріг
+        
+        Returns:
+            (бекенд, мінімальна схожість) або None - тоді ключові слова
+        """
+        if backend == "tfidf" and TFIDF_AVAILABLE:
+            return snapshot.tfidf(), settings.TFIDF_MIN_SIMILARITY
+        if backend == "embedding":
+            impl = snapshot.embeddings()
+            if impl is not None:
+                return impl, settings.EMBEDDING_MIN_SIMILARITY
+            if not self._embedding_unavailable_logged:
+                self._embedding_unavailable_logged = True
+                print("[Classifier] Embedding модель недоступна, використовую ключові слова")
+        return None
+    
+    def _make_result(self, item: Dict, confidence: float, snapshot: ClassifierSnapshot, backend: str) -> ClassificationResult:
+        """Результат для знайденої категорії"""
+        # Підтримка обох форматів: executor та executor_name
+        executor = item.get("executor_name") or item.get("executor", "Не визначено")
+        return ClassificationResult(
+            id=str(item["id"]),
+            problem=item["problem"],
+            type=item["type"],
+            subtype=item["subtype"],
+            location=item.get("location"),
+            response=item["response"],
+            executor=executor,
+            urgency=item["urgency"],
+            response_time=item["response_time"],
+            confidence=confidence,
+            needs_operator=False,
+            snapshot_version=snapshot.version,
+            backend=backend
+        )
+    
+    def _operator_result(self, snapshot: ClassifierSnapshot, backend: str) -> ClassificationResult:
+        """Запит потребує оператора"""
         return ClassificationResult(
             id=0,
             problem="Загальне питання",
@@ -260,7 +1069,9 @@ class QueryClassifier:
             urgency="standard",
             response_time=0,
             confidence=0.3,
-            needs_operator=True
+            needs_operator=True,
+            snapshot_version=snapshot.version,
+            backend=backend
         )
 
 
@@ -268,6 +1079,58 @@ class QueryClassifier:
 classifier = QueryClassifier()
 
 
-def classify_query(query: str) -> ClassificationResult:
-    """Класифікувати запит громадянина"""
-    return classifier.classify(query)
+def _with_address(result: ClassificationResult, query: str) -> ClassificationResult:
+    """
+    Додати адресу з транскрипту
+
+    Результати можуть бути спільними (кеш), тому адреса додається
+    до копії, а не до самого результату.
+    """
+    address = extract_address(query)
+    return replace(result, address=address) if address else result
+
+
+def classify_query(query: str, query_classifier: Optional[QueryClassifier] = None) -> ClassificationResult:
+    """
+    Класифікувати запит громадянина (каскадом, якщо увімкнено)
+    
+    Args:
+        query: Текст запиту
+        query_classifier: Класифікатор тенанта (за замовчуванням - глобальний)
+    """
+    query_classifier = query_classifier or classifier
+    if settings.NLU_CASCADE_ENABLED:
+        result = query_classifier.classify_cascade(query)
+    else:
+        result = query_classifier.classify(query)
+    return _with_address(result, query)
+
+
+def classify_queries(queries: List[str], query_classifier: Optional[QueryClassifier] = None) -> List[ClassificationResult]:
+    """Класифікувати пакет запитів"""
+    query_classifier = query_classifier or classifier
+    if settings.NLU_CASCADE_ENABLED:
+        results = query_classifier.classify_cascade_batch(queries)
+    else:
+        results = query_classifier.classify_batch(queries)
+    return [_with_address(result, query) for result, query in zip(results, queries)]
+
+
+def classification_to_dict(result: ClassificationResult) -> Dict:
+    """Серіалізація результату класифікації (разом з версією знімка та бекендом для аудиту)"""
+    return {
+        "id": result.id,
+        "problem": result.problem,
+        "type": result.type,
+        "subtype": result.subtype,
+        "location": result.location,
+        "response": result.response,
+        "executor": result.executor,
+        "urgency": result.urgency,
+        "response_time": result.response_time,
+        "confidence": result.confidence,
+        "needs_operator": result.needs_operator,
+        "snapshot_version": result.snapshot_version,
+        "backend": result.backend,
+        "address": result.address
+    }
@@ -29,9 +29,59 @@ class Settings(BaseModel):
     FISH_SPEECH_DEVICE: str = "cuda"
     FISH_SPEECH_SAMPLE_RATE: int = 44100
     
+    # Потокова відправка відповіді та barge-in
+    TTS_STREAM_CHUNK_SIZE: int = 16384  # байт в одному бінарному повідомленні
+    BARGE_IN_ENABLED: bool = True
+    
     # Класифікатор NLU
     NLU_MODEL: str = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
     NLU_CONFIDENCE_THRESHOLD: float = 0.7
+    NLU_BACKEND: str = "keyword"  # keyword, tfidf, embedding
+    TFIDF_MIN_SIMILARITY: float = 0.2
+    
+    # Embedding бекенд (модель лише з локального шляху)
+    NLU_MODEL_PATH: Optional[str] = None  # напр. ./models/paraphrase-multilingual-MiniLM-L12-v2
+    NLU_DEVICE: str = "cpu"
+    NLU_BATCH_SIZE: int = 64
+    NLU_EMBEDDINGS_ENABLED: bool = False  # обчислювати матрицю категорій при зміні довідника
+    NLU_EMBEDDINGS_CACHE_DIR: str = "./data/embeddings"
+    EMBEDDING_MIN_SIMILARITY: float = 0.45
+    
+    # Каскад: ключові слова -> важкий бекенд для неоднозначних запитів.
+    # Вимкнено за замовчуванням: з каскадом запити, які ключові слова не
+    # розпізнали (раніше - оператору), отримують автовідповідь TF-IDF/embedding
+    NLU_CASCADE_ENABLED: bool = False
+    NLU_CASCADE_BACKEND: str = "auto"  # auto, embedding, tfidf
+    NLU_CASCADE_TOP_K: int = 5
+    NLU_CASCADE_MARGIN: float = 0.1  # мінімальний відрив від другої категорії
+    FUZZY_KEYWORD_WEIGHT: float = 0.0  # вага нечіткого збігу ключового слова (0 - вимкнено, оцінка як у базовому алгоритмі)
+    FUZZY_MIN_KEYWORD_LENGTH: int = 5
+    CLASSIFY_BATCH_MAX_QUERIES: int = 10000
+    CLASSIFY_BATCH_CHUNK_SIZE: int = 256  # запитів на один векторизований виклик
+    CLASSIFY_CACHE_SIZE: int = 10000  # 0 - кеш вимкнено
+    CLASSIFY_CACHE_MAX_QUERY_LENGTH: int = 256
+    RECLASSIFY_CHUNK_SIZE: int = 500
+    RECLASSIFY_MAX_DUTY: float = 0.5  # частка часу, яку займає фонова перекласифікація
+    LOCATION_EXTRACTION_ENABLED: bool = True  # витяг адреси з транскрипту
+    GAZETTEER_PATH: Optional[str] = None  # CSV газетира вулиць (None - зразок з resources/)
+    
+    # Інциденти (групування масових звернень)
+    INCIDENTS_ENABLED: bool = True
+    INCIDENT_WINDOW_SECONDS: int = 1800  # інцидент закривається без дзвінків довше за вікно
+    INCIDENT_MIN_CALLS: int = 3  # після скількох дзвінків інцидент вважається відомим
+    INCIDENT_LOCATION_LEVEL: str = "district"  # district або street
+    INCIDENT_HISTORY_SIZE: int = 100  # скільки закритих інцидентів зберігати
+    INCIDENT_KNOWN_RESPONSE: str = "Дякуємо за звернення. Ми вже знаємо про проблему: {problem} ({location}). Аварійні служби працюють над її усуненням, повторно реєструвати звернення не потрібно."
+    
+    # Тенанти (окремі гарячі лінії)
+    DEFAULT_TENANT_ID: str = "default"
+    TENANT_IDS: str = ""  # через кому; також - бази *.db у TENANT_DATA_DIR
+    TENANT_DATA_DIR: str = "./tenants"
+    TENANT_MEMORY_BUDGET_MB: float = 512  # класифікатори, аудіо, потоки та з'єднання всіх тенантів
+    TENANT_IDLE_SECONDS: int = 600  # після скількох секунд без запитів тенант можна закрити при витісненні
+    # Ключі доступу до тенантів: "city:ключ,utilities:ключ" - пароль HTTP Basic (для WebSocket - ?key=)
+    # разом з X-Tenant-ID; тенант без ключа доступний лише адміністратору
+    TENANT_API_KEYS: str = ""
     
     # Oracle APEX інтеграція
     ORACLE_APEX_URL: Optional[str] = None
@@ -40,6 +90,23 @@ class Settings(BaseModel):
     
     # База даних
     DATABASE_URL: str = "sqlite+aiosqlite:///./cti_agent.db"
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_CACHE_SIZE_KB: int = 16384  # кеш сторінок на з'єднання
+    SQLITE_MMAP_SIZE_MB: int = 256
+    SQLITE_CACHED_STATEMENTS: int = 256  # підготовлені запити на з'єднання
+    SQLITE_BUSY_TIMEOUT: float = 5.0  # секунд очікування блокування запису
+    STORAGE_READ_THREADS: int = 4  # потоки читання асинхронного сховища
+    CALL_WRITER_BATCH_SIZE: int = 256  # записів дзвінків в одній транзакції
+    CALL_WRITER_FLUSH_MS: int = 50  # максимальна затримка запису в історію
+    CALL_WRITER_MAX_PENDING: int = 10000  # розмір буфера (далі - очікування)
+    CALL_RECORD_DURABLE: bool = False  # чекати фіксації транзакції перед відповіддю
+    ROLLUP_MINUTE_RETENTION_DAYS: int = 7  # хвилинні агрегати статистики (0 - зберігати все)
+    SEARCH_RANK_WINDOW: int = 1000  # пошук: bm25 серед стількох найновіших збігів (0 - усі)
+    ARCHIVE_HOT_MONTHS: int = 0  # місяців історії в гарячій таблиці, старші - в архівні бази (0 - не архівувати)
+    ARCHIVE_RETENTION_MONTHS: int = 0  # скільки місяців історії зберігати взагалі (0 - без обмеження)
+    ARCHIVE_BATCH_SIZE: int = 5000  # записів на порцію перенесення в архів
+    EXPORT_BATCH_SIZE: int = 1000  # експорт історії: записів на порцію курсора / рядків у групі Parquet
     
     # API Аутентифікація
     API_USERNAME: str = "api_user"
@@ -0,0 +1,205 @@
+"""
+Бекенд класифікації на sentence-embeddings
+Багатомовна модель MiniLM з локального шляху, попередньо обчислена
+матриця нормалізованих векторів категорій
+"""
+import hashlib
+import os
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from config import settings
+
+# Спроба імпорту sentence-transformers (опціонально)
+try:
+    import numpy as np
+    from sentence_transformers import SentenceTransformer
+    EMBEDDINGS_AVAILABLE = True
+except ImportError:
+    EMBEDDINGS_AVAILABLE = False
+
+
+_model = None
+_model_lock = threading.Lock()
+
+# Скільки матриць зберігати в кеші (кожна зміна довідника - новий файл)
+CACHE_MAX_FILES = 32
+
+
+def get_embedding_model():
+    """
+    Ліниве завантаження моделі з локального шляху (без завантаження з мережі)
+
+    Returns:
+        SentenceTransformer або None, якщо модель недоступна
+    """
+    global _model
+    if _model is not None or not EMBEDDINGS_AVAILABLE:
+        return _model
+
+    path = settings.NLU_MODEL_PATH
+    if not path or not os.path.isdir(path):
+        return None
+
+    with _model_lock:
+        if _model is None:
+            try:
+                print(f"[Embeddings] Завантаження моделі з {path}...")
+                _model = SentenceTransformer(path, device=settings.NLU_DEVICE)
+                print("[Embeddings] ✅ Модель завантажено")
+            except Exception as e:
+                print(f"[Embeddings] ❌ Помилка завантаження моделі: {e}")
+                _model = None
+    return _model
+
+
+def category_text(item: Dict) -> str:
+    """Текстовий опис категорії для кодування"""
+    parts = [item.get("problem"), item.get("type"), item.get("subtype")]
+    text = ". ".join(part for part in parts if part)
+    keywords = item.get("keywords", [])
+    if keywords:
+        text += ": " + ", ".join(keywords)
+    return text
+
+
+def model_key() -> str:
+    """Ключ моделі для кешу: шлях, з якого її завантажено (NLU_MODEL лише назва)"""
+    return os.path.realpath(settings.NLU_MODEL_PATH) if settings.NLU_MODEL_PATH else settings.NLU_MODEL
+
+
+def reference_fingerprint(items: Sequence[Dict], model: str) -> str:
+    """Версія довідника для кешу: хеш текстів категорій та моделі"""
+    digest = hashlib.sha256(model.encode("utf-8"))
+    for item in items:
+        digest.update(b"\0")
+        digest.update(str(item.get("id")).encode("utf-8"))
+        digest.update(b"\1")
+        digest.update(category_text(item).encode("utf-8"))
+    return digest.hexdigest()[:32]
+
+
+class EmbeddingBackend:
+    """
+    Матриця нормалізованих embeddings категорій
+
+    Матриця обчислюється при зміні довідника і зберігається на диску під
+    ключем версії довідника та шляху моделі, тому перезапуск процесу її не
+    перераховує. Файл попереднього знімка видаляється, а кеш обмежено
+    CACHE_MAX_FILES найновішими файлами.
+    Класифікація запиту - один прохід енкодера та одне множення
+    матриці на вектор.
+    """
+
+    def __init__(self, items: Sequence[Dict], model, previous: Optional["EmbeddingBackend"] = None):
+        self.model = model
+        self.fingerprint = reference_fingerprint(items, model_key())
+        self.texts = [category_text(item) for item in items]
+        self.matrix = self._load_or_compute(previous)
+
+    @property
+    def cache_path(self) -> str:
+        return os.path.join(settings.NLU_EMBEDDINGS_CACHE_DIR, f"{self.fingerprint}.npy")
+
+    def _load_or_compute(self, previous: Optional["EmbeddingBackend"]):
+        path = self.cache_path
+        if os.path.exists(path):
+            try:
+                matrix = np.load(path, mmap_mode="r")
+                if matrix.shape == (len(self.texts), self.model.get_sentence_embedding_dimension()):
+                    print(f"[Embeddings] Матрицю категорій завантажено з кешу: {path}")
+                    return matrix
+                print(f"[Embeddings] Кеш {path} не відповідає моделі {matrix.shape}, перераховую")
+            except Exception as e:
+                print(f"[Embeddings] Пошкоджений кеш {path}: {e}")
+
+        matrix = self._compute(previous)
+
+        try:
+            os.makedirs(settings.NLU_EMBEDDINGS_CACHE_DIR, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, matrix)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"[Embeddings] Не вдалося зберегти кеш: {e}")
+
+        self._prune_cache(previous)
+        return matrix
+
+    def _prune_cache(self, previous: Optional["EmbeddingBackend"]):
+        """
+        Видалити файл попереднього знімка та найстаріші понад CACHE_MAX_FILES
+
+        Матриця попереднього знімка вже в пам'яті (mmap лишається дійсним
+        після видалення файлу), а перезапуск відкриє лише поточну версію.
+        """
+        directory = settings.NLU_EMBEDDINGS_CACHE_DIR
+        try:
+            stale = []
+            if previous is not None and previous.fingerprint != self.fingerprint:
+                stale.append(previous.cache_path)
+            files = sorted(
+                (os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".npy")),
+                key=os.path.getmtime, reverse=True
+            )
+            stale.extend(files[CACHE_MAX_FILES:])
+            for path in stale:
+                if path != self.cache_path and os.path.exists(path):
+                    os.remove(path)
+        except OSError as e:
+            print(f"[Embeddings] Не вдалося очистити кеш: {e}")
+
+    def _compute(self, previous: Optional["EmbeddingBackend"]):
+        """Кодування категорій; незмінені рядки беруться з попередньої матриці"""
+        dim = self.model.get_sentence_embedding_dimension()
+        matrix = np.zeros((len(self.texts), dim), dtype=np.float32)
+
+        reused: Dict[str, int] = {}
+        if previous is not None:
+            reused = {text: idx for idx, text in enumerate(previous.texts)}
+
+        missing = []
+        for idx, text in enumerate(self.texts):
+            prev_idx = reused.get(text)
+            if prev_idx is not None:
+                matrix[idx] = previous.matrix[prev_idx]
+            else:
+                missing.append(idx)
+
+        if missing:
+            print(f"[Embeddings] Кодування {len(missing)} категорій...")
+            encoded = self.encode([self.texts[idx] for idx in missing])
+            matrix[missing] = encoded
+
+        return matrix
+
+    def encode(self, texts: List[str]):
+        """Пакетне кодування у нормалізовані вектори float32"""
+        return self.model.encode(
+            texts,
+            batch_size=settings.NLU_BATCH_SIZE,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        ).astype(np.float32, copy=False)
+
+    def similarities(self, queries: List[str], candidates: Optional[Sequence[int]] = None):
+        """
+        Косинусна схожість запитів з категоріями
+
+        Args:
+            queries: Тексти запитів (кодуються одним пакетом)
+            candidates: Обмежити порівняння цими індексами категорій
+        """
+        vectors = self.encode(queries)
+        matrix = self.matrix if candidates is None else self.matrix[list(candidates)]
+        return vectors @ matrix.T
+
+    def best_matches(self, queries: List[str]) -> List[Tuple[int, float]]:
+        """Найближча категорія для кожного запиту"""
+        if len(self.texts) == 0:
+            return [(-1, 0.0) for _ in queries]
+        sims = self.similarities(queries)
+        best = sims.argmax(axis=1)
+        return [(int(idx), float(sims[row, idx])) for row, idx in enumerate(best)]
@@ -0,0 +1,132 @@
+"""
+Експорт історії дзвінків - NDJSON, CSV та Parquet
+Порції записів з StorageService.export_call_history перетворюються на
+байти по одній, тож пам'ять сервера не залежить від кількості записів
+"""
+import csv
+import io
+import json
+from typing import Iterable, Iterator, List
+
+from storage import StorageService
+
+# pyarrow потрібен лише для експорту в Parquet
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+    print("[Export] pyarrow НЕ встановлено - експорт у Parquet недоступний (pip install pyarrow)")
+
+
+COLUMNS = StorageService.HISTORY_COLUMNS
+CLASSIFICATION = COLUMNS.index("classification")
+
+# Формат -> (media type, розширення файлу)
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+Batches = Iterable[List[tuple]]
+
+
+def ndjson_chunks(batches: Batches) -> Iterator[bytes]:
+    """
+    Рядок JSON на запис
+
+    classification зі сховища вже є мінімізованим JSON і вставляється
+    в рядок як є (останнім полем), без json.loads/dumps на кожен запис.
+    """
+    for batch in batches:
+        lines = []
+        for row in batch:
+            record = {column: value for column, value in zip(COLUMNS, row) if column != "classification"}
+            lines.append(f'{json.dumps(record, ensure_ascii=False)[:-1]}, "classification": {row[CLASSIFICATION] or "null"}}}\n')
+        yield "".join(lines).encode("utf-8")
+
+
+def csv_chunks(batches: Batches) -> Iterator[bytes]:
+    """CSV із заголовком; classification - текст JSON у колонці"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for batch in batches:
+        writer.writerows(batch)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _ChunkSink:
+    """
+    Файловий об'єкт для ParquetWriter, що лише накопичує записане
+
+    Parquet пишеться послідовно: групи рядків, а метадані (footer) - у
+    кінці, тож записане після кожної групи можна одразу віддати клієнту
+    без тимчасового файлу.
+    """
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self) -> bool:
+        return True
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def parquet_chunks(batches: Batches) -> Iterator[bytes]:
+    """Parquet: група рядків на порцію, колонки - рядки, duration_seconds - int64"""
+    if not PYARROW_AVAILABLE:
+        raise RuntimeError("Експорт у Parquet потребує pyarrow")
+    schema = pa.schema([
+        (column, pa.int64() if column == "duration_seconds" else pa.string()) for column in COLUMNS
+    ])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    for batch in batches:
+        columns = [pa.array(values, type=field.type) for values, field in zip(zip(*batch), schema)]
+        writer.write_batch(pa.record_batch(columns, schema=schema))
+        yield sink.take()
+    writer.close()
+    yield sink.take()
+
+
+def export_chunks(export_format: str, batches: Batches) -> Iterator[bytes]:
+    """
+    Байти файлу експорту у форматі export_format
+
+    Raises:
+        ValueError: невідомий формат
+    """
+    if export_format == "ndjson":
+        return ndjson_chunks(batches)
+    if export_format == "csv":
+        return csv_chunks(batches)
+    if export_format == "parquet":
+        return parquet_chunks(batches)
+    raise ValueError(f"Невідомий формат експорту: {export_format} (доступні: {', '.join(EXPORT_FORMATS)})")
@@ -0,0 +1,268 @@
+"""
+Індекс інцидентів
+Масова аварія (район без води) дає сотні однакових дзвінків за кілька
+хвилин - дзвінки з тією ж категорією та місцем групуються в один
+інцидент у ковзному вікні, а повторні абоненти отримують заздалегідь
+синтезовану відповідь "ми вже знаємо, бригади працюють"
+"""
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict, deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import settings
+from classifier import ClassificationResult
+
+
+# Стани інциденту
+STATUS_OPEN = "open"
+STATUS_EXPIRED = "expired"  # вікно минуло без нових дзвінків
+STATUS_RESOLVED = "resolved"  # закрито диспетчером
+
+# Скільки останніх дзвінків та адрес зберігати в інциденті
+RECENT_CALLS = 20
+TOP_ADDRESSES = 10
+
+
+@dataclass
+class Incident:
+    """Група дзвінків про одну проблему в одному місці"""
+    id: str
+    key: Tuple[str, str]  # (категорія, місце)
+    category_id: str
+    problem: str
+    subtype: str
+    executor: str
+    urgency: str
+    location: str  # район або вулиця
+    district: Optional[str]
+    opened_at: float
+    last_seen: float
+    calls: int = 0
+    status: str = STATUS_OPEN
+    closed_at: Optional[float] = None
+    streets: Counter = field(default_factory=Counter)
+    addresses: Counter = field(default_factory=Counter)
+    recent_calls: deque = field(default_factory=lambda: deque(maxlen=RECENT_CALLS))
+    response: str = ""
+    audio: Any = None  # AudioBuffer відповіді (синтезується один раз)
+    rendering: bool = False
+
+    @property
+    def known(self) -> bool:
+        """Інцидент підтверджений - нові абоненти отримують відповідь про нього"""
+        return self.status == STATUS_OPEN and self.calls >= settings.INCIDENT_MIN_CALLS
+
+    def to_dict(self) -> Dict:
+        duration = (self.closed_at or self.last_seen) - self.opened_at
+        return {
+            "id": self.id,
+            "status": self.status,
+            "category_id": self.category_id,
+            "problem": self.problem,
+            "subtype": self.subtype,
+            "executor": self.executor,
+            "urgency": self.urgency,
+            "location": self.location,
+            "district": self.district,
+            "calls": self.calls,
+            "known": self.known,
+            "calls_per_minute": round(self.calls / max(duration / 60, 1), 2),
+            "opened_at": datetime.fromtimestamp(self.opened_at).isoformat(),
+            "last_seen": datetime.fromtimestamp(self.last_seen).isoformat(),
+            "closed_at": datetime.fromtimestamp(self.closed_at).isoformat() if self.closed_at else None,
+            "streets": dict(self.streets.most_common(TOP_ADDRESSES)),
+            "addresses": dict(self.addresses.most_common(TOP_ADDRESSES)),
+            "recent_calls": list(self.recent_calls),
+            "response": self.response,
+            "audio_ready": self.audio is not None,
+        }
+
+
+def location_key(address: Optional[Dict]) -> Optional[Tuple[str, Optional[str]]]:
+    """
+    Місце для групування дзвінків: район або вулиця (INCIDENT_LOCATION_LEVEL)
+
+    Returns:
+        (ключ, назва для відповіді) або None, якщо адреси немає
+    """
+    if not address or not address.get("street"):
+        return None
+    district = address.get("district")
+    if settings.INCIDENT_LOCATION_LEVEL == "district" and district:
+        return f"district:{district.casefold()}", f"{district} район"
+    street = address["street"]
+    street_type = address.get("street_type") or ""
+    return f"street:{street.casefold()}:{(district or '').casefold()}", f"{street_type} {street}".strip()
+
+
+class IncidentIndex:
+    """
+    Ковзне вікно відкритих інцидентів
+
+    - Ключ - (категорія класифікатора, район або вулиця з адреси)
+    - Інцидент відкритий, поки між дзвінками минає не більше
+      INCIDENT_WINDOW_SECONDS; OrderedDict впорядкований за останнім
+      дзвінком, тому прострочені інциденти знімаються з початку за O(1)
+    - Після INCIDENT_MIN_CALLS дзвінків інцидент вважається відомим
+    - Закриті інциденти зберігаються в обмеженій історії
+    """
+
+    def __init__(self, window_seconds: Optional[int] = None, history_size: Optional[int] = None):
+        self.window_seconds = window_seconds or settings.INCIDENT_WINDOW_SECONDS
+        self._open: "OrderedDict[Tuple[str, str], Incident]" = OrderedDict()
+        self._by_id: Dict[str, Incident] = {}
+        self._closed: deque = deque(maxlen=history_size or settings.INCIDENT_HISTORY_SIZE)
+        self._lock = threading.Lock()
+
+    def observe(self, result: ClassificationResult, call_id: str, now: Optional[float] = None) -> Optional[Incident]:
+        """
+        Зарахувати дзвінок до інциденту (відкритого або нового)
+
+        Дзвінки, що потребують оператора, та дзвінки без адреси не
+        групуються: категорія або місце невідомі.
+
+        Returns:
+            Інцидент або None, якщо дзвінок не групується
+        """
+        if not settings.INCIDENTS_ENABLED or result.needs_operator:
+            return None
+        location = location_key(result.address)
+        if location is None:
+            return None
+
+        now = time.time() if now is None else now
+        key = (str(result.id), location[0])
+        with self._lock:
+            self._expire(now)
+            incident = self._open.get(key)
+            if incident is None:
+                incident = Incident(
+                    id=str(uuid.uuid4()),
+                    key=key,
+                    category_id=str(result.id),
+                    problem=result.problem,
+                    subtype=result.subtype,
+                    executor=result.executor,
+                    urgency=result.urgency,
+                    location=location[1],
+                    district=result.address.get("district"),
+                    opened_at=now,
+                    last_seen=now
+                )
+                incident.response = known_response(incident)
+                self._open[key] = incident
+                self._by_id[incident.id] = incident
+                print(f"[Incidents] Новий інцидент {incident.id}: {incident.problem} ({incident.location})")
+            else:
+                self._open.move_to_end(key)
+
+            incident.calls += 1
+            incident.last_seen = now
+            incident.recent_calls.append(call_id)
+            incident.streets[result.address["street"]] += 1
+            if result.address.get("building"):
+                incident.addresses[f"{result.address['street']} {result.address['building']}"] += 1
+            return incident
+
+    def _expire(self, now: float):
+        """Закрити інциденти без дзвінків довше за вікно (найстаріші - на початку)"""
+        while self._open:
+            key, incident = next(iter(self._open.items()))
+            if now - incident.last_seen <= self.window_seconds:
+                break
+            del self._open[key]
+            self._close(incident, STATUS_EXPIRED, incident.last_seen)
+
+    def _close(self, incident: Incident, status: str, closed_at: float):
+        incident.status = status
+        incident.closed_at = closed_at
+        incident.audio = None
+        if len(self._closed) == self._closed.maxlen:
+            self._by_id.pop(self._closed[0].id, None)
+        self._closed.append(incident)
+
+    def resolve(self, incident_id: str) -> Optional[Incident]:
+        """Закрити інцидент вручну (аварію усунуто)"""
+        with self._lock:
+            incident = self._by_id.get(incident_id)
+            if incident is None or incident.status != STATUS_OPEN:
+                return incident
+            del self._open[incident.key]
+            self._close(incident, STATUS_RESOLVED, time.time())
+            print(f"[Incidents] Інцидент {incident.id} закрито: {incident.calls} дзвінків")
+            return incident
+
+    def get(self, incident_id: str) -> Optional[Incident]:
+        with self._lock:
+            self._expire(time.time())
+            return self._by_id.get(incident_id)
+
+    def list(self, include_closed: bool = False) -> List[Incident]:
+        """Відкриті інциденти (найбільші першими) та, за потреби, історія"""
+        with self._lock:
+            self._expire(time.time())
+            incidents = sorted(self._open.values(), key=lambda incident: incident.calls, reverse=True)
+            if include_closed:
+                incidents += list(reversed(self._closed))
+            return incidents
+
+    def summary(self) -> Dict:
+        """Агрегати для диспетчера"""
+        incidents = self.list()
+        return {
+            "open": len(incidents),
+            "known": sum(1 for incident in incidents if incident.known),
+            "linked_calls": sum(incident.calls for incident in incidents),
+            "window_seconds": self.window_seconds,
+            "min_calls": settings.INCIDENT_MIN_CALLS,
+        }
+
+    def should_prerender(self, incident: Incident) -> bool:
+        """Інцидент от-от стане відомим, а відповідь ще не синтезована"""
+        return (incident.status == STATUS_OPEN and incident.audio is None and not incident.rendering
+                and incident.calls >= settings.INCIDENT_MIN_CALLS - 1)
+
+    def prerender(self, incident: Incident, synthesize: Callable[[str], Any]):
+        """
+        Синтезувати відповідь інциденту заздалегідь
+
+        Виконується у фоновому потоці, щоб наступні абоненти отримали
+        аудіо без затримки синтезу.
+        """
+        with self._lock:
+            if incident.rendering or incident.audio is not None or incident.status != STATUS_OPEN:
+                return
+            incident.rendering = True
+        try:
+            incident.audio = synthesize(incident.response)
+            print(f"[Incidents] Відповідь інциденту {incident.id} синтезовано")
+        except Exception as e:
+            print(f"[Incidents] Помилка синтезу відповіді: {e}")
+        finally:
+            incident.rendering = False
+
+    def clear(self):
+        with self._lock:
+            self._open.clear()
+            self._by_id.clear()
+            self._closed.clear()
+
+
+def known_response(incident: Incident) -> str:
+    """Текст відповіді для відомого інциденту (INCIDENT_KNOWN_RESPONSE)"""
+    try:
+        return settings.INCIDENT_KNOWN_RESPONSE.format(
+            problem=incident.subtype or incident.problem,
+            location=incident.location,
+            executor=incident.executor
+        )
+    except (KeyError, IndexError, ValueError):
+        return settings.INCIDENT_KNOWN_RESPONSE
+
+
+# Глобальний індекс інцидентів
+incident_index = IncidentIndex()
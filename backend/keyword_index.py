@@ -0,0 +1,486 @@
+"""
+Індекс ключових слів класифікатора
+Автомат Ахо-Корасік: усі ключові слова, слова підтипу та типу всіх
+категорій шукаються за один прохід по тексту запиту. Індекс варіантів
+з видаленим символом знаходить ключові слова з помилками розпізнавання
+(нечіткі збіги).
+"""
+import re
+from collections import deque
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Set, Tuple
+
+from config import settings
+from text_utils import normalize_query
+
+
+# Види збігів у posting-списках
+KIND_KEYWORD = 0
+KIND_SUBTYPE = 1
+KIND_TYPE = 2
+
+_TOKEN_RE = re.compile(r"[\w']+")
+
+
+def query_tokens(query_lower: str) -> List[str]:
+    """Слова запиту для нечіткого пошуку"""
+    return _TOKEN_RE.findall(query_lower)
+
+
+def fuzzy_max_distance(length: int) -> int:
+    """Допустима відстань редагування для ключового слова заданої довжини (0 - без нечіткого пошуку)"""
+    if length < settings.FUZZY_MIN_KEYWORD_LENGTH:
+        return 0
+    return 1 if length < 8 else 2
+
+
+def bounded_levenshtein(a: str, b: str, max_distance: int) -> Optional[int]:
+    """
+    Відстань Левенштейна, якщо вона не перевищує max_distance
+
+    Спільні початок і кінець відкидаються (це не змінює відстань), далі
+    перебираються лише max_distance рівнів правок першого символу - для
+    d <= 2 це не більше 13 порівнянь рядків замість повної таблиці.
+
+    Returns:
+        Відстань або None, якщо вона більша за max_distance
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return None
+
+    start = 0
+    limit = min(len(a), len(b))
+    while start < limit and a[start] == b[start]:
+        start += 1
+    end_a, end_b = len(a), len(b)
+    while end_a > start and end_b > start and a[end_a - 1] == b[end_b - 1]:
+        end_a -= 1
+        end_b -= 1
+    a, b = a[start:end_a], b[start:end_b]
+
+    if not a or not b:
+        return len(a) or len(b)
+    if max_distance <= 1:
+        # Після відкидання спільних країв одна правка лишає по символу з кожного боку
+        return 1 if max_distance == 1 and len(a) == 1 and len(b) == 1 else None
+
+    best = None
+    for rest_a, rest_b in ((a[1:], b[1:]), (a[1:], b), (a, b[1:])):
+        distance = bounded_levenshtein(rest_a, rest_b, (best if best is not None else max_distance + 1) - 2)
+        if distance is not None:
+            best = distance + 1
+            if best == 1:
+                break
+    return best
+
+
+def fuzzy_keyword_match(keyword: str, tokens: Sequence[str]) -> bool:
+    """
+    Чи є в запиті слово, що відрізняється від ключового слова не більше
+    ніж на допустиму відстань (саме слово або його початок довжини
+    ключового слова - ключові слова часто є основами)
+    """
+    max_distance = fuzzy_max_distance(len(keyword))
+    if not max_distance or " " in keyword:
+        return False
+    for token in tokens:
+        if bounded_levenshtein(keyword, token, max_distance) is not None:
+            return True
+        if len(token) > len(keyword) and bounded_levenshtein(keyword, token[:len(keyword)], max_distance) is not None:
+            return True
+    return False
+
+
+def item_patterns(item: Dict) -> Tuple[List[str], Set[str], Set[str]]:
+    """
+    Шаблони категорії у канонічній формі запиту (normalize_query)
+
+    Запит класифікується нормалізованим, тож ключові слова з іншим
+    апострофом ("м’ясо") чи пунктуацією ("вул. Шевченка") нормалізуються
+    так само, інакше вони ніколи не збіглися б.
+
+    Returns:
+        (ключові слова, слова підтипу, слова типу довжиною > 3)
+    """
+    keywords = [keyword for keyword in map(normalize_query, item.get("keywords", [])) if keyword]
+    subtype_words = set(normalize_query(item.get("subtype") or "").split())
+    type_words = {word for word in normalize_query(item.get("type") or "").split() if len(word) > 3}
+    return keywords, subtype_words, type_words
+
+
+def keyword_features(query_lower: str, item: Dict) -> Tuple[int, bool, bool, int]:
+    """
+    Ознаки релевантності запиту до категорії прямим пошуком підрядків
+
+    Returns:
+        (кількість знайдених ключових слів, збіг підтипу, збіг типу,
+         кількість нечітко знайдених ключових слів)
+    """
+    keywords, subtype_words, type_words = item_patterns(item)
+    matched_keywords = sum(1 for kw in keywords if kw in query_lower)
+    subtype_hit = any(word in query_lower for word in subtype_words)
+    type_hit = any(word in query_lower for word in type_words)
+
+    fuzzy_keywords = 0
+    if settings.FUZZY_KEYWORD_WEIGHT > 0:
+        tokens = query_tokens(query_lower)
+        fuzzy_keywords = sum(
+            1 for kw in keywords
+            if kw not in query_lower and fuzzy_keyword_match(kw, tokens)
+        )
+
+    return matched_keywords, subtype_hit, type_hit, fuzzy_keywords
+
+
+def keyword_score(matched_keywords: int, subtype_hit: bool, type_hit: bool, fuzzy_keywords: int = 0) -> float:
+    """Розрахунок релевантності з ознак (ваги ключових слів, підтипу, типу та нечітких збігів)"""
+    score = 0.0
+
+    if matched_keywords > 0:
+        score += matched_keywords * 0.15
+
+    if subtype_hit:
+        score += 0.2
+
+    if type_hit:
+        score += 0.1
+
+    if fuzzy_keywords > 0:
+        score += fuzzy_keywords * settings.FUZZY_KEYWORD_WEIGHT
+
+    return min(score, 1.0)
+
+
+def _deletions(word: str) -> Set[str]:
+    """Слово та всі його варіанти з одним видаленим символом"""
+    return {word, *(word[:i] + word[i + 1:] for i in range(len(word)))}
+
+
+def _add_deletions(index: Dict[Tuple[str, int], List[int]], word: str, length: int, pattern_id: int):
+    for variant in _deletions(word):
+        index.setdefault((variant, length), []).append(pattern_id)
+
+
+def _segment_ends(token_length: int, length: int, max_distance: int) -> List[int]:
+    """
+    Кінці частин слова запиту, з якими порівнюється ключове слово
+    довжини length (fuzzy_keyword_match): усе слово та його початок
+    довжини ключового слова
+    """
+    ends = [length] if length < token_length else []
+    if abs(token_length - length) <= max_distance:
+        ends.append(token_length)
+    return ends
+
+
+class DeletionIndex:
+    """
+    Індекс ключових слів за варіантами з одним видаленим символом
+
+    Якщо відстань редагування між словами не більша за 1, вони мають
+    спільний варіант: саме слово або слово без одного символу. Ключові
+    слова з d = 1 індексуються всіма варіантами (ключ - варіант і довжина
+    ключового слова), а для слова запиту шукаються його варіанти.
+    Ключові слова з d = 2 діляться навпіл: дві правки залишають одну
+    половину незмінною або зачіпають кожну половину один раз, тож
+    кандидат має точну половину в слові запиту або обидві половини на
+    відстані 1 від відповідних частин слова. Кандидати перевіряються
+    обмеженою відстанню Левенштейна, тому нечіткий пошук не перебирає
+    всі ключові слова.
+    """
+
+    TOKEN_CACHE_SIZE = 8192
+
+    def __init__(self, keywords: Dict[int, str]):
+        """
+        Args:
+            keywords: {id шаблону: ключове слово}
+        """
+        self.keywords: Dict[int, str] = {}
+        self._max_distance: Dict[int, int] = {}
+        # (варіант, довжина ключового слова) -> ID ключових слів з d = 1
+        self._whole: Dict[Tuple[str, int], List[int]] = {}
+        # Те саме для перших та других половин ключових слів з d = 2
+        self._heads: Dict[Tuple[str, int], List[int]] = {}
+        self._tails: Dict[Tuple[str, int], List[int]] = {}
+        # Слова запитів повторюються (індекс незмінний, тож кеш не застаріває)
+        self._token_cache: Dict[str, FrozenSet[int]] = {}
+
+        for pattern_id, keyword in keywords.items():
+            max_distance = fuzzy_max_distance(len(keyword))
+            if not max_distance or " " in keyword:
+                continue
+            self.keywords[pattern_id] = keyword
+            self._max_distance[pattern_id] = max_distance
+            length = len(keyword)
+            if max_distance == 1:
+                _add_deletions(self._whole, keyword, length, pattern_id)
+            else:
+                half = length // 2
+                _add_deletions(self._heads, keyword[:half], length, pattern_id)
+                _add_deletions(self._tails, keyword[half:], length, pattern_id)
+
+        self._whole_lengths = sorted({length for _, length in self._whole})
+        self._half_lengths = sorted({length for _, length in self._heads})
+
+    def __len__(self) -> int:
+        return len(self.keywords)
+
+    def _candidates(self, token: str) -> Set[int]:
+        """Ключові слова, що мають спільний варіант зі словом запиту (або його половинами)"""
+        token_length = len(token)
+        candidates: Set[int] = set()
+
+        whole = self._whole
+        for length in self._whole_lengths:
+            for end in _segment_ends(token_length, length, 1):
+                for variant in _deletions(token[:end]):
+                    candidates.update(whole.get((variant, length), ()))
+
+        heads, tails = self._heads, self._tails
+        for length in self._half_lengths:
+            ends = _segment_ends(token_length, length, 2)
+            if not ends:
+                continue
+            half = length // 2
+            rest = length - half
+
+            # Незмінна перша або друга половина
+            candidates.update(heads.get((token[:half], length), ()))
+            for end in ends:
+                if end >= rest:
+                    candidates.update(tails.get((token[end - rest:end], length), ()))
+
+            # По одній правці в кожній половині: межа половин у слові зсувається не більше ніж на 1
+            head_hits: Set[int] = set()
+            for size in range(half - 1, min(half + 1, token_length) + 1):
+                for variant in _deletions(token[:size]):
+                    head_hits.update(heads.get((variant, length), ()))
+            if not head_hits:
+                continue
+            tail_hits: Set[int] = set()
+            for end in ends:
+                for size in range(rest - 1, min(rest + 1, end) + 1):
+                    for variant in _deletions(token[end - size:end]):
+                        tail_hits.update(tails.get((variant, length), ()))
+            candidates.update(head_hits & tail_hits)
+
+        return candidates
+
+    def _match_token(self, token: str) -> FrozenSet[int]:
+        """ID ключових слів з нечітким збігом з одним словом запиту (з кешем)"""
+        matched = self._token_cache.get(token)
+        if matched is not None:
+            return matched
+
+        keywords = self.keywords
+        max_distance = self._max_distance
+        found = set()
+        for pattern_id in self._candidates(token):
+            keyword = keywords[pattern_id]
+            # Слово запиту не може бути коротшим за ключове більше ніж на d
+            if len(token) < len(keyword) - max_distance[pattern_id]:
+                continue
+            if fuzzy_keyword_match(keyword, (token,)):
+                found.add(pattern_id)
+
+        matched = frozenset(found)
+        if len(self._token_cache) >= self.TOKEN_CACHE_SIZE:
+            self._token_cache.clear()
+        self._token_cache[token] = matched
+        return matched
+
+    def search(self, tokens: Sequence[str], exclude: Set[int]) -> Set[int]:
+        """
+        ID ключових слів з нечітким збігом зі словами запиту
+
+        Args:
+            tokens: Слова запиту
+            exclude: ID шаблонів, вже знайдених точно
+        """
+        found: Set[int] = set()
+        for token in tokens:
+            found.update(self._match_token(token))
+        return found - exclude
+
+
+class AhoCorasick:
+    """
+    Автомат Ахо-Корасік для пошуку множини підрядків
+
+    Будується один раз, пошук виконується за один прохід по тексту
+    незалежно від кількості шаблонів.
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns: List[str] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+        self._dict_link: List[int] = [0]
+
+        for pattern in patterns:
+            self._add(pattern)
+        self._build()
+
+    def __len__(self) -> int:
+        return len(self.patterns)
+
+    def _add(self, pattern: str):
+        """Додати шаблон у префіксне дерево"""
+        pattern_id = len(self.patterns)
+        self.patterns.append(pattern)
+
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+                self._dict_link.append(0)
+            node = next_node
+        self._out[node].append(pattern_id)
+
+    def _build(self):
+        """Побудова fail-посилань та словникових посилань (BFS)"""
+        queue = deque(self._goto[0].values())
+
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, 0)
+                if fail == child:
+                    fail = 0
+
+                self._fail[child] = fail
+                # Найближчий вузол по fail-ланцюжку, де закінчується шаблон
+                self._dict_link[child] = fail if self._out[fail] else self._dict_link[fail]
+
+    def search(self, text: str) -> Set[int]:
+        """Множина ID шаблонів, що входять у текст"""
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+        dict_link = self._dict_link
+
+        found_nodes: Set[int] = set()
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+
+            # Якщо вузол вже знайдено, весь його ланцюжок також знайдено
+            match = node if out[node] else dict_link[node]
+            while match and match not in found_nodes:
+                found_nodes.add(match)
+                match = dict_link[match]
+
+        matched: Set[int] = set(out[0])  # порожній шаблон входить у будь-який текст
+        for match in found_nodes:
+            matched.update(out[match])
+        return matched
+
+
+class KeywordIndex:
+    """
+    Скомпільований індекс категорій класифікатора
+
+    Ключові слова, слова підтипу та слова типу (довжиною > 3) всіх
+    категорій компілюються в один автомат. Для кожного шаблону
+    зберігається posting-список (індекс категорії, вид збігу), тому один
+    прохід по запиту дає ознаки для всіх категорій одразу. Результат
+    збігається з прямим пошуком `keyword_features` для кожної категорії.
+    """
+
+    def __init__(self, items: Sequence[Dict]):
+        self.items = list(items)
+
+        pattern_ids: Dict[str, int] = {}
+        postings: List[List[Tuple[int, int]]] = []
+
+        def _posting(pattern: str) -> List[Tuple[int, int]]:
+            pattern_id = pattern_ids.get(pattern)
+            if pattern_id is None:
+                pattern_id = len(postings)
+                pattern_ids[pattern] = pattern_id
+                postings.append([])
+            return postings[pattern_id]
+
+        for idx, item in enumerate(self.items):
+            keywords, subtype_words, type_words = item_patterns(item)
+            # Кожне входження ключового слова рахується окремо
+            for kw in keywords:
+                _posting(kw).append((idx, KIND_KEYWORD))
+
+            for word in subtype_words:
+                _posting(word).append((idx, KIND_SUBTYPE))
+
+            for word in type_words:
+                _posting(word).append((idx, KIND_TYPE))
+
+        self._postings = postings
+        self._automaton = AhoCorasick(pattern_ids)
+
+        self._fuzzy: Optional[DeletionIndex] = None
+        if settings.FUZZY_KEYWORD_WEIGHT > 0:
+            self._fuzzy = DeletionIndex({
+                pattern_id: pattern for pattern, pattern_id in pattern_ids.items()
+                if any(kind == KIND_KEYWORD for _, kind in postings[pattern_id])
+            })
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    @property
+    def patterns_count(self) -> int:
+        return len(self._automaton)
+
+    def features(self, query_lower: str) -> Dict[int, List]:
+        """
+        Ознаки для категорій, що мають хоча б один збіг
+
+        Returns:
+            {індекс категорії: [кількість ключових слів, збіг підтипу, збіг типу,
+                                кількість нечітких збігів ключових слів]}
+        """
+        features: Dict[int, List] = {}
+        postings = self._postings
+
+        matched = self._automaton.search(query_lower)
+        for pattern_id in matched:
+            for idx, kind in postings[pattern_id]:
+                entry = features.get(idx)
+                if entry is None:
+                    entry = features[idx] = [0, False, False, 0]
+                if kind == KIND_KEYWORD:
+                    entry[0] += 1
+                elif kind == KIND_SUBTYPE:
+                    entry[1] = True
+                else:
+                    entry[2] = True
+
+        if self._fuzzy is not None and len(self._fuzzy):
+            for pattern_id in self._fuzzy.search(query_tokens(query_lower), matched):
+                for idx, kind in postings[pattern_id]:
+                    if kind == KIND_KEYWORD:
+                        entry = features.get(idx)
+                        if entry is None:
+                            entry = features[idx] = [0, False, False, 0]
+                        entry[3] += 1
+
+        return features
+
+    def scores(self, query: str) -> Dict[int, float]:
+        """Релевантність запиту до категорій з ненульовим збігом"""
+        return {
+            idx: keyword_score(*entry)
+            for idx, entry in self.features(normalize_query(query)).items()
+        }
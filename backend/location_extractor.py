@@ -0,0 +1,327 @@
+"""
+Витяг адреси з транскрипту дзвінка
+Газетир вулиць завантажується в префіксне дерево за основами слів
+(стійке до відмінків), вулиця, будинок та квартира знаходяться за
+один прохід по словах транскрипту
+"""
+import csv
+import os
+import re
+import threading
+import unicodedata
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from config import settings
+from text_utils import normalize_apostrophes, stem_uk
+
+
+# Зразок газетира, що постачається з кодом (повний - через GAZETTEER_PATH)
+SAMPLE_GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resources", "gazetteer_sample.csv")
+
+# Типи вулиць та форми, якими їх називають абоненти
+STREET_TYPE_FORMS = {
+    "вулиця": ["вулиця", "вулиці", "вулицю", "вулицею", "вул"],
+    "проспект": ["проспект", "проспекті", "проспекту", "просп"],
+    "провулок": ["провулок", "провулку", "провулка", "пров"],
+    "бульвар": ["бульвар", "бульварі", "бульвару", "бульв"],
+    "площа": ["площа", "площі", "площу", "пл"],
+    "узвіз": ["узвіз", "узвозі", "узвозу"],
+    "шосе": ["шосе"],
+    "дорога": ["дорога", "дорозі", "дорогу"],
+    "набережна": ["набережна", "набережній", "набережну", "наб"],
+    "майдан": ["майдан", "майдані", "майдану"],
+}
+
+BUILDING_MARKER_FORMS = ["будинок", "будинку", "буд", "б", "дім", "домі", "номер"]
+APARTMENT_MARKER_FORMS = ["квартира", "квартирі", "квартиру", "квартири", "кв"]
+
+# Прийменники між типом вулиці та назвою або перед адресою
+SKIP_WORDS = {"на", "по", "за", "біля", "в", "у", "мікрорайон"}
+
+# Прийменники місця: "на Хрещатику 5" - адреса і без типу вулиці
+LOCATION_PREPOSITIONS = {"на", "по", "біля", "в", "у"}
+
+# Номер будинку: 12, 12а, 12-а, 12/1
+_TOKEN_RE = re.compile(r"\d+(?:[/-]\d+)?(?:-?[^\W\d_](?![^\W\d_]))?|[^\W\d_]+(?:['-][^\W\d_]+)*")
+
+
+def _stems(forms: List[str]) -> set:
+    return {stem_uk(form) for form in forms}
+
+
+_STREET_TYPE_STEMS: Dict[str, str] = {
+    stem: street_type for street_type, forms in STREET_TYPE_FORMS.items() for stem in _stems(forms)
+}
+_BUILDING_MARKERS = _stems(BUILDING_MARKER_FORMS)
+_APARTMENT_MARKERS = _stems(APARTMENT_MARKER_FORMS)
+
+
+@dataclass
+class GazetteerEntry:
+    """Вулиця газетира"""
+    name: str
+    type: str
+    district: Optional[str] = None
+
+
+@dataclass
+class Address:
+    """Адреса, знайдена в транскрипті"""
+    street: str
+    street_type: Optional[str] = None
+    district: Optional[str] = None
+    building: Optional[str] = None
+    apartment: Optional[str] = None
+    matched: str = ""  # фрагмент транскрипту
+
+    def to_dict(self) -> Dict:
+        return {
+            "street": self.street,
+            "street_type": self.street_type,
+            "district": self.district,
+            "building": self.building,
+            "apartment": self.apartment,
+            "matched": self.matched,
+        }
+
+
+def tokenize(text: str) -> List[Tuple[str, int, int]]:
+    """Слова та номери тексту: (слово, початок, кінець)"""
+    text = normalize_apostrophes(unicodedata.normalize("NFKC", text).casefold())
+    return [(match.group(), match.start(), match.end()) for match in _TOKEN_RE.finditer(text)]
+
+
+class Gazetteer:
+    """
+    Префіксне дерево назв вулиць за основами слів
+
+    Вузол - словник {основа слова: вузол}; ключ None містить індекси
+    записів, назва яких закінчується у вузлі. Назви з кількох слів
+    ("Лесі Українки", "Велика Васильківська") та їх псевдоніми
+    ("Шевченка" для "Тараса Шевченка") - шляхи в дереві, тому пошук
+    від кожного слова транскрипту йде не глибше найдовшої назви.
+    """
+
+    def __init__(self, entries: List[GazetteerEntry], aliases: Optional[List[List[str]]] = None):
+        self.entries = entries
+        self.root: Dict = {}
+        self.max_depth = 0
+        for idx, entry in enumerate(entries):
+            names = [entry.name] + (aliases[idx] if aliases else [])
+            for name in names:
+                self._insert(name, idx)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _insert(self, name: str, idx: int):
+        stems = [stem_uk(word) for word, _, _ in tokenize(name)]
+        if not stems:
+            return
+        node = self.root
+        for stem in stems:
+            node = node.setdefault(stem, {})
+        targets = node.setdefault(None, [])
+        if idx not in targets:
+            targets.append(idx)
+        self.max_depth = max(self.max_depth, len(stems))
+
+    def longest_match(self, stems: List[str], start: int) -> Optional[Tuple[int, List[int]]]:
+        """
+        Найдовша назва, що починається зі слова start
+
+        Returns:
+            (індекс слова після назви, індекси записів) або None
+        """
+        node = self.root
+        match = None
+        pos = start
+        while pos < len(stems):
+            node = node.get(stems[pos])
+            if node is None:
+                break
+            pos += 1
+            if None in node:
+                match = (pos, node[None])
+        return match
+
+    @classmethod
+    def load(cls, path: str) -> "Gazetteer":
+        """
+        Завантаження газетира з CSV
+
+        Колонки: name, type, district, aliases (псевдоніми через "|")
+        """
+        entries: List[GazetteerEntry] = []
+        aliases: List[List[str]] = []
+        with open(path, encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                name = (row.get("name") or "").strip()
+                if not name:
+                    continue
+                entries.append(GazetteerEntry(
+                    name=name,
+                    type=(row.get("type") or "вулиця").strip(),
+                    district=(row.get("district") or "").strip() or None
+                ))
+                aliases.append([alias.strip() for alias in (row.get("aliases") or "").split("|") if alias.strip()])
+        return cls(entries, aliases)
+
+
+class LocationExtractor:
+    """
+    Витяг адреси (вулиця, будинок, квартира) з транскрипту
+
+    Назва вулиці приймається, лише якщо поруч є тип вулиці ("вулиця",
+    "просп.", "на Оболонському проспекті") або за нею йде номер
+    будинку і назва написана з великої літери чи стоїть після
+    прийменника місця ("на Хрещатику 5") - інакше звичайні слова
+    ("дякую за перемоги 5", "миру") давали б хибні адреси.
+    """
+
+    def __init__(self, gazetteer: Gazetteer):
+        self.gazetteer = gazetteer
+
+    def extract(self, text: str) -> Optional[Address]:
+        """Найповніша адреса в тексті або None"""
+        if not text or not len(self.gazetteer):
+            return None
+
+        tokens = tokenize(text)
+        words = [word for word, _, _ in tokens]
+        stems = [stem_uk(word) for word in words]
+        best: Optional[Tuple[Tuple, Address]] = None
+
+        pos = 0
+        while pos < len(tokens):
+            match = None if words[pos][0].isdigit() else self.gazetteer.longest_match(stems, pos)
+            if match is None:
+                pos += 1
+                continue
+
+            end, entry_ids = match
+            street_type, span_start, after = self._street_type_around(stems, words, pos, end)
+            building, apartment, after = self._numbers_after(words, stems, after)
+
+            if street_type is None and (building is None or not self._looks_like_name(text, tokens, words, pos)):
+                pos += 1
+                continue
+
+            entry = self._choose_entry(entry_ids, street_type)
+            address = Address(
+                street=entry.name if entry else " ".join(words[pos:end]),
+                street_type=street_type or (entry.type if entry else None),
+                district=entry.district if entry else None,
+                building=building,
+                apartment=apartment,
+                matched=text_span(text, tokens, span_start, after)
+            )
+            rank = (building is not None, apartment is not None, street_type is not None, end - pos)
+            if best is None or rank > best[0]:
+                best = (rank, address)
+            pos = max(end, after)
+
+        return best[1] if best else None
+
+    def _street_type_around(self, stems: List[str], words: List[str], start: int, end: int) -> Tuple[Optional[str], int, int]:
+        """
+        Тип вулиці перед назвою (через прийменник) або одразу після неї
+
+        Returns:
+            (тип або None, перше слово адреси, слово після назви з типом)
+        """
+        before = start - 1
+        while before >= 0 and words[before] in SKIP_WORDS and start - before <= 2:
+            before -= 1
+        if before >= 0 and stems[before] in _STREET_TYPE_STEMS:
+            return _STREET_TYPE_STEMS[stems[before]], before, end
+        if end < len(stems) and stems[end] in _STREET_TYPE_STEMS:
+            return _STREET_TYPE_STEMS[stems[end]], start, end + 1
+        return None, start, end
+
+    @staticmethod
+    def _looks_like_name(text: str, tokens: List[Tuple[str, int, int]], words: List[str], start: int) -> bool:
+        """Назва без типу вулиці: з великої літери у вихідному тексті або після прийменника місця"""
+        if text[tokens[start][1]].isupper():
+            return True
+        return start > 0 and words[start - 1] in LOCATION_PREPOSITIONS
+
+    def _numbers_after(self, words: List[str], stems: List[str], pos: int) -> Tuple[Optional[str], Optional[str], int]:
+        """Номер будинку та квартири після назви вулиці"""
+        building = apartment = None
+
+        if pos < len(words) and stems[pos] in _BUILDING_MARKERS:
+            pos += 1
+        if pos < len(words) and words[pos][0].isdigit():
+            building = words[pos].replace("-", "")
+            pos += 1
+
+            if pos < len(words) and stems[pos] in _APARTMENT_MARKERS:
+                if pos + 1 < len(words) and words[pos + 1][0].isdigit():
+                    apartment = words[pos + 1]
+                    pos += 2
+            elif pos < len(words) and words[pos][0].isdigit():
+                # "Хрещатик 5 12" - другий номер вважається квартирою
+                apartment = words[pos]
+                pos += 1
+
+        return building, apartment, pos
+
+    def _choose_entry(self, entry_ids: List[int], street_type: Optional[str]) -> Optional[GazetteerEntry]:
+        """Запис газетира з урахуванням типу вулиці (однакові назви в різних районах)"""
+        entries = [self.gazetteer.entries[idx] for idx in entry_ids]
+        if street_type:
+            typed = [entry for entry in entries if entry.type == street_type]
+            entries = typed or entries
+        if not entries:
+            return None
+        if len({entry.district for entry in entries}) > 1:
+            # Неоднозначно - район не визначаємо
+            return GazetteerEntry(name=entries[0].name, type=entries[0].type, district=None)
+        return entries[0]
+
+
+def text_span(text: str, tokens: List[Tuple[str, int, int]], start: int, end: int) -> str:
+    """Фрагмент вихідного тексту від слова start до слова end (не включно)"""
+    end = max(start + 1, min(end, len(tokens)))
+    return text[tokens[start][1]:tokens[end - 1][2]]
+
+
+_extractor: Optional[LocationExtractor] = None
+_extractor_lock = threading.Lock()
+
+
+def get_location_extractor() -> Optional[LocationExtractor]:
+    """
+    Ліниве завантаження газетира (GAZETTEER_PATH або зразок з resources/)
+
+    Returns:
+        LocationExtractor або None, якщо витяг адрес вимкнено чи газетир недоступний
+    """
+    global _extractor
+    if not settings.LOCATION_EXTRACTION_ENABLED:
+        return None
+    if _extractor is not None:
+        return _extractor
+
+    with _extractor_lock:
+        if _extractor is None:
+            path = settings.GAZETTEER_PATH or SAMPLE_GAZETTEER_PATH
+            try:
+                gazetteer = Gazetteer.load(path)
+                print(f"[Location] Газетир завантажено: {len(gazetteer)} вулиць ({path})")
+            except OSError as e:
+                print(f"[Location] Газетир недоступний ({path}): {e}")
+                gazetteer = Gazetteer([])
+            _extractor = LocationExtractor(gazetteer)
+    return _extractor
+
+
+def extract_address(text: str) -> Optional[Dict]:
+    """Адреса з транскрипту як словник (або None)"""
+    extractor = get_location_extractor()
+    if extractor is None:
+        return None
+    address = extractor.extract(text)
+    return address.to_dict() if address else None
@@ -2,38 +2,52 @@
 ШІ-Агент контактного центру
 FastAPI Backend з інтеграцією Silero ASR та Fish Speech TTS
 """
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, UploadFile, File, Depends, status
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, UploadFile, File, Depends, Header, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from pydantic import BaseModel, Field
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 import json
 import asyncio
-from datetime import datetime
+from datetime import datetime, timedelta
 import uuid
 import os
+from contextlib import asynccontextmanager
 from functools import lru_cache
 import hashlib
 import time
 
 from config import settings
-from classifier import classify_query, ClassificationResult, classifier
+from classifier import classify_query, classify_queries, classification_to_dict, ClassificationResult, QueryClassifier, classifier
 from asr_service import transcribe_audio, transcribe_audio_bytes
-from tts_service import synthesize_speech, synthesize_to_file
+from tts_service import synthesize_speech_buffer
+from audio_buffer import AudioBuffer, ENCODED_FORMATS
+from history_export import EXPORT_FORMATS, PYARROW_AVAILABLE, export_chunks
+from tenants import Tenant, tenant_registry
 from storage import (
-    storage, 
+    uuid7,
     ExecutorBase, Executor,
     ClassifierItemBase, ClassifierItem,
     ConversationAlgorithmBase, ConversationAlgorithm,
     CallRecordCreate, CallRecord
 )
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Тенанти, створені пізніше, запускають архівування самі
+    tenant_registry.default.archiver.start()
+    yield
+    # Буфери записів дзвінків дописуються, з'єднання SQLite закриваються при зупинці сервера
+    tenant_registry.close()
+
+
 # Ініціалізація FastAPI
 app = FastAPI(
     title=settings.APP_NAME,
     version=settings.VERSION,
-    description="ШІ-Агент контактного центру з підтримкою Fish Speech TTS та Silero ASR"
+    description="ШІ-Агент контактного центру з підтримкою Fish Speech TTS та Silero ASR",
+    lifespan=lifespan
 )
 
 # Security
@@ -42,6 +56,9 @@ security = HTTPBasic()
 # Rate limiting storage (в пам'яті для демо, для production використовувати Redis)
 rate_limit_storage: Dict[str, Dict] = {}
 
+# Активні WebSocket сесії
+sessions: Dict[str, Dict[str, Any]] = {}
+
 
 def check_rate_limit(client_id: str, limit: int = 10, window: int = 60) -> bool:
     """
@@ -93,7 +110,7 @@ app.add_middleware(
     allow_origins=ALLOWED_ORIGINS,
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE"],
-    allow_headers=["Authorization", "Content-Type", "X-Request-ID"],
+    allow_headers=["Authorization", "Content-Type", "X-Request-ID", "X-Tenant-ID"],
 )
 
 
@@ -128,6 +145,25 @@ def verify_admin(credentials: HTTPBasicCredentials = Depends(security)) -> bool:
     )
 
 
+def get_tenant(x_tenant_id: Optional[str] = Header(None), credentials: HTTPBasicCredentials = Depends(security)) -> Tenant:
+    """
+    Тенант запиту із заголовка X-Tenant-ID (без заголовка - тенант за замовчуванням)
+    
+    Доступ до тенанта - з його ключем (TENANT_API_KEYS) як паролем або з
+    обліковими даними адміністратора. Синхронна залежність: FastAPI
+    виконує її в пулі потоків, тому відкриття бази нового тенанта не
+    блокує event loop.
+    """
+    if not (tenant_registry.has_access(x_tenant_id, credentials.password) or verify_admin(credentials)):
+        raise HTTPException(status_code=403, detail="Немає доступу до тенанта")
+    try:
+        return tenant_registry.get(x_tenant_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Тенант не знайдено")
+
+
 # Моделі даних
 class TextQuery(BaseModel):
     """Текстовий запит для класифікації"""
@@ -184,7 +220,7 @@ async def health_check():
     components = {
         "asr": {"status": "healthy" if settings.SILERO_MODEL else "not_configured"},
         "tts": {"status": "healthy", "engine": "fish_speech" if settings.FISH_SPEECH_MODEL else "edge_tts"},
-        "classifier": {"status": "healthy", "categories_count": len(classifier.data)},
+        "classifier": {"status": "healthy", "categories_count": len(classifier.data), "version": classifier.version},
         "database": {"status": "healthy", "type": "sqlite"}
     }
     
@@ -199,6 +235,7 @@ async def health_check():
 @app.post("/api/classify")
 async def classify_text(
     query: TextQuery,
+    tenant: Tenant = Depends(get_tenant),
     credentials: HTTPBasicCredentials = Depends(security)
 ):
     """
@@ -219,7 +256,7 @@ async def classify_text(
             detail="Перевищено ліміт запитів. Спробуйте пізніше."
         )
     
-    result = classify_query(query.text)
+    result = await asyncio.to_thread(classify_query, query.text, tenant.classifier)
     
     # Зберігаємо запит в історії (опціонально)
     # call_record = CallRecordCreate(
@@ -237,19 +274,159 @@ async def classify_text(
     return {
         "success": True,
         "query": query.text,
-        "classification": {
-            "id": result.id,
-            "problem": result.problem,
-            "type": result.type,
-            "subtype": result.subtype,
-            "location": result.location,
-            "response": result.response,
-            "executor": result.executor,
-            "urgency": result.urgency,
-            "response_time": result.response_time,
-            "confidence": result.confidence,
-            "needs_operator": result.needs_operator
-        }
+        "classification": classification_to_dict(result)
+    }
+
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def _batch_query_text(value: Any) -> str:
+    """Текст запиту пакета: рядок або об'єкт {"text": ...}"""
+    if isinstance(value, dict):
+        value = value.get("text")
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError("Очікується непорожній рядок або об'єкт з полем text")
+    if len(value) > 5000:
+        raise ValueError("Запит довший за 5000 символів")
+    return value
+
+
+async def _ndjson_lines(request: Request):
+    """Рядки NDJSON тіла запиту в міру надходження"""
+    pending = b""
+    async for chunk in request.stream():
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+    if pending.strip():
+        yield pending
+
+
+async def _classify_batch_stream(items: List[Any], query_classifier: QueryClassifier):
+    """
+    Класифікація пакета порціями з потоковою видачею NDJSON у порядку запитів
+
+    Кожна порція класифікується одним векторизованим викликом у потоці,
+    тож event loop не блокується, а відповідь починає надходити до
+    завершення всього пакета.
+
+    Args:
+        items: Запити пакета (рядки або об'єкти {"text": ...})
+        query_classifier: Класифікатор тенанта
+    """
+    chunk_size = settings.CLASSIFY_BATCH_CHUNK_SIZE
+    index = 0
+    pending: List[tuple] = []
+
+    async def _flush():
+        nonlocal index, pending
+        texts = [text for text, error in pending if error is None]
+        results = iter(await asyncio.to_thread(classify_queries, texts, query_classifier) if texts else [])
+        lines = []
+        for text, error in pending:
+            if error is not None:
+                line = {"index": index, "error": error}
+            else:
+                line = {"index": index, "query": text, "classification": classification_to_dict(next(results))}
+            lines.append(json.dumps(line, ensure_ascii=False))
+            index += 1
+        pending = []
+        return "\n".join(lines) + "\n"
+
+    for item in items:
+        try:
+            pending.append((_batch_query_text(item), None))
+        except ValueError as e:
+            pending.append((None, str(e)))
+        if len(pending) >= chunk_size:
+            yield await _flush()
+
+    if pending:
+        yield await _flush()
+
+
+@app.post("/api/classify/batch")
+async def classify_batch(
+    request: Request,
+    tenant: Tenant = Depends(get_tenant),
+    credentials: HTTPBasicCredentials = Depends(security)
+):
+    """
+    Пакетна класифікація запитів
+    
+    Приймає JSON {"queries": [...]} або NDJSON (Content-Type:
+    application/x-ndjson, по одному запиту на рядок: рядок JSON або
+    {"text": ...}). Результати повертаються потоком NDJSON у порядку
+    запитів: {"index", "query", "classification"} або {"index", "error"}.
+    
+    Returns:
+        StreamingResponse з результатами класифікації
+    """
+    # Rate limiting: одна перевірка на весь пакет
+    client_id = credentials.username
+    if not check_rate_limit(client_id):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Перевищено ліміт запитів. Спробуйте пізніше."
+        )
+
+    max_queries = settings.CLASSIFY_BATCH_MAX_QUERIES
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+
+    if content_type in (NDJSON_MEDIA_TYPE, "application/ndjson", "application/jsonl"):
+        # Тіло розбирається порядково в міру надходження; повністю зчитати
+        # його треба до відповіді, бо під час StreamingResponse канал
+        # запиту вже слухає сервер (disconnect)
+        items = []
+        async for line in _ndjson_lines(request):
+            if len(items) >= max_queries:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"Максимальний розмір пакета: {max_queries}"
+                )
+            try:
+                items.append(json.loads(line))
+            except ValueError:
+                items.append(None)
+    else:
+        try:
+            body = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Некоректний JSON")
+
+        items = body.get("queries") if isinstance(body, dict) else None
+        if not isinstance(items, list):
+            raise HTTPException(status_code=400, detail="Очікується список queries")
+        if len(items) > max_queries:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Максимальний розмір пакета: {max_queries}"
+            )
+
+    if not items:
+        raise HTTPException(status_code=400, detail="Порожній пакет запитів")
+
+    return StreamingResponse(_classify_batch_stream(items, tenant.classifier), media_type=NDJSON_MEDIA_TYPE)
+
+
+@app.get("/api/classify/metrics")
+async def classify_metrics(tenant: Tenant = Depends(get_tenant), credentials: HTTPBasicCredentials = Depends(security)):
+    """
+    Метрики каскаду класифікації та кешу результатів
+    
+    Returns:
+        Частка запитів, на які відповів кожен етап, латентність етапів
+        та hit rate кешу
+    """
+    return {
+        "success": True,
+        "classifier_version": tenant.classifier.version,
+        "cascade_enabled": settings.NLU_CASCADE_ENABLED,
+        "metrics": tenant.classifier.cascade_stats.to_dict(),
+        "cache": tenant.classifier.cache.to_dict()
     }
 
 
@@ -295,7 +472,14 @@ async def transcribe_audio_endpoint(
             # Попередження, але не помилка - все одно спробуємо обробити
             print(f"[Warning] Неочікуваний тип файлу: {content_type}")
         
-        transcript = transcribe_audio_bytes(audio_bytes)
+        # Формат визначаємо за розширенням файлу (за замовчуванням webm)
+        ext = os.path.splitext(audio.filename or '')[1].lstrip('.').lower()
+        audio_buffer = AudioBuffer.from_bytes(
+            audio_bytes,
+            format=ext if ext in ENCODED_FORMATS else "webm"
+        )
+        
+        transcript = await asyncio.to_thread(transcribe_audio_bytes, audio_buffer)
         
         return {
             "success": True,
@@ -336,39 +520,21 @@ async def synthesize_text(
         )
     
     try:
-        audio_bytes, sample_rate = synthesize_speech(request.text, request.voice)
+        audio = synthesize_speech_buffer(request.text, request.voice)
         
         # Перевірка що аудіо не порожнє
-        if len(audio_bytes) < 100:
+        if len(audio) < 100:
             raise HTTPException(
                 status_code=500,
                 detail="Помилка генерації аудіо. Спробуйте інший текст."
             )
         
-        # Визначаємо формат (MP3 для Edge TTS, WAV для Fish Speech)
-        is_mp3 = audio_bytes[:3] == b'ID3' or (len(audio_bytes) > 1 and audio_bytes[0] == 0xFF)
-        
-        ext = ".mp3" if is_mp3 else ".wav"
-        media_type = "audio/mpeg" if is_mp3 else "audio/wav"
-        
-        # Зберігаємо тимчасовий файл
-        temp_path = f"/tmp/tts_{uuid.uuid4()}{ext}"
-        try:
-            with open(temp_path, 'wb') as f:
-                f.write(audio_bytes)
-            
-            return FileResponse(
-                temp_path,
-                media_type=media_type,
-                filename=f"response{ext}"
-            )
-        finally:
-            # Видаляємо тимчасовий файл після відправки
-            try:
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
-            except Exception:
-                pass
+        # Формат відомий з AudioBuffer (MP3 для Edge TTS, WAV для Fish Speech)
+        return Response(
+            content=audio.tobytes(),
+            media_type=audio.media_type,
+            headers={"Content-Disposition": f'attachment; filename="response{audio.extension}"'}
+        )
                 
     except HTTPException:
         raise
@@ -384,6 +550,18 @@ async def synthesize_text(
 async def get_call_history(
     limit: int = 50,
     offset: int = 0,
+    before: Optional[str] = None,
+    status: Optional[str] = None,
+    caller_phone: Optional[str] = None,
+    category: Optional[str] = None,
+    problem: Optional[str] = None,
+    urgency: Optional[str] = None,
+    executor: Optional[str] = None,
+    min_confidence: Optional[float] = None,
+    max_confidence: Optional[float] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    tenant: Tenant = Depends(get_tenant),
     credentials: HTTPBasicCredentials = Depends(security)
 ):
     """
@@ -391,50 +569,236 @@ async def get_call_history(
     
     Args:
         limit: Максимальна кількість записів (default: 50, max: 100)
-        offset: Зміщення для пагінації
+        offset: Зміщення для пагінації (застаріле, повільне на глибоких сторінках)
+        before: Курсор "timestamp,id" - next_cursor попередньої сторінки
+        status: Фільтр за статусом (resolved, escalated)
+        caller_phone: Фільтр за номером абонента
+        category: Фільтр за ID категорії класифікатора
+        problem: Фільтр за проблемою
+        urgency: Фільтр за терміновістю (emergency, short, standard, info)
+        executor: Фільтр за виконавцем
+        min_confidence, max_confidence: Межі впевненості класифікації
+        start, end: Діапазон часу (ISO, end не включно), охоплює й архівні місяці
         credentials: Облікові дані для аутентифікації
     
     Returns:
-        Список записів історії дзвінків
+        Список записів історії дзвінків та курсор наступної сторінки
     """
     if limit > 100:
         limit = 100
     if limit < 1:
         limit = 10
     
-    history = storage.get_call_history(limit=limit, offset=offset)
+    cursor = None
+    if before:
+        timestamp, _, call_id = before.partition(",")
+        if not timestamp or not call_id:
+            raise HTTPException(status_code=400, detail="Курсор має формат timestamp,id")
+        cursor = (timestamp, call_id)
+    
+    history = await tenant.async_storage.get_call_history(
+        limit=limit, offset=offset, before=cursor, status=status, caller_phone=caller_phone,
+        category=category, problem=problem, urgency=urgency, executor=executor,
+        min_confidence=min_confidence, max_confidence=max_confidence, start=start, end=end
+    )
+    next_cursor = None
+    if len(history) == limit:
+        last = history[-1]
+        next_cursor = f"{last['timestamp']},{last['id']}"
+    
     return {
         "success": True,
         "count": len(history),
         "limit": limit,
         "offset": offset,
-        "history": [record.to_dict() for record in history]
+        "next_cursor": next_cursor,
+        "history": history
     }
 
 
+@app.get("/api/history/search")
+async def search_call_history(
+    q: str,
+    limit: int = 20,
+    offset: int = 0,
+    phrase: bool = False,
+    order: str = "rank",
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    status: Optional[str] = None,
+    tenant: Tenant = Depends(get_tenant),
+    credentials: HTTPBasicCredentials = Depends(security)
+):
+    """
+    Повнотекстовий пошук в історії дзвінків (транскрипт і відповідь)
+    
+    Args:
+        q: Фраза ("дерево впало на машину"); словоформи враховуються
+        limit: Максимальна кількість записів (default: 20, max: 100)
+        offset: Зміщення для пагінації
+        phrase: Точна фраза (слова поспіль, без інших словоформ)
+        order: rank - за релевантністю серед найновіших збігів, recent - від нових до старих
+        start, end: Діапазон часу (ISO, end не включно)
+        status: Фільтр за статусом
+    
+    Returns:
+        Записи з фрагментами тексту, де збіги позначені <mark>
+    """
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Порожній пошуковий запит")
+    limit = min(max(limit, 1), 100)
+    
+    try:
+        results = await tenant.async_storage.search_call_history(
+            q, limit=limit, offset=offset, phrase=phrase, order=order, start=start, end=end, status=status
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {
+        "success": True,
+        "query": q,
+        "count": len(results),
+        "limit": limit,
+        "offset": offset,
+        "results": results
+    }
+
+
+@app.get("/api/history/export")
+async def export_call_history(
+    format: str = "ndjson",
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    status: Optional[str] = None,
+    tenant: Tenant = Depends(get_tenant),
+    credentials: HTTPBasicCredentials = Depends(verify_admin)
+):
+    """
+    Експорт історії дзвінків файлом (потоком, без обмеження кількості записів)
+    
+    Записи читаються курсором порціями по EXPORT_BATCH_SIZE і одразу
+    віддаються клієнту - пам'ять сервера не залежить від обсягу.
+    
+    Args:
+        format: ndjson, csv або parquet (потребує pyarrow)
+        start, end: Діапазон часу (ISO, end не включно), охоплює й архівні місяці
+        status: Фільтр за статусом
+    
+    Returns:
+        StreamingResponse з файлом, записи від старих до нових
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Невідомий формат експорту: {format} (доступні: {', '.join(EXPORT_FORMATS)})"
+        )
+    if format == "parquet" and not PYARROW_AVAILABLE:
+        raise HTTPException(status_code=501, detail="Експорт у Parquet потребує pyarrow")
+    
+    media_type, extension = EXPORT_FORMATS[format]
+    filename = f"call_history_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}"
+    batches = tenant.storage.export_call_history(start=start, end=end, status=status)
+    return StreamingResponse(
+        export_chunks(format, batches),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@app.get("/api/history/archives")
+async def get_history_archives(tenant: Tenant = Depends(get_tenant), credentials: HTTPBasicCredentials = Depends(verify_admin)):
+    """Архівні місяці історії (записи, розмір файлу) та стан фонового архівування"""
+    return {
+        "success": True,
+        "archiver": tenant.archiver.stats(),
+        "data": await tenant.async_storage.get_call_archives()
+    }
+
+
+@app.post("/api/history/archives/run")
+async def run_history_archival(tenant: Tenant = Depends(get_tenant), credentials: HTTPBasicCredentials = Depends(verify_admin)):
+    """Архівувати старі місяці та застосувати політику зберігання зараз, не чекаючи фонового проходу"""
+    try:
+        result = await asyncio.to_thread(tenant.archiver.run_once)
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return {"success": True, "result": result}
+
+
 @app.get("/api/stats")
-async def get_statistics(credentials: HTTPBasicCredentials = Depends(security)):
+async def get_statistics(tenant: Tenant = Depends(get_tenant), credentials: HTTPBasicCredentials = Depends(security)):
     """
     Отримати статистику роботи агента
     
     Returns:
         Статистичні дані про роботу контактного центру
     """
-    total = storage.get_calls_count()
-    resolved = storage.get_calls_count(status="resolved")
-    escalated = storage.get_calls_count(status="escalated")
+    # Усі лічильники - одним викликом у потоці бази даних
+    stats = await tenant.async_storage.get_statistics()
     
-    avg_response_time = storage.get_average_response_time()
+    return {
+        "success": True,
+        "stats": stats
+    }
+
+
+# Діапазон часового ряду за замовчуванням для кожного інтервалу
+TIMESERIES_DEFAULT_RANGE = {
+    "minute": timedelta(hours=1),
+    "hour": timedelta(days=1),
+    "day": timedelta(days=30),
+}
+
+
+@app.get("/api/stats/timeseries")
+async def get_statistics_timeseries(
+    interval: str = "hour",
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    group_by: Optional[str] = None,
+    tenant: Tenant = Depends(get_tenant),
+    credentials: HTTPBasicCredentials = Depends(security)
+):
+    """
+    Часовий ряд дзвінків та частки ескалацій
+    
+    Відповідь будується з агрегатів (хвилина/година/день), що
+    оновлюються разом із записом історії - без розбору JSON класифікації.
+    
+    Args:
+        interval: minute, hour або day
+        start: Початок діапазону (ISO), за замовчуванням - година/доба/30 днів до end
+        end: Кінець діапазону (ISO, не включно), за замовчуванням - зараз
+        group_by: category, urgency або executor
+    
+    Returns:
+        Точки ряду: bucket, group, calls, escalated, escalation_rate
+    """
+    if interval not in TIMESERIES_DEFAULT_RANGE:
+        raise HTTPException(status_code=400, detail="interval має бути minute, hour або day")
+    
+    try:
+        end_time = datetime.fromisoformat(end) if end else datetime.now()
+        start_time = datetime.fromisoformat(start) if start else end_time - TIMESERIES_DEFAULT_RANGE[interval]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="start та end мають бути у форматі ISO 8601")
+    
+    try:
+        series = await tenant.async_storage.get_call_timeseries(
+            start_time.isoformat(), end_time.isoformat(), interval, group_by
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     return {
         "success": True,
-        "stats": {
-            "total_calls": total,
-            "ai_resolved": resolved,
-            "escalated": escalated,
-            "ai_resolved_percent": round(resolved / total * 100, 1) if total > 0 else 0,
-            "avg_response_time": avg_response_time or 3.5
-        }
+        "interval": interval,
+        "group_by": group_by,
+        "start": start_time.isoformat(),
+        "end": end_time.isoformat(),
+        "count": len(series),
+        "series": series
     }
 
 
@@ -443,41 +807,41 @@ async def get_statistics(credentials: HTTPBasicCredentials = Depends(security)):
 # --- Виконавці (Executors) ---
 
 @app.get("/api/references/executors")
-async def get_executors(active_only: bool = False, credentials: HTTPBasicCredentials = Depends(verify_api_key)):
+async def get_executors(active_only: bool = False, tenant: Tenant = Depends(get_tenant), credentials: HTTPBasicCredentials = Depends(verify_api_key)):
     """Отримати список виконавців"""
-    executors = storage.get_executors(active_only)
+    executors = await tenant.async_storage.get_executors(active_only)
     return {"success": True, "count": len(executors), "data": executors}
 
 
 @app.get("/api/references/executors/{executor_id}")
-async def get_executor(executor_id: str, credentials: HTTPBasicCredentials = Depends(verify_api_key)):
+async def get_executor(executor_id: str, tenant: Tenant = Depends(get_tenant), credentials: HTTPBasicCredentials = Depends(verify_api_key)):
     """Отримати виконавця за ID"""
-    executor = storage.get_executor(executor_id)
+    executor = await tenant.async_storage.get_executor(executor_id)
     if not executor:
         raise HTTPException(status_code=404, detail="Виконавця не знайдено")
     return {"success": True, "data": executor}
 
 
 @app.post("/api/references/executors")
-async def create_executor(data: ExecutorBase, credentials: HTTPBasicCredentials = Depends(verify_admin)):
+async def create_executor(data: ExecutorBase, tenant: Tenant = Depends(get_tenant), credentials: HTTPBasicCredentials = Depends(verify_admin)):
     """Створити нового виконавця"""
-    executor = storage.create_executor(data)
+    executor = await tenant.async_storage.create_executor(data)
     return {"success": True, "message": "Виконавця створено", "data": executor}
 
 
 @app.put("/api/references/executors/{executor_id}")
-async def update_executor(executor_id: str, data: ExecutorBase, credentials: HTTPBasicCredentials = Depends(verify_admin)):
+async def update_executor(executor_id: str, data: ExecutorBase, tenant: Tenant = Depends(get_tenant), credentials: HTTPBasicCredentials = Depends(verify_admin)):
     """Оновити виконавця"""
-    executor = storage.update_executor(executor_id, data)
+    executor = await tenant.async_storage.update_executor(executor_id, data)
     if not executor:
         raise HTTPException(status_code=404, detail="Виконавця не знайдено")
     return {"success": True, "message": "Виконавця оновлено", "data": executor}
 
 
 @app.delete("/api/references/executors/{executor_id}")
-async def delete_executor(executor_id: str, credentials: HTTPBasicCredentials = Depends(verify_admin)):
+async def delete_executor(executor_id: str, tenant: Tenant = Depends(get_tenant), credentials: HTTPBasicCredentials = Depends(verify_admin)):
     """Видалити виконавця"""
-    if not storage.delete_executor(executor_id):
+    if not await tenant.async_storage.delete_executor(executor_id):
         raise HTTPException(status_code=404, detail="Виконавця не знайдено")
     return {"success": True, "message": "Виконавця видалено"}
 
@@ -485,109 +849,336 @@ async def delete_executor(executor_id: str, credentials: HTTPBasicCredentials =
 # --- Класифікатор (Classifiers) ---
 
 @app.get("/api/references/classifiers")
-async def get_classifiers(active_only: bool = False, credentials: HTTPBasicCredentials = Depends(verify_api_key)):
+async def get_classifiers(active_only: bool = False, tenant: Tenant = Depends(get_tenant), credentials: HTTPBasicCredentials = Depends(verify_api_key)):
     """Отримати список категорій класифікатора"""
-    classifiers = storage.get_classifiers(active_only)
+    classifiers = await tenant.async_storage.get_classifiers(active_only)
     return {"success": True, "count": len(classifiers), "data": classifiers}
 
 
 @app.get("/api/references/classifiers/{classifier_id}")
-async def get_classifier(classifier_id: str, credentials: HTTPBasicCredentials = Depends(verify_api_key)):
+async def get_classifier(classifier_id: str, tenant: Tenant = Depends(get_tenant), credentials: HTTPBasicCredentials = Depends(verify_api_key)):
     """Отримати категорію за ID"""
-    classifier_item = storage.get_classifier(classifier_id)
+    classifier_item = await tenant.async_storage.get_classifier(classifier_id)
     if not classifier_item:
         raise HTTPException(status_code=404, detail="Категорію не знайдено")
     return {"success": True, "data": classifier_item}
 
 
 @app.post("/api/references/classifiers")
-async def create_classifier(data: ClassifierItemBase, credentials: HTTPBasicCredentials = Depends(verify_admin)):
+async def create_classifier(data: ClassifierItemBase, tenant: Tenant = Depends(get_tenant), credentials: HTTPBasicCredentials = Depends(verify_admin)):
     """Створити нову категорію класифікатора"""
-    classifier_item = storage.create_classifier(data)
-    return {"success": True, "message": "Категорію створено", "data": classifier_item}
+    classifier_item = await tenant.async_storage.create_classifier(data)
+    version = await asyncio.to_thread(tenant.classifier.upsert_item, classifier_item)
+    return {"success": True, "message": "Категорію створено", "data": classifier_item, "classifier_version": version}
 
 
 @app.put("/api/references/classifiers/{classifier_id}")
-async def update_classifier(classifier_id: str, data: ClassifierItemBase, credentials: HTTPBasicCredentials = Depends(verify_admin)):
+async def update_classifier(classifier_id: str, data: ClassifierItemBase, tenant: Tenant = Depends(get_tenant), credentials: HTTPBasicCredentials = Depends(verify_admin)):
     """Оновити категорію"""
-    classifier_item = storage.update_classifier(classifier_id, data)
+    classifier_item = await tenant.async_storage.update_classifier(classifier_id, data)
     if not classifier_item:
         raise HTTPException(status_code=404, detail="Категорію не знайдено")
-    return {"success": True, "message": "Категорію оновлено", "data": classifier_item}
+    version = await asyncio.to_thread(tenant.classifier.upsert_item, classifier_item)
+    return {"success": True, "message": "Категорію оновлено", "data": classifier_item, "classifier_version": version}
 
 
 @app.delete("/api/references/classifiers/{classifier_id}")
-async def delete_classifier(classifier_id: str, credentials: HTTPBasicCredentials = Depends(verify_admin)):
+async def delete_classifier(classifier_id: str, tenant: Tenant = Depends(get_tenant), credentials: HTTPBasicCredentials = Depends(verify_admin)):
     """Видалити категорію"""
-    if not storage.delete_classifier(classifier_id):
+    if not await tenant.async_storage.delete_classifier(classifier_id):
         raise HTTPException(status_code=404, detail="Категорию не знайдено")
-    return {"success": True, "message": "Категорию видалено"}
+    version = await asyncio.to_thread(tenant.classifier.remove_item, classifier_id)
+    return {"success": True, "message": "Категорию видалено", "classifier_version": version}
 
 
 # --- Алгоритми розмови (Conversation Algorithms) ---
 
 @app.get("/api/references/algorithms")
-async def get_algorithms(active_only: bool = False, credentials: HTTPBasicCredentials = Depends(verify_api_key)):
+async def get_algorithms(active_only: bool = False, tenant: Tenant = Depends(get_tenant), credentials: HTTPBasicCredentials = Depends(verify_api_key)):
     """Отримати список алгоритмів розмови"""
-    algorithms = storage.get_algorithms(active_only)
+    algorithms = await tenant.async_storage.get_algorithms(active_only)
     return {"success": True, "count": len(algorithms), "data": algorithms}
 
 
 @app.get("/api/references/algorithms/default")
-async def get_default_algorithm(credentials: HTTPBasicCredentials = Depends(verify_api_key)):
+async def get_default_algorithm(tenant: Tenant = Depends(get_tenant), credentials: HTTPBasicCredentials = Depends(verify_api_key)):
     """Отримати алгоритм за замовчуванням"""
-    algorithm = storage.get_default_algorithm()
+    algorithm = await tenant.async_storage.get_default_algorithm()
     if not algorithm:
         raise HTTPException(status_code=404, detail="Алгоритм за замовчуванням не знайдено")
     return {"success": True, "data": algorithm}
 
 
 @app.get("/api/references/algorithms/{algorithm_id}")
-async def get_algorithm(algorithm_id: str, credentials: HTTPBasicCredentials = Depends(verify_api_key)):
+async def get_algorithm(algorithm_id: str, tenant: Tenant = Depends(get_tenant), credentials: HTTPBasicCredentials = Depends(verify_api_key)):
     """Отримати алгоритм за ID"""
-    algorithm = storage.get_algorithm(algorithm_id)
+    algorithm = await tenant.async_storage.get_algorithm(algorithm_id)
     if not algorithm:
         raise HTTPException(status_code=404, detail="Алгоритм не знайдено")
     return {"success": True, "data": algorithm}
 
 
 @app.post("/api/references/algorithms")
-async def create_algorithm(data: ConversationAlgorithmBase, credentials: HTTPBasicCredentials = Depends(verify_admin)):
+async def create_algorithm(data: ConversationAlgorithmBase, tenant: Tenant = Depends(get_tenant), credentials: HTTPBasicCredentials = Depends(verify_admin)):
     """Створити новий алгоритм розмови"""
-    algorithm = storage.create_algorithm(data)
+    algorithm = await tenant.async_storage.create_algorithm(data)
     return {"success": True, "message": "Алгоритм створено", "data": algorithm}
 
 
 @app.put("/api/references/algorithms/{algorithm_id}")
-async def update_algorithm(algorithm_id: str, data: ConversationAlgorithmBase, credentials: HTTPBasicCredentials = Depends(verify_admin)):
+async def update_algorithm(algorithm_id: str, data: ConversationAlgorithmBase, tenant: Tenant = Depends(get_tenant), credentials: HTTPBasicCredentials = Depends(verify_admin)):
     """Оновити алгоритм"""
-    algorithm = storage.update_algorithm(algorithm_id, data)
+    algorithm = await tenant.async_storage.update_algorithm(algorithm_id, data)
     if not algorithm:
         raise HTTPException(status_code=404, detail="Алгоритм не знайдено")
     return {"success": True, "message": "Алгоритм оновлено", "data": algorithm}
 
 
 @app.delete("/api/references/algorithms/{algorithm_id}")
-async def delete_algorithm(algorithm_id: str, credentials: HTTPBasicCredentials = Depends(verify_admin)):
+async def delete_algorithm(algorithm_id: str, tenant: Tenant = Depends(get_tenant), credentials: HTTPBasicCredentials = Depends(verify_admin)):
     """Видалити алгоритм"""
-    if not storage.delete_algorithm(algorithm_id):
+    if not await tenant.async_storage.delete_algorithm(algorithm_id):
         raise HTTPException(status_code=404, detail="Алгоритм не знайдено")
     return {"success": True, "message": "Алгоритм видалено"}
 
 
 @app.post("/api/references/reload")
-async def reload_references(credentials: HTTPBasicCredentials = Depends(verify_api_key)):
+async def reload_references(tenant: Tenant = Depends(get_tenant), credentials: HTTPBasicCredentials = Depends(verify_api_key)):
     """Перезавантажити дані класифікатора з довідника"""
-    classifier.reload()
+    await asyncio.to_thread(tenant.classifier.reload)
     return {
         "success": True, 
         "message": "Довідники перезавантажено",
-        "classifiers_count": len(classifier.data)
+        "classifiers_count": len(tenant.classifier.data),
+        "classifier_version": tenant.classifier.version
     }
 
 
+@app.post("/api/references/reclassify")
+async def start_reclassification(
+    resume: bool = False,
+    tenant: Tenant = Depends(get_tenant),
+    credentials: HTTPBasicCredentials = Depends(verify_api_key)
+):
+    """
+    Запустити фонову перекласифікацію історії дзвінків тенанта його поточним довідником
+    
+    Args:
+        resume: Продовжити останню незавершену задачу з контрольної точки
+    """
+    try:
+        progress = await asyncio.to_thread(tenant.reclassification.start, resume)
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return {"success": True, "job": progress}
+
+
+@app.get("/api/references/reclassify")
+async def reclassification_progress(tenant: Tenant = Depends(get_tenant), credentials: HTTPBasicCredentials = Depends(verify_api_key)):
+    """Прогрес перекласифікації: оброблено, змінено, швидкість та ETA"""
+    return {"success": True, "job": await asyncio.to_thread(tenant.reclassification.progress)}
+
+
+@app.post("/api/references/reclassify/cancel")
+async def cancel_reclassification(tenant: Tenant = Depends(get_tenant), credentials: HTTPBasicCredentials = Depends(verify_api_key)):
+    """Зупинити перекласифікацію (продовження - resume=true)"""
+    if not tenant.reclassification.cancel():
+        raise HTTPException(status_code=404, detail="Перекласифікація не виконується")
+    return {"success": True, "message": "Перекласифікацію буде зупинено після поточної порції"}
+
+
+# === Інциденти ===
+
+@app.get("/api/incidents")
+async def get_incidents(include_closed: bool = False, tenant: Tenant = Depends(get_tenant), credentials: HTTPBasicCredentials = Depends(verify_api_key)):
+    """
+    Інциденти: масові звернення, згруповані за категорією та місцем
+    
+    Диспетчер бачить один інцидент з кількістю дзвінків, вулицями та
+    адресами замість сотень окремих записів історії.
+    """
+    incidents = tenant.incidents.list(include_closed)
+    return {
+        "success": True,
+        "summary": tenant.incidents.summary(),
+        "data": [incident.to_dict() for incident in incidents]
+    }
+
+
+@app.get("/api/incidents/{incident_id}")
+async def get_incident(incident_id: str, tenant: Tenant = Depends(get_tenant), credentials: HTTPBasicCredentials = Depends(verify_api_key)):
+    """Отримати інцидент за ID"""
+    incident = tenant.incidents.get(incident_id)
+    if not incident:
+        raise HTTPException(status_code=404, detail="Інцидент не знайдено")
+    return {"success": True, "data": incident.to_dict()}
+
+
+@app.post("/api/incidents/{incident_id}/resolve")
+async def resolve_incident(incident_id: str, tenant: Tenant = Depends(get_tenant), credentials: HTTPBasicCredentials = Depends(verify_admin)):
+    """Закрити інцидент (аварію усунуто) - нові дзвінки відкриють новий"""
+    incident = tenant.incidents.resolve(incident_id)
+    if not incident:
+        raise HTTPException(status_code=404, detail="Інцидент не знайдено")
+    return {"success": True, "data": incident.to_dict()}
+
+
+# === Тенанти ===
+
+@app.get("/api/tenants")
+async def get_tenants(credentials: HTTPBasicCredentials = Depends(verify_admin)):
+    """Завантажені тенанти, оцінка пам'яті та бюджет"""
+    return {"success": True, "data": tenant_registry.stats()}
+
+
 # === WebSocket для реального часу ===
 
+async def _play_response(websocket: WebSocket, session: Dict[str, Any], text: str, audio: Optional[AudioBuffer] = None,
+                         previous: Optional[asyncio.Task] = None):
+    """
+    Синтез та потокова відправка аудіо відповіді
+    
+    Виконується як окрема задача, щоб цикл прийому повідомлень продовжував
+    працювати під час відтворення і міг перервати його (barge-in).
+    Заздалегідь синтезоване аудіо (відповідь інциденту) відправляється одразу,
+    решта відповідей береться з пакета аудіо тенанта.
+    Відтворення починається лише після завершення попереднього (previous),
+    тож два аудіо потоки сесії не перемішуються.
+    """
+    if previous is not None:
+        try:
+            await asyncio.wait([previous])
+        except asyncio.CancelledError:
+            previous.cancel()
+            raise
+    session["state"] = "speaking"
+    try:
+        if audio is None:
+            audio = await asyncio.to_thread(session["tenant"].response_audio, text, synthesize_speech_buffer)
+        
+        await websocket.send_json({
+            "type": "audio_start",
+            "format": audio.format,
+            "sample_rate": audio.sample_rate,
+            "size": len(audio)
+        })
+        
+        # Фрагменти - зрізи memoryview; копія лише при передачі у транспорт
+        for chunk in audio.chunks(settings.TTS_STREAM_CHUNK_SIZE):
+            await websocket.send_bytes(chunk.tobytes())
+        
+        await websocket.send_json({"type": "audio_end"})
+    finally:
+        session["state"] = "listening"
+
+
+def _log_task_exception(task: asyncio.Task):
+    """done-callback фонових задач: виняток інакше ніхто не отримає"""
+    if not task.cancelled() and task.exception() is not None:
+        print(f"[Task] Помилка фонової задачі {task.get_name()}: {task.exception()}")
+
+
+def _start_playback(websocket: WebSocket, session: Dict[str, Any], text: str, audio: Optional[AudioBuffer] = None):
+    """
+    Запустити відтворення відповіді у фоновій задачі
+    
+    Попереднє відтворення, що ще триває, переривається (BARGE_IN_ENABLED)
+    або дограє до кінця, а нове чекає на нього.
+    """
+    previous = session.get("playback")
+    if previous is not None and previous.done():
+        previous = None
+    if previous is not None and settings.BARGE_IN_ENABLED:
+        previous.cancel()
+    playback = asyncio.create_task(_play_response(websocket, session, text, audio, previous), name="playback")
+    playback.add_done_callback(_log_task_exception)
+    session["playback"] = playback
+
+
+def _answer_call(tenant: Tenant, classification: ClassificationResult, call_id: str) -> Tuple[Dict, str, Optional[AudioBuffer]]:
+    """
+    Відповідь на дзвінок з урахуванням відкритих інцидентів
+    
+    Дзвінок прив'язується до інциденту (incident_id у класифікації).
+    Якщо інцидент уже відомий, абонент отримує відповідь "ми вже знаємо"
+    замість стандартної; її аудіо синтезується заздалегідь у фоні.
+    
+    Args:
+        tenant: Тенант сесії
+        classification: Результат класифікації
+        call_id: ID дзвінка
+    
+    Returns:
+        (класифікація для клієнта та історії, текст відповіді, готове аудіо або None)
+    """
+    data = classification_to_dict(classification)
+    incident = tenant.incidents.observe(classification, call_id)
+    if incident is None:
+        return data, classification.response, None
+    
+    data["incident_id"] = incident.id
+    if tenant.incidents.should_prerender(incident):
+        # Event loop тримає лише слабке посилання на задачу - сильне зберігає тенант
+        task = asyncio.create_task(
+            asyncio.to_thread(tenant.incidents.prerender, incident, synthesize_speech_buffer),
+            name=f"prerender-{incident.id}"
+        )
+        tenant.background_tasks.add(task)
+        task.add_done_callback(tenant.background_tasks.discard)
+        task.add_done_callback(_log_task_exception)
+    if incident.known:
+        return data, incident.response, incident.audio
+    return data, classification.response, None
+
+
+def _call_record(call_id: str, transcript: str, classification: ClassificationResult,
+                 classification_data: Dict, response_text: str) -> CallRecordCreate:
+    """Запис історії для дзвінка під тим самим ID, що й у інциденті"""
+    return CallRecordCreate(
+        id=call_id,
+        timestamp=datetime.now().isoformat(),
+        caller_phone=None,
+        transcript=transcript,
+        classification=classification_data,
+        status="escalated" if classification.needs_operator else "resolved",
+        response_text=response_text,
+        executor=classification.executor
+    )
+
+
+async def _barge_in(websocket: WebSocket, session: Dict[str, Any], reason: str) -> bool:
+    """
+    Перервати синтез та відтворення, якщо абонент почав говорити
+    
+    Скасовує задачу синтезу (результат синтезу, що вже виконується у потоці,
+    буде відкинуто) та всі ще не відправлені аудіо-фрагменти.
+    
+    Returns:
+        True якщо відтворення було перервано
+    """
+    playback = session.get("playback")
+    if not settings.BARGE_IN_ENABLED or playback is None or playback.done():
+        return False
+    
+    playback.cancel()
+    try:
+        await playback
+    except asyncio.CancelledError:
+        pass
+    except Exception:
+        pass  # виняток залоговано done-callback задачі
+    
+    session["playback"] = None
+    session["state"] = "listening"
+    
+    await websocket.send_json({
+        "type": "playback_cancelled",
+        "reason": reason
+    })
+    await websocket.send_json({"type": "listening"})
+    return True
+
+
 @app.websocket("/ws/call")
 async def websocket_call(websocket: WebSocket):
     """
@@ -601,8 +1192,26 @@ async def websocket_call(websocket: WebSocket):
     5. Сервер відправляє класифікацію
     6. Сервер відправляє відповідь (TTS)
     
+    Аудіо відповіді надсилається фрагментами між повідомленнями
+    `audio_start` та `audio_end`. Якщо абонент починає говорити
+    (повідомлення `interrupt`, подія VAD `speech_start` або нове аудіо),
+    відтворення перериваються і сесія одразу переходить у стан `listening`.
+    
+    Тенант (гаряча лінія) обирається параметром `?tenant=`, ключ тенанта -
+    параметром `?key=`.
+    
     Примітка: Для production потрібно додати аутентифікацію WebSocket
     """
+    tenant_id = websocket.query_params.get("tenant")
+    if not tenant_registry.has_access(tenant_id, websocket.query_params.get("key", "")):
+        await websocket.close(code=1008)  # Policy Violation
+        return
+    try:
+        tenant = await asyncio.to_thread(tenant_registry.get, tenant_id)
+    except (ValueError, KeyError):
+        await websocket.close(code=1008)  # Policy Violation
+        return
+    
     await websocket.accept()
     session_id = str(uuid.uuid4())
     client_ip = websocket.client.host if websocket.client else "unknown"
@@ -616,6 +1225,19 @@ async def websocket_call(websocket: WebSocket):
         await websocket.close(code=1013)  # Try Again Later
         return
     
+    # Зберігаємо сесію
+    session = {
+        "start_time": datetime.now().isoformat(),
+        "active": True,
+        "ip": client_ip,
+        "state": "listening",
+        "playback": None,
+        "tenant": tenant
+    }
+    sessions[session_id] = session
+    # Тенант з відкритою сесією не закривається при витісненні
+    tenant.sessions += 1
+    
     try:
         # Привітання
         greeting = "Доброго дня! Ви зателефонували на гарячу лінію контактного центру. Чим можу вам допомогти?"
@@ -623,27 +1245,26 @@ async def websocket_call(websocket: WebSocket):
         await websocket.send_json({
             "type": "greeting",
             "text": greeting,
-            "session_id": session_id
+            "session_id": session_id,
+            "tenant": tenant.id
         })
         
         # Синтез привітання
-        audio_bytes, _ = synthesize_speech(greeting)
-        await websocket.send_bytes(audio_bytes)
-        
-        # Зберігаємо сесію
-        sessions[session_id] = {
-            "start_time": datetime.now().isoformat(),
-            "active": True,
-            "ip": client_ip
-        }
+        _start_playback(websocket, session, greeting)
         
         while True:
             # Отримання повідомлення
             data = await websocket.receive()
             
-            if "bytes" in data:
+            if data.get("type") == "websocket.disconnect":
+                break
+            
+            if data.get("bytes") is not None:
+                # Нове аудіо під час відтворення - абонент перебиває агента
+                await _barge_in(websocket, session, reason="speech")
+                
                 # Аудіо дані - транскрибування
-                audio_data = data["bytes"]
+                audio_data = AudioBuffer.from_bytes(data["bytes"], format="webm")
                 
                 # Перевірка розміру
                 if len(audio_data) > 5 * 1024 * 1024:  # 5MB
@@ -653,7 +1274,7 @@ async def websocket_call(websocket: WebSocket):
                     })
                     continue
                 
-                transcript = transcribe_audio_bytes(audio_data)
+                transcript = await asyncio.to_thread(transcribe_audio_bytes, audio_data)
                 
                 await websocket.send_json({
                     "type": "transcript",
@@ -661,49 +1282,31 @@ async def websocket_call(websocket: WebSocket):
                 })
                 
                 # Класифікація
-                classification = classify_query(transcript)
+                call_id = uuid7()
+                classification = await asyncio.to_thread(classify_query, transcript, tenant.classifier)
+                classification_data, response_text, response_audio = _answer_call(tenant, classification, call_id)
                 
                 await websocket.send_json({
                     "type": "classification",
-                    "data": {
-                        "problem": classification.problem,
-                        "subtype": classification.subtype,
-                        "executor": classification.executor,
-                        "urgency": classification.urgency,
-                        "response_time": classification.response_time,
-                        "confidence": classification.confidence,
-                        "needs_operator": classification.needs_operator
-                    }
+                    "data": classification_data
                 })
                 
                 # Відповідь
                 await websocket.send_json({
                     "type": "response",
-                    "text": classification.response
+                    "text": response_text,
+                    "incident_id": classification_data.get("incident_id")
                 })
                 
-                # Синтез відповіді
-                response_audio, _ = synthesize_speech(classification.response)
-                await websocket.send_bytes(response_audio)
-                
                 # Збереження в історію
-                record = CallRecordCreate(
-                    id=str(uuid.uuid4()),
-                    timestamp=datetime.now().isoformat(),
-                    caller_phone=None,
-                    transcript=transcript,
-                    classification={
-                        "problem": classification.problem,
-                        "subtype": classification.subtype,
-                        "executor": classification.executor
-                    },
-                    status="escalated" if classification.needs_operator else "resolved",
-                    response_text=classification.response,
-                    executor=classification.executor
+                await tenant.call_writer.write(
+                    _call_record(call_id, transcript, classification, classification_data, response_text)
                 )
-                storage.create_call_record(record)
                 
-            elif "text" in data:
+                # Синтез відповіді (може бути перерваний наступним повідомленням)
+                _start_playback(websocket, session, response_text, response_audio)
+                
+            elif data.get("text") is not None:
                 # Текстове повідомлення
                 try:
                     message = json.loads(data["text"])
@@ -714,7 +1317,12 @@ async def websocket_call(websocket: WebSocket):
                     })
                     continue
                 
-                if message.get("type") == "text_query":
+                if message.get("type") in ("interrupt", "speech_start"):
+                    # Barge-in: явний сигнал клієнта або подія VAD
+                    if not await _barge_in(websocket, session, reason=message["type"]):
+                        await websocket.send_json({"type": "listening"})
+                
+                elif message.get("type") == "text_query":
                     query_text = message.get("text", "")
                     
                     if not query_text.strip():
@@ -724,28 +1332,30 @@ async def websocket_call(websocket: WebSocket):
                         })
                         continue
                     
-                    # Класифікація
-                    classification = classify_query(query_text)
+                    await _barge_in(websocket, session, reason="text_query")
+                    
+                    # Класифікація (ID дзвінка в інциденті - той самий, що й в історії)
+                    call_id = uuid7()
+                    classification = await asyncio.to_thread(classify_query, query_text, tenant.classifier)
+                    classification_data, response_text, _ = _answer_call(tenant, classification, call_id)
                     
                     await websocket.send_json({
                         "type": "classification",
-                        "data": {
-                            "problem": classification.problem,
-                            "subtype": classification.subtype,
-                            "executor": classification.executor,
-                            "urgency": classification.urgency,
-                            "response_time": classification.response_time,
-                            "confidence": classification.confidence,
-                            "needs_operator": classification.needs_operator
-                        }
+                        "data": classification_data
                     })
                     
                     await websocket.send_json({
                         "type": "response",
-                        "text": classification.response
+                        "text": response_text,
+                        "incident_id": classification_data.get("incident_id")
                     })
                     
+                    await tenant.call_writer.write(
+                        _call_record(call_id, query_text, classification, classification_data, response_text)
+                    )
+                    
                 elif message.get("type") == "end_call":
+                    await _barge_in(websocket, session, reason="end_call")
                     await websocket.send_json({
                         "type": "call_ended",
                         "session_id": session_id
@@ -756,7 +1366,8 @@ async def websocket_call(websocket: WebSocket):
                     # Heartbeat для підтримки з'єднання
                     await websocket.send_json({
                         "type": "pong",
-                        "session_id": session_id
+                        "session_id": session_id,
+                        "state": session["state"]
                     })
                     
     except WebSocketDisconnect:
@@ -768,7 +1379,13 @@ async def websocket_call(websocket: WebSocket):
         except Exception:
             pass
     finally:
+        # Зупиняємо відтворення, що ще триває
+        playback = session.get("playback")
+        if playback is not None and not playback.done():
+            playback.cancel()
+        
         # Очищення сесії
+        tenant.sessions -= 1
         if session_id in sessions:
             del sessions[session_id]
 
@@ -0,0 +1,228 @@
+"""
+Фонова перекласифікація історії дзвінків
+Після зміни довідника класифікація в call_history застаріває - задача
+проходить історію порціями, класифікує транскрипти пакетами та
+записує змінені записи назад
+"""
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from config import settings
+from classifier import QueryClassifier, classify_queries, classification_to_dict
+from storage import StorageService
+
+
+# Стани задачі
+STATUS_RUNNING = "running"
+STATUS_COMPLETED = "completed"
+STATUS_CANCELLED = "cancelled"
+STATUS_FAILED = "failed"
+
+
+# Поля, що не залежать від класифікатора: версія знімка не вважається зміною,
+# прив'язка до інциденту зберігається
+_SERVICE_FIELDS = ("snapshot_version", "incident_id")
+
+
+def _comparable(classification: Dict) -> Dict:
+    """Класифікація без службових полів"""
+    return {key: value for key, value in classification.items() if key not in _SERVICE_FIELDS}
+
+
+class ReclassificationJob:
+    """
+    Фонова задача перекласифікації call_history
+
+    - Обхід у порядку (timestamp, id) keyset-порціями по RECLASSIFY_CHUNK_SIZE
+    - Транскрипти порції класифікуються одним пакетним викликом
+    - Змінені записи та контрольна точка пишуться однією транзакцією,
+      тому після перезапуску задача продовжує з останньої порції
+    - Між порціями пауза: задача займає не більше RECLASSIFY_MAX_DUTY
+      часу, щоб не витісняти живий трафік (SQLite та CPU)
+    - Задача запам'ятовує відбиток вмісту довідника (fingerprint знімка):
+      він не залежить від процесу, тож після перезапуску видно, чи
+      оброблені записи класифіковані поточним довідником
+
+    Задача належить тенанту (своя база та класифікатор); одночасно
+    виконується лише одна задача тенанта.
+    """
+
+    def __init__(self, store: StorageService, get_classifier: Callable[[], QueryClassifier]):
+        """
+        Args:
+            store: База тенанта
+            get_classifier: Класифікатор тенанта (викликається для кожної
+                            порції - класифікатор може бути вивантажений)
+        """
+        self.storage = store
+        self.get_classifier = get_classifier
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.job: Optional[Dict] = None
+        # Швидкість рахується з початку поточного запуску (з паузами)
+        self._run_started = 0.0
+        self._run_processed = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, resume: bool = False) -> Dict:
+        """
+        Запустити перекласифікацію
+
+        Args:
+            resume: Продовжити останню незавершену задачу з контрольної точки
+
+        Raises:
+            RuntimeError: якщо задача вже виконується
+        """
+        with self._lock:
+            if self.running:
+                raise RuntimeError("Перекласифікація вже виконується")
+
+            fingerprint = self.get_classifier().snapshot.fingerprint()
+            job = None
+            if resume:
+                last = self.storage.get_reclassification_job()
+                if last and last["status"] != STATUS_COMPLETED:
+                    if last["reference_fingerprint"] == fingerprint:
+                        job = last
+                        print(f"[Reclassify] Продовження задачі {job['id']} з {job['processed']}/{job['total']}")
+                    else:
+                        # Оброблені записи класифіковані іншим довідником - обхід спочатку
+                        print(f"[Reclassify] Довідник змінився після задачі {last['id']} - нова задача")
+
+            if job is None:
+                job = {
+                    "id": str(uuid.uuid4()),
+                    "cursor_timestamp": None,
+                    "cursor_id": None,
+                    "processed": 0,
+                    "changed": 0,
+                    "started_at": datetime.now().isoformat(),
+                    "reference_fingerprint": fingerprint,
+                }
+
+            job.update({
+                "status": STATUS_RUNNING,
+                "total": self.storage.get_calls_count(),
+                "error": None,
+                "finished_at": None,
+            })
+            self.storage.save_reclassification_job(job)
+
+            self.job = job
+            self._stop.clear()
+            self._run_started = time.monotonic()
+            self._run_processed = 0
+            self._thread = threading.Thread(target=self._run, name=f"reclassify-{job['id'][:8]}", daemon=True)
+            self._thread.start()
+            return self.progress()
+
+    def cancel(self) -> bool:
+        """Зупинити задачу після поточної порції (її можна продовжити з resume)"""
+        if not self.running:
+            return False
+        self._stop.set()
+        return True
+
+    def wait(self, timeout: Optional[float] = None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        job = self.job
+        chunk_size = settings.RECLASSIFY_CHUNK_SIZE
+        duty = min(1.0, max(0.05, settings.RECLASSIFY_MAX_DUTY))
+        print(f"[Reclassify] Старт задачі {job['id']}: {job['total']} записів")
+
+        try:
+            while not self._stop.is_set():
+                chunk_started = time.monotonic()
+                after = None
+                if job["cursor_id"] is not None:
+                    after = (job["cursor_timestamp"], job["cursor_id"])
+                rows = self.storage.get_call_history_chunk(after, chunk_size)
+                if not rows:
+                    break
+
+                updates = self._changed_rows(rows)
+
+                job["cursor_timestamp"] = rows[-1]["timestamp"] or ""
+                job["cursor_id"] = rows[-1]["id"]
+                job["processed"] += len(rows)
+                job["changed"] += len(updates)
+                self.storage.update_call_classifications(updates, job)
+                self._run_processed += len(rows)
+
+                # Пропорційна пауза: робота займає не більше частки duty
+                elapsed = time.monotonic() - chunk_started
+                self._stop.wait(elapsed * (1 - duty) / duty)
+
+            job["status"] = STATUS_CANCELLED if self._stop.is_set() else STATUS_COMPLETED
+        except Exception as e:
+            print(f"[Reclassify] ❌ Помилка: {e}")
+            job["status"] = STATUS_FAILED
+            job["error"] = str(e)
+
+        job["finished_at"] = datetime.now().isoformat()
+        self.storage.save_reclassification_job(job)
+        print(f"[Reclassify] Задача {job['id']}: {job['status']}, "
+              f"оброблено {job['processed']}, змінено {job['changed']}")
+
+    def _changed_rows(self, rows: List[Dict]) -> List[Dict]:
+        """Нова класифікація записів порції; повертає лише змінені"""
+        rows = [row for row in rows if (row["transcript"] or "").strip()]
+        if not rows:
+            return []
+
+        results = classify_queries([row["transcript"] for row in rows], self.get_classifier())
+        updates = []
+        for row, result in zip(rows, results):
+            classification = classification_to_dict(result)
+            if "incident_id" in row["classification"]:
+                classification["incident_id"] = row["classification"]["incident_id"]
+            status = "escalated" if result.needs_operator else "resolved"
+            if (_comparable(classification) == _comparable(row["classification"])
+                    and status == row["status"] and result.executor == row["executor"]):
+                continue
+            updates.append({
+                "id": row["id"],
+                "classification": classification,
+                "status": status,
+                "executor": result.executor,
+            })
+        return updates
+
+    def progress(self) -> Dict:
+        """Стан задачі, швидкість та оцінка часу до завершення"""
+        job = self.job or self.storage.get_reclassification_job()
+        if job is None:
+            return {"status": "idle"}
+
+        running = self.running and job is self.job
+        progress = dict(job)
+        total = job.get("total") or 0
+        processed = job.get("processed") or 0
+        progress["running"] = running
+        progress["percent"] = round(min(processed, total) / total * 100, 1) if total else 100.0
+
+        rate = None
+        eta = None
+        if running:
+            elapsed = time.monotonic() - self._run_started
+            if elapsed > 0 and self._run_processed:
+                rate = self._run_processed / elapsed
+                eta = max(0, total - processed) / rate
+        progress["rows_per_second"] = round(rate, 1) if rate else None
+        progress["eta_seconds"] = round(eta, 1) if eta is not None else None
+        # Якщо довідник змінився після старту, раніше оброблені записи знову застаріли
+        current = self.get_classifier().snapshot.fingerprint()
+        progress["current_reference_fingerprint"] = current
+        progress["stale"] = job.get("reference_fingerprint") != current
+        return progress
@@ -2,14 +2,99 @@
 Сховище даних - персистентне зберігання для контактного центру
 Підтримує SQLite та інтеграцію з Oracle APEX
 """
+import asyncio
+import functools
+import heapq
+import itertools
 import json
 import os
+import re
 import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Optional, List, Dict, Any
+from typing import Callable, Iterator, Optional, List, Dict, Any, Tuple
 from dataclasses import dataclass, asdict, field
 import uuid
 
+from config import settings
+from text_utils import APOSTROPHES, UK_MIN_STEM, normalize_query, uk_word_forms
+
+
+_uuid7_lock = threading.Lock()
+_uuid7_last = (0, 0)  # (мілісекунди, 74 випадкові біти) останнього ID
+
+
+def uuid7() -> str:
+    """
+    Впорядкований за часом UUID (версія 7, RFC 9562)
+    
+    48 біт - час у мілісекундах, далі 74 випадкові біти. Нові ID більші
+    за попередні (в межах однієї мілісекунди випадкова частина
+    збільшується на 1), тому вставка в індекс первинного ключа йде в
+    кінець B-дерева, а не у випадкову сторінку, як з uuid4. Рядкове
+    порівняння ID збігається з порядком створення.
+    """
+    global _uuid7_last
+    with _uuid7_lock:
+        millis = time.time_ns() // 1_000_000
+        last_millis, last_random = _uuid7_last
+        if millis > last_millis:
+            random_bits = int.from_bytes(os.urandom(10), "big") >> 6
+        else:
+            millis, random_bits = last_millis, last_random + 1
+            if random_bits >> 74:
+                millis, random_bits = millis + 1, 0
+        _uuid7_last = (millis, random_bits)
+    
+    value = (millis << 80) | (0x7 << 76) | ((random_bits >> 62) << 64) | (0b10 << 62) | (random_bits & ((1 << 62) - 1))
+    return str(uuid.UUID(int=value))
+
+
+MONTH_RE = re.compile(r"^\d{4}-\d{2}$")
+
+
+def shift_month(month: str, months: int) -> str:
+    """Місяць "YYYY-MM", зсунутий на months (від'ємне - назад)"""
+    index = int(month[:4]) * 12 + int(month[5:7]) - 1 + months
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+# Позначки збігу та довжина фрагмента (токенів) у результатах пошуку
+SEARCH_SNIPPET = ("<mark>", "</mark>", 12)
+
+
+def build_search_query(text: str, phrase: bool = False) -> str:
+    """
+    Запит FTS5 з тексту користувача
+    
+    Кожне слово шукається в усіх формах з тією ж основою (uk_word_forms):
+    "дерево впало на машину" знаходить "дерева впали на машини". Слова,
+    коротші за UK_MIN_STEM (прийменники, сполучники), пропускаються,
+    якщо є довші. Замість префіксного запиту ("дерев*") - явний OR форм:
+    FTS5 не збирає в пам'яті списки документів усіх слів з префіксом і
+    не плутає "дерево" з "деревообробний".
+    Синтаксис FTS5 у тексті користувача не інтерпретується: кожне слово
+    береться в лапки.
+    
+    Args:
+        text: Запит користувача
+        phrase: Точна фраза (слова поспіль і в тих самих формах)
+    """
+    words = normalize_query(text).replace("-", " ").split()
+    if not words:
+        return ""
+    if phrase:
+        return '"' + " ".join(words) + '"'
+    
+    long_words = [word for word in words if len(word) >= UK_MIN_STEM] or words
+    return " AND ".join(
+        "(" + " OR ".join(f'"{form}"' for form in uk_word_forms(word)) + ")"
+        for word in long_words
+    )
+
 
 # ============================================
 # Моделі даних (Pydantic-сумісні dataclasses)
@@ -29,7 +114,7 @@ class ExecutorBase:
 @dataclass
 class Executor(ExecutorBase):
     """Виконавець з ID"""
-    id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = field(default_factory=uuid7)
     created_at: str = field(default_factory=lambda: datetime.now().isoformat())
     updated_at: str = field(default_factory=lambda: datetime.now().isoformat())
 
@@ -53,7 +138,7 @@ class ClassifierItemBase:
 @dataclass
 class ClassifierItem(ClassifierItemBase):
     """Елемент класифікатора з ID"""
-    id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = field(default_factory=uuid7)
     created_at: str = field(default_factory=lambda: datetime.now().isoformat())
     updated_at: str = field(default_factory=lambda: datetime.now().isoformat())
 
@@ -72,7 +157,7 @@ class ConversationAlgorithmBase:
 @dataclass
 class ConversationAlgorithm(ConversationAlgorithmBase):
     """Алгоритм розмови з ID"""
-    id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = field(default_factory=uuid7)
     created_at: str = field(default_factory=lambda: datetime.now().isoformat())
     updated_at: str = field(default_factory=lambda: datetime.now().isoformat())
 
@@ -91,7 +176,7 @@ class CallRecordBase:
 @dataclass
 class CallRecordCreate(CallRecordBase):
     """Створення запису дзвінка"""
-    id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = field(default_factory=uuid7)
     timestamp: str = field(default_factory=lambda: datetime.now().isoformat())
 
 
@@ -102,6 +187,79 @@ class CallRecord(CallRecordCreate):
     created_at: str = field(default_factory=lambda: datetime.now().isoformat())
 
 
+# ============================================
+# З'єднання SQLite
+# ============================================
+
+class ConnectionManager:
+    """
+    Персистентні з'єднання SQLite - по одному на потік
+    
+    Відкриття з'єднання (файл, схема, PRAGMA) коштує більше за типовий
+    запит сервісу, тому з'єднання потоку живе стільки ж, скільки потік
+    (FastAPI виконує синхронні виклики в пулі потоків). Кожне з'єднання:
+    - WAL: читачі не блокуються записом
+    - synchronous=NORMAL: у WAL без fsync на кожну транзакцію, база
+      цілісна після збою, можуть втратитись лише останні транзакції
+    - більший кеш сторінок, mmap та кеш підготовлених запитів
+    З'єднання завершених потоків закриваються при відкритті нових.
+    """
+    
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: Dict[int, Tuple[threading.Thread, sqlite3.Connection]] = {}
+        self.opened = 0
+    
+    def get(self) -> sqlite3.Connection:
+        """З'єднання поточного потоку"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._open()
+            self._local.conn = conn
+            with self._lock:
+                self._close_dead()
+                self._connections[threading.get_ident()] = (threading.current_thread(), conn)
+                self.opened += 1
+        return conn
+    
+    def _open(self) -> sqlite3.Connection:
+        # check_same_thread=False лише для закриття з'єднань завершених
+        # потоків; кожне з'єднання використовується одним потоком
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=settings.SQLITE_BUSY_TIMEOUT,
+            cached_statements=settings.SQLITE_CACHED_STATEMENTS,
+            check_same_thread=False
+        )
+        conn.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+        conn.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+        conn.execute(f"PRAGMA cache_size=-{int(settings.SQLITE_CACHE_SIZE_KB)}")
+        conn.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE_MB) * 1024 * 1024}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+    
+    def _close_dead(self):
+        """Закрити з'єднання потоків, що завершились (викликається під self._lock)"""
+        for ident, (thread, conn) in list(self._connections.items()):
+            if not thread.is_alive():
+                conn.close()
+                del self._connections[ident]
+    
+    def close_all(self):
+        """Закрити всі з'єднання (при завершенні роботи)"""
+        with self._lock:
+            for thread, conn in self._connections.values():
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"open": len(self._connections), "opened_total": self.opened}
+
+
 # ============================================
 # Storage Service
 # ============================================
@@ -123,65 +281,163 @@ class StorageService:
             db_path: Шлях до файлу SQLite бази даних
         """
         self.db_path = db_path
+        # Архіви місяців історії - поруч з базою (кожен тенант має власні)
+        self.archive_dir = os.path.splitext(db_path)[0] + "_archive"
+        self._connections = ConnectionManager(db_path)
         self._init_database()
     
     def _init_database(self):
         """Ініціалізація структури бази даних"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        # Таблиця виконавців
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS executors (
-                id TEXT PRIMARY KEY,
-                name TEXT NOT NULL,
-                phone TEXT,
-                email TEXT,
-                work_hours TEXT,
-                description TEXT,
-                is_active INTEGER DEFAULT 1,
-                created_at TEXT,
-                updated_at TEXT
-            )
-        ''')
-        
-        # Таблиця класифікатора
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS classifiers (
-                id TEXT PRIMARY KEY,
-                problem TEXT NOT NULL,
-                subtype TEXT NOT NULL,
-                type TEXT,
-                location TEXT,
-                response TEXT NOT NULL,
-                executor TEXT NOT NULL,
-                executor_id TEXT,
-                urgency TEXT DEFAULT 'standard',
-                response_time INTEGER DEFAULT 24,
-                keywords TEXT,
-                is_active INTEGER DEFAULT 1,
-                created_at TEXT,
-                updated_at TEXT
-            )
-        ''')
-        
-        # Таблиця алгоритмів
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS algorithms (
-                id TEXT PRIMARY KEY,
-                name TEXT NOT NULL,
-                description TEXT,
-                steps TEXT,
-                trigger_keywords TEXT,
-                is_default INTEGER DEFAULT 0,
-                is_active INTEGER DEFAULT 1,
-                created_at TEXT,
-                updated_at TEXT
-            )
-        ''')
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            # Таблиця виконавців
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS executors (
+                    id TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    phone TEXT,
+                    email TEXT,
+                    work_hours TEXT,
+                    description TEXT,
+                    is_active INTEGER DEFAULT 1,
+                    created_at TEXT,
+                    updated_at TEXT
+                )
+            ''')
+            
+            # Таблиця класифікатора
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS classifiers (
+                    id TEXT PRIMARY KEY,
+                    problem TEXT NOT NULL,
+                    subtype TEXT NOT NULL,
+                    type TEXT,
+                    location TEXT,
+                    response TEXT NOT NULL,
+                    executor TEXT NOT NULL,
+                    executor_id TEXT,
+                    urgency TEXT DEFAULT 'standard',
+                    response_time INTEGER DEFAULT 24,
+                    keywords TEXT,
+                    is_active INTEGER DEFAULT 1,
+                    created_at TEXT,
+                    updated_at TEXT
+                )
+            ''')
+            
+            # Таблиця алгоритмів
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS algorithms (
+                    id TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    description TEXT,
+                    steps TEXT,
+                    trigger_keywords TEXT,
+                    is_default INTEGER DEFAULT 0,
+                    is_active INTEGER DEFAULT 1,
+                    created_at TEXT,
+                    updated_at TEXT
+                )
+            ''')
+            
+            # Таблиця історії дзвінків (гарячий розділ)
+            self._create_call_history(conn)
+            
+            # Місяці, перенесені з call_history в архівні бази
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS call_history_archives (
+                    month TEXT PRIMARY KEY,
+                    rows INTEGER NOT NULL DEFAULT 0,
+                    archived_at TEXT,
+                    deleted_at TEXT
+                )
+            ''')
+            
+            # Контрольні точки фонової перекласифікації
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS reclassification_jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    reference_fingerprint TEXT,
+                    cursor_timestamp TEXT,
+                    cursor_id TEXT,
+                    processed INTEGER DEFAULT 0,
+                    changed INTEGER DEFAULT 0,
+                    total INTEGER DEFAULT 0,
+                    error TEXT,
+                    started_at TEXT,
+                    updated_at TEXT,
+                    finished_at TEXT
+                )
+            ''')
+            # Бази, створені до відбитка довідника, мали лише версію знімка процесу
+            job_columns = {row[1] for row in conn.execute("PRAGMA table_info(reclassification_jobs)")}
+            if "reference_fingerprint" not in job_columns:
+                conn.execute("ALTER TABLE reclassification_jobs ADD COLUMN reference_fingerprint TEXT")
+            
+            # Лічильники історії за статусом (підтримуються тригерами)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS call_stats (
+                    status TEXT PRIMARY KEY,
+                    calls INTEGER NOT NULL DEFAULT 0,
+                    duration_sum INTEGER NOT NULL DEFAULT 0,
+                    duration_count INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+            
+            # Часові ряди: дзвінки за хвилину/годину/день у розрізі категорії,
+            # терміновості та виконавця (підтримуються тригерами)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS call_rollups (
+                    bucket_size TEXT NOT NULL,
+                    bucket TEXT NOT NULL,
+                    category TEXT NOT NULL,
+                    urgency TEXT NOT NULL,
+                    executor TEXT NOT NULL,
+                    calls INTEGER NOT NULL DEFAULT 0,
+                    escalated INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (bucket_size, bucket, category, urgency, executor)
+                ) WITHOUT ROWID
+            ''')
+            
+            # Прапорець архівування (один рядок): поки він встановлений у
+            # транзакції архівування, тригери видалення не змінюють лічильники
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS call_history_control (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    archiving INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+            cursor.execute("INSERT OR IGNORE INTO call_history_control (id, archiving) VALUES (1, 0)")
+            conn.commit()
+            
+            self._init_call_stats_triggers(conn)
+            self._init_call_rollups_triggers(conn)
+            self._gate_archive_triggers(conn)
+            self._init_search_index(conn)
         
-        # Таблиця історії дзвінків
-        cursor.execute('''
+        print(f"[Storage] База даних ініціалізована: {self.db_path}")
+    
+    # Поля класифікації як генеровані (VIRTUAL) колонки call_history:
+    # обчислюються з JSON при читанні, на диску зберігаються лише в індексах
+    CLASSIFICATION_COLUMNS = {
+        "classifier_id": ("TEXT", "$.id"),
+        "problem": ("TEXT", "$.problem"),
+        "subtype": ("TEXT", "$.subtype"),
+        "urgency": ("TEXT", "$.urgency"),
+        "confidence": ("REAL", "$.confidence"),
+    }
+    
+    # Ключ порядку для повних обходів історії (перекласифікація, експорт):
+    # записи без timestamp йдуть першими, а не випадають з порівнянь з NULL
+    ORDER_KEY = "COALESCE(timestamp, '')"
+    
+    HISTORY_COLUMNS = ['id', 'timestamp', 'caller_phone', 'transcript', 'classification', 'status', 'response_text', 'executor', 'duration_seconds', 'created_at']
+    
+    def _create_call_history(self, conn):
+        """Таблиця call_history з індексами (гарячий розділ або архів місяця)"""
+        conn.execute('''
             CREATE TABLE IF NOT EXISTS call_history (
                 id TEXT PRIMARY KEY,
                 timestamp TEXT,
@@ -196,14 +452,378 @@ class StorageService:
             )
         ''')
         
+        # Порядок (timestamp, id) для сторінок історії та (ORDER_KEY, id) -
+        # для keyset-обходу всієї історії
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_call_history_timestamp_id
+            ON call_history (timestamp, id)
+        ''')
+        conn.execute(f'''
+            CREATE INDEX IF NOT EXISTS idx_call_history_order
+            ON call_history ({self.ORDER_KEY}, id)
+        ''')
+        
+        self._migrate_classification_columns(conn)
+        
+        # Фільтри історії та лічильники за статусом / номером абонента
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_call_history_status
+            ON call_history (status, timestamp, id)
+        ''')
+        conn.execute(f'''
+            CREATE INDEX IF NOT EXISTS idx_call_history_status_order
+            ON call_history (status, {self.ORDER_KEY}, id)
+        ''')
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_call_history_caller_phone
+            ON call_history (caller_phone, timestamp, id)
+        ''')
+    
+    def _migrate_classification_columns(self, conn):
+        """
+        Генеровані колонки та індекси для полів класифікації
+        
+        ALTER TABLE ... ADD COLUMN ... VIRTUAL не переписує таблицю: для
+        наявних записів значення обчислюються так само, як для нових, а
+        CREATE INDEX один раз проходить історію. Некоректний JSON дає NULL
+        замість помилки читання.
+        """
+        existing = {row[1] for row in conn.execute("PRAGMA table_xinfo(call_history)")}
+        added = []
+        for column, (column_type, path) in self.CLASSIFICATION_COLUMNS.items():
+            if column not in existing:
+                conn.execute(f'''
+                    ALTER TABLE call_history ADD COLUMN {column} {column_type}
+                    GENERATED ALWAYS AS (
+                        CASE WHEN json_valid(classification) THEN json_extract(classification, '{path}') END
+                    ) VIRTUAL
+                ''')
+                added.append(column)
+        if added and conn.execute("SELECT 1 FROM call_history LIMIT 1").fetchone():
+            print(f"[Storage] Історія дзвінків: додано колонки {', '.join(added)}, будуються індекси...")
+        
+        for column in ("classifier_id", "problem", "urgency", "executor"):
+            conn.execute(f'''
+                CREATE INDEX IF NOT EXISTS idx_call_history_{column}
+                ON call_history ({column}, timestamp, id)
+            ''')
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_call_history_confidence
+            ON call_history (confidence)
+        ''')
+    
+    # Внесок запису історії в лічильники; тривалість враховується, якщо вона > 0
+    _CALL_STATS_ADD = '''
+        INSERT INTO call_stats (status, calls, duration_sum, duration_count)
+        VALUES (
+            COALESCE({row}.status, ''), 1,
+            CASE WHEN {row}.duration_seconds > 0 THEN {row}.duration_seconds ELSE 0 END,
+            CASE WHEN {row}.duration_seconds > 0 THEN 1 ELSE 0 END
+        )
+        ON CONFLICT(status) DO UPDATE SET
+            calls = calls + 1,
+            duration_sum = duration_sum + excluded.duration_sum,
+            duration_count = duration_count + excluded.duration_count;
+    '''
+    _CALL_STATS_REMOVE = '''
+        UPDATE call_stats SET
+            calls = calls - 1,
+            duration_sum = duration_sum - CASE WHEN {row}.duration_seconds > 0 THEN {row}.duration_seconds ELSE 0 END,
+            duration_count = duration_count - CASE WHEN {row}.duration_seconds > 0 THEN 1 ELSE 0 END
+        WHERE status = COALESCE({row}.status, '');
+    '''
+    
+    def _init_call_stats_triggers(self, conn):
+        """
+        Тригери лічильників call_stats
+        
+        Лічильники змінюються в тій самій транзакції, що й call_history
+        (вставка, зміна статусу чи тривалості, видалення), тож статистика
+        читається з кількох рядків замість агрегації всієї історії. Якщо
+        тригерів ще немає (нова база або база до їх появи), лічильники
+        заповнюються з наявних записів в одній транзакції зі створенням
+        тригерів.
+        """
+        conn.execute("BEGIN IMMEDIATE")
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'trg_call_stats_insert'"
+        ).fetchone()
+        if exists:
+            conn.commit()
+            return
+        
+        conn.execute(f'''
+            CREATE TRIGGER trg_call_stats_insert AFTER INSERT ON call_history
+            BEGIN {self._CALL_STATS_ADD.format(row="NEW")} END
+        ''')
+        conn.execute(self._archive_gated_triggers()["trg_call_stats_delete"])
+        conn.execute(f'''
+            CREATE TRIGGER trg_call_stats_update AFTER UPDATE OF status, duration_seconds ON call_history
+            WHEN OLD.status IS NOT NEW.status OR OLD.duration_seconds IS NOT NEW.duration_seconds
+            BEGIN
+                {self._CALL_STATS_REMOVE.format(row="OLD")}
+                {self._CALL_STATS_ADD.format(row="NEW")}
+            END
+        ''')
+        self._fill_call_stats(conn)
         conn.commit()
-        conn.close()
+        print(f"[Storage] Лічильники історії заповнено: {self.db_path}")
+    
+    # Лічильники call_stats з усієї таблиці історії (гарячої або архіву)
+    _CALL_STATS_AGGREGATE = '''
+        SELECT COALESCE(status, ''), COUNT(*),
+               COALESCE(SUM(CASE WHEN duration_seconds > 0 THEN duration_seconds END), 0),
+               COUNT(CASE WHEN duration_seconds > 0 THEN 1 END)
+        FROM call_history
+        GROUP BY COALESCE(status, '')
+    '''
+    
+    def _fill_call_stats(self, conn):
+        conn.execute("DELETE FROM call_stats")
+        conn.execute(f"INSERT INTO call_stats (status, calls, duration_sum, duration_count) {self._CALL_STATS_AGGREGATE}")
+    
+    def _add_call_stats(self, conn, totals: List[tuple], sign: int = 1):
+        """Додати (sign=-1 - відняти) лічильники [(status, calls, duration_sum, duration_count)]"""
+        conn.executemany('''
+            INSERT INTO call_stats (status, calls, duration_sum, duration_count) VALUES (?, ?, ?, ?)
+            ON CONFLICT(status) DO UPDATE SET
+                calls = calls + excluded.calls,
+                duration_sum = duration_sum + excluded.duration_sum,
+                duration_count = duration_count + excluded.duration_count
+        ''', [(status, sign * calls, sign * duration_sum, sign * duration_count)
+              for status, calls, duration_sum, duration_count in totals])
+    
+    # Розмір інтервалу -> довжина префікса ISO-часу ("2025-01-31T14:05")
+    ROLLUP_BUCKETS = {"minute": 16, "hour": 13, "day": 10}
+    
+    # Виміри запису історії в агрегатах (classification - JSON, може бути некоректним)
+    _ROLLUP_DIMENSIONS = {
+        "category": "COALESCE(CASE WHEN json_valid({row}.classification) THEN json_extract({row}.classification, '$.id') END, '')",
+        "urgency": "COALESCE(CASE WHEN json_valid({row}.classification) THEN json_extract({row}.classification, '$.urgency') END, '')",
+        "executor": "COALESCE({row}.executor, '')",
+    }
+    
+    def _rollup_dimensions_sql(self, row: str, aliased: bool = False) -> str:
+        return ", ".join(
+            expression.format(row=row) + (f" AS {name}" if aliased else "")
+            for name, expression in self._ROLLUP_DIMENSIONS.items()
+        )
+    
+    def _rollup_add_sql(self, row: str) -> str:
+        buckets = " UNION ALL ".join(
+            f"SELECT '{size}' AS bucket_size, {length} AS length" for size, length in self.ROLLUP_BUCKETS.items()
+        )
+        return f'''
+            INSERT INTO call_rollups (bucket_size, bucket, category, urgency, executor, calls, escalated)
+            SELECT bucket_size, substr(COALESCE({row}.timestamp, ''), 1, length),
+                   {self._rollup_dimensions_sql(row)},
+                   1, {row}.status IS 'escalated'
+            FROM ({buckets}) WHERE true
+            ON CONFLICT(bucket_size, bucket, category, urgency, executor) DO UPDATE SET
+                calls = calls + 1,
+                escalated = escalated + excluded.escalated;
+        '''
+    
+    def _rollup_remove_sql(self, row: str) -> str:
+        return "".join(f'''
+            UPDATE call_rollups SET calls = calls - 1, escalated = escalated - ({row}.status IS 'escalated')
+            WHERE bucket_size = '{size}' AND bucket = substr(COALESCE({row}.timestamp, ''), 1, {length})
+              AND (category, urgency, executor) = ({self._rollup_dimensions_sql(row)});
+        ''' for size, length in self.ROLLUP_BUCKETS.items())
+    
+    def _init_call_rollups_triggers(self, conn):
+        """
+        Тригери агрегатів call_rollups
         
-        print(f"[Storage] База даних ініціалізована: {self.db_path}")
+        Як і call_stats: кожна вставка додає дзвінок у три інтервали
+        (хвилина, година, день) тієї ж транзакції, зміна класифікації,
+        статусу, виконавця чи часу переносить його, видалення - віднімає.
+        Наявна історія агрегується при створенні тригерів.
+        """
+        conn.execute("BEGIN IMMEDIATE")
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'trg_call_rollups_insert'"
+        ).fetchone()
+        if exists:
+            conn.commit()
+            return
+        
+        conn.execute(f'''
+            CREATE TRIGGER trg_call_rollups_insert AFTER INSERT ON call_history
+            BEGIN {self._rollup_add_sql("NEW")} END
+        ''')
+        conn.execute(self._archive_gated_triggers()["trg_call_rollups_delete"])
+        conn.execute(f'''
+            CREATE TRIGGER trg_call_rollups_update AFTER UPDATE OF timestamp, classification, status, executor ON call_history
+            WHEN OLD.timestamp IS NOT NEW.timestamp OR OLD.classification IS NOT NEW.classification
+              OR OLD.status IS NOT NEW.status OR OLD.executor IS NOT NEW.executor
+            BEGIN
+                {self._rollup_remove_sql("OLD")}
+                {self._rollup_add_sql("NEW")}
+            END
+        ''')
+        self._fill_call_rollups(conn)
+        conn.commit()
+        print(f"[Storage] Агрегати часових рядів заповнено: {self.db_path}")
     
-    def _get_connection(self):
-        """Отримання з'єднання з базою даних"""
-        return sqlite3.connect(self.db_path)
+    def _fill_call_rollups(self, conn):
+        # Агрегати архівних місяців не перераховуються: їхніх записів у
+        # call_history немає, а після видалення архіву агрегати - єдина історія
+        archived = "IN (SELECT month FROM call_history_archives)"
+        conn.execute(f"DELETE FROM call_rollups WHERE substr(bucket, 1, 7) NOT {archived}")
+        for size, length in self.ROLLUP_BUCKETS.items():
+            conn.execute(f'''
+                INSERT INTO call_rollups (bucket_size, bucket, category, urgency, executor, calls, escalated)
+                SELECT ?, bucket, category, urgency, executor, COUNT(*), SUM(escalated)
+                FROM (
+                    SELECT substr(COALESCE(timestamp, ''), 1, {length}) AS bucket,
+                           {self._rollup_dimensions_sql("call_history", aliased=True)},
+                           status IS 'escalated' AS escalated
+                    FROM call_history
+                    WHERE substr(COALESCE(timestamp, ''), 1, 7) NOT {archived}
+                )
+                GROUP BY bucket, category, urgency, executor
+            ''', (size,))
+    
+    # Апостроф - частина слова ("м'ясо", "п'ять"); усі варіанти апострофа
+    # індексуються як U+0027, тому знаходяться незалежно від написання
+    SEARCH_TOKENIZER = "unicode61 remove_diacritics 0 tokenchars '{}'".format(APOSTROPHES.replace("'", "''"))
+    
+    @staticmethod
+    def _search_text_sql(column: str) -> str:
+        """SQL-вираз: текст для повнотекстового індексу (єдиний апостроф)"""
+        for char in APOSTROPHES:
+            if char != "'":
+                column = f"replace({column}, '{char}', '''')"
+        return column
+    
+    def _init_search_index(self, conn):
+        """
+        Повнотекстовий індекс FTS5 за транскриптом і відповіддю
+        
+        External content: текст не дублюється, індекс посилається на rowid
+        call_history і підтримується тригерами в тій самій транзакції.
+        Для наявної історії індекс будується разом зі створенням тригерів.
+        """
+        conn.execute("BEGIN IMMEDIATE")
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'trg_call_history_fts_insert'"
+        ).fetchone()
+        if exists:
+            conn.commit()
+            return
+        
+        self._create_search_index(conn)
+        self._fill_search_index(conn)
+        conn.commit()
+        print(f"[Storage] Повнотекстовий індекс історії побудовано: {self.db_path}")
+    
+    def _create_search_index(self, conn):
+        """Таблиця FTS5 та тригери (гарячий розділ або архів місяця)"""
+        tokenizer = self.SEARCH_TOKENIZER.replace('"', '""')
+        conn.execute(f'''
+            CREATE VIRTUAL TABLE IF NOT EXISTS call_history_fts USING fts5(
+                transcript, response_text,
+                content='call_history', content_rowid='rowid',
+                tokenize="{tokenizer}"
+            )
+        ''')
+        # Збіг у транскрипті важить більше, ніж у тексті відповіді
+        conn.execute("INSERT INTO call_history_fts (call_history_fts, rank) VALUES ('rank', 'bm25(1.0, 0.3)')")
+        
+        def row_values(row: str) -> str:
+            return f"{row}.rowid, {self._search_text_sql(row + '.transcript')}, {self._search_text_sql(row + '.response_text')}"
+        
+        conn.execute(f'''
+            CREATE TRIGGER trg_call_history_fts_insert AFTER INSERT ON call_history
+            BEGIN
+                INSERT INTO call_history_fts (rowid, transcript, response_text) VALUES ({row_values("NEW")});
+            END
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER trg_call_history_fts_delete AFTER DELETE ON call_history
+            BEGIN
+                INSERT INTO call_history_fts (call_history_fts, rowid, transcript, response_text)
+                VALUES ('delete', {row_values("OLD")});
+            END
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER trg_call_history_fts_update AFTER UPDATE OF transcript, response_text ON call_history
+            BEGIN
+                INSERT INTO call_history_fts (call_history_fts, rowid, transcript, response_text)
+                VALUES ('delete', {row_values("OLD")});
+                INSERT INTO call_history_fts (rowid, transcript, response_text) VALUES ({row_values("NEW")});
+            END
+        ''')
+    
+    def _fill_search_index(self, conn):
+        conn.execute("INSERT INTO call_history_fts (call_history_fts) VALUES ('delete-all')")
+        conn.execute(f'''
+            INSERT INTO call_history_fts (rowid, transcript, response_text)
+            SELECT rowid, {self._search_text_sql('transcript')}, {self._search_text_sql('response_text')}
+            FROM call_history
+        ''')
+    
+    def rebuild_search_index(self):
+        """Перебудувати повнотекстовий індекс (напр. після VACUUM, що змінив rowid)"""
+        with self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self._fill_search_index(conn)
+    
+    def rebuild_call_stats(self):
+        """Перерахувати лічильники та агрегати з історії (після змін в обхід тригерів)"""
+        # Дзвінки архівів лишаються в лічильниках (ATTACH неможливий у транзакції -
+        # архіви читаються до неї)
+        with self._connection() as conn:
+            months = self._archive_months(conn)
+        archived = []
+        for month in months:
+            archived.extend(self._archive_call_stats(month))
+        
+        with self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self._fill_call_stats(conn)
+            self._add_call_stats(conn, archived)
+            self._fill_call_rollups(conn)
+    
+    @contextmanager
+    def _connection(self):
+        """
+        Персистентне з'єднання потоку як транзакція
+        
+        Після блоку зміни фіксуються, при винятку - відкочуються, тож
+        з'єднання повертається до пулу без відкритої транзакції.
+        """
+        conn = self._connections.get()
+        try:
+            yield conn
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        else:
+            if conn.in_transaction:
+                conn.commit()
+    
+    def close(self):
+        """Закрити з'єднання з базою"""
+        self._connections.close_all()
+    
+    def memory_bytes(self) -> int:
+        """
+        Оцінка пам'яті відкритих з'єднань
+        
+        Кеш сторінок з'єднання обмежений SQLITE_CACHE_SIZE_KB і не може
+        бути більшим за файл бази разом з WAL.
+        """
+        size = 0
+        for path in (self.db_path, self.db_path + "-wal"):
+            try:
+                size += os.path.getsize(path)
+            except OSError:
+                pass
+        per_connection = min(size, settings.SQLITE_CACHE_SIZE_KB * 1024)
+        return self._connections.stats()["open"] * per_connection
     
     def _row_to_dict(self, row, columns):
         """Конвертація рядка SQL у словник"""
@@ -215,31 +835,27 @@ class StorageService:
         """Створити виконавця"""
         executor = Executor(**data.__dict__ if hasattr(data, '__dict__') else data)
         
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO executors (id, name, phone, email, work_hours, description, is_active, created_at, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            executor.id, executor.name, executor.phone, executor.email,
-            executor.work_hours, executor.description, 1 if executor.is_active else 0,
-            executor.created_at, executor.updated_at
-        ))
-        
-        conn.commit()
-        conn.close()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                INSERT INTO executors (id, name, phone, email, work_hours, description, is_active, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                executor.id, executor.name, executor.phone, executor.email,
+                executor.work_hours, executor.description, 1 if executor.is_active else 0,
+                executor.created_at, executor.updated_at
+            ))
         
         return asdict(executor)
     
     def get_executor(self, executor_id: str) -> Optional[Dict]:
         """Отримати виконавця за ID"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT * FROM executors WHERE id = ?', (executor_id,))
-        row = cursor.fetchone()
-        conn.close()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('SELECT * FROM executors WHERE id = ?', (executor_id,))
+            row = cursor.fetchone()
         
         if row:
             columns = ['id', 'name', 'phone', 'email', 'work_hours', 'description', 'is_active', 'created_at', 'updated_at']
@@ -248,16 +864,15 @@ class StorageService:
     
     def get_executors(self, active_only: bool = False) -> List[Dict]:
         """Отримати всіх виконавців"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        if active_only:
-            cursor.execute('SELECT * FROM executors WHERE is_active = 1 ORDER BY name')
-        else:
-            cursor.execute('SELECT * FROM executors ORDER BY name')
-        
-        rows = cursor.fetchall()
-        conn.close()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            if active_only:
+                cursor.execute('SELECT * FROM executors WHERE is_active = 1 ORDER BY name')
+            else:
+                cursor.execute('SELECT * FROM executors ORDER BY name')
+            
+            rows = cursor.fetchall()
         
         columns = ['id', 'name', 'phone', 'email', 'work_hours', 'description', 'is_active', 'created_at', 'updated_at']
         return [self._row_to_dict(row, columns) for row in rows]
@@ -270,32 +885,26 @@ class StorageService:
         
         updated_at = datetime.now().isoformat()
         
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            UPDATE executors SET name=?, phone=?, email=?, work_hours=?, description=?, is_active=?, updated_at=?
-            WHERE id=?
-        ''', (
-            data.name, data.phone, data.email, data.work_hours,
-            data.description, 1 if data.is_active else 0, updated_at, executor_id
-        ))
-        
-        conn.commit()
-        conn.close()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                UPDATE executors SET name=?, phone=?, email=?, work_hours=?, description=?, is_active=?, updated_at=?
+                WHERE id=?
+            ''', (
+                data.name, data.phone, data.email, data.work_hours,
+                data.description, 1 if data.is_active else 0, updated_at, executor_id
+            ))
         
         return self.get_executor(executor_id)
     
     def delete_executor(self, executor_id: str) -> bool:
         """Видалити виконавця"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('DELETE FROM executors WHERE id = ?', (executor_id,))
-        deleted = cursor.rowcount > 0
-        
-        conn.commit()
-        conn.close()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('DELETE FROM executors WHERE id = ?', (executor_id,))
+            deleted = cursor.rowcount > 0
         
         return deleted
     
@@ -305,33 +914,29 @@ class StorageService:
         """Створити елемент класифікатора"""
         classifier_item = ClassifierItem(**data.__dict__ if hasattr(data, '__dict__') else data)
         
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO classifiers (id, problem, subtype, type, location, response, executor, executor_id, urgency, response_time, keywords, is_active, created_at, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            classifier_item.id, classifier_item.problem, classifier_item.subtype,
-            classifier_item.type, classifier_item.location, classifier_item.response,
-            classifier_item.executor, classifier_item.executor_id, classifier_item.urgency,
-            classifier_item.response_time, json.dumps(classifier_item.keywords),
-            1 if classifier_item.is_active else 0, classifier_item.created_at, classifier_item.updated_at
-        ))
-        
-        conn.commit()
-        conn.close()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                INSERT INTO classifiers (id, problem, subtype, type, location, response, executor, executor_id, urgency, response_time, keywords, is_active, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                classifier_item.id, classifier_item.problem, classifier_item.subtype,
+                classifier_item.type, classifier_item.location, classifier_item.response,
+                classifier_item.executor, classifier_item.executor_id, classifier_item.urgency,
+                classifier_item.response_time, json.dumps(classifier_item.keywords),
+                1 if classifier_item.is_active else 0, classifier_item.created_at, classifier_item.updated_at
+            ))
         
         return asdict(classifier_item)
     
     def get_classifier(self, classifier_id: str) -> Optional[Dict]:
         """Отримати елемент класифікатора за ID"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT * FROM classifiers WHERE id = ?', (classifier_id,))
-        row = cursor.fetchone()
-        conn.close()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('SELECT * FROM classifiers WHERE id = ?', (classifier_id,))
+            row = cursor.fetchone()
         
         if row:
             columns = ['id', 'problem', 'subtype', 'type', 'location', 'response', 'executor', 'executor_id', 'urgency', 'response_time', 'keywords', 'is_active', 'created_at', 'updated_at']
@@ -342,16 +947,15 @@ class StorageService:
     
     def get_classifiers(self, active_only: bool = False) -> List[Dict]:
         """Отримати всі елементи класифікатора"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        if active_only:
-            cursor.execute('SELECT * FROM classifiers WHERE is_active = 1 ORDER BY problem, subtype')
-        else:
-            cursor.execute('SELECT * FROM classifiers ORDER BY problem, subtype')
-        
-        rows = cursor.fetchall()
-        conn.close()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            if active_only:
+                cursor.execute('SELECT * FROM classifiers WHERE is_active = 1 ORDER BY problem, subtype')
+            else:
+                cursor.execute('SELECT * FROM classifiers ORDER BY problem, subtype')
+            
+            rows = cursor.fetchall()
         
         columns = ['id', 'problem', 'subtype', 'type', 'location', 'response', 'executor', 'executor_id', 'urgency', 'response_time', 'keywords', 'is_active', 'created_at', 'updated_at']
         results = []
@@ -370,33 +974,27 @@ class StorageService:
         
         updated_at = datetime.now().isoformat()
         
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            UPDATE classifiers SET problem=?, subtype=?, type=?, location=?, response=?, executor=?, executor_id=?, urgency=?, response_time=?, keywords=?, is_active=?, updated_at=?
-            WHERE id=?
-        ''', (
-            data.problem, data.subtype, data.type, data.location, data.response,
-            data.executor, data.executor_id, data.urgency, data.response_time,
-            json.dumps(data.keywords), 1 if data.is_active else 0, updated_at, classifier_id
-        ))
-        
-        conn.commit()
-        conn.close()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                UPDATE classifiers SET problem=?, subtype=?, type=?, location=?, response=?, executor=?, executor_id=?, urgency=?, response_time=?, keywords=?, is_active=?, updated_at=?
+                WHERE id=?
+            ''', (
+                data.problem, data.subtype, data.type, data.location, data.response,
+                data.executor, data.executor_id, data.urgency, data.response_time,
+                json.dumps(data.keywords), 1 if data.is_active else 0, updated_at, classifier_id
+            ))
         
         return self.get_classifier(classifier_id)
     
     def delete_classifier(self, classifier_id: str) -> bool:
         """Видалити елемент класифікатора"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('DELETE FROM classifiers WHERE id = ?', (classifier_id,))
-        deleted = cursor.rowcount > 0
-        
-        conn.commit()
-        conn.close()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('DELETE FROM classifiers WHERE id = ?', (classifier_id,))
+            deleted = cursor.rowcount > 0
         
         return deleted
     
@@ -406,32 +1004,28 @@ class StorageService:
         """Створити алгоритм"""
         algorithm = ConversationAlgorithm(**data.__dict__ if hasattr(data, '__dict__') else data)
         
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO algorithms (id, name, description, steps, trigger_keywords, is_default, is_active, created_at, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            algorithm.id, algorithm.name, algorithm.description,
-            json.dumps(algorithm.steps), json.dumps(algorithm.trigger_keywords),
-            1 if algorithm.is_default else 0, 1 if algorithm.is_active else 0,
-            algorithm.created_at, algorithm.updated_at
-        ))
-        
-        conn.commit()
-        conn.close()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                INSERT INTO algorithms (id, name, description, steps, trigger_keywords, is_default, is_active, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                algorithm.id, algorithm.name, algorithm.description,
+                json.dumps(algorithm.steps), json.dumps(algorithm.trigger_keywords),
+                1 if algorithm.is_default else 0, 1 if algorithm.is_active else 0,
+                algorithm.created_at, algorithm.updated_at
+            ))
         
         return asdict(algorithm)
     
     def get_algorithm(self, algorithm_id: str) -> Optional[Dict]:
         """Отримати алгоритм за ID"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT * FROM algorithms WHERE id = ?', (algorithm_id,))
-        row = cursor.fetchone()
-        conn.close()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('SELECT * FROM algorithms WHERE id = ?', (algorithm_id,))
+            row = cursor.fetchone()
         
         if row:
             columns = ['id', 'name', 'description', 'steps', 'trigger_keywords', 'is_default', 'is_active', 'created_at', 'updated_at']
@@ -443,12 +1037,11 @@ class StorageService:
     
     def get_default_algorithm(self) -> Optional[Dict]:
         """Отримати алгоритм за замовчуванням"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT * FROM algorithms WHERE is_default = 1 AND is_active = 1 LIMIT 1')
-        row = cursor.fetchone()
-        conn.close()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('SELECT * FROM algorithms WHERE is_default = 1 AND is_active = 1 LIMIT 1')
+            row = cursor.fetchone()
         
         if row:
             columns = ['id', 'name', 'description', 'steps', 'trigger_keywords', 'is_default', 'is_active', 'created_at', 'updated_at']
@@ -460,16 +1053,15 @@ class StorageService:
     
     def get_algorithms(self, active_only: bool = False) -> List[Dict]:
         """Отримати всі алгоритми"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        if active_only:
-            cursor.execute('SELECT * FROM algorithms WHERE is_active = 1 ORDER BY name')
-        else:
-            cursor.execute('SELECT * FROM algorithms ORDER BY name')
-        
-        rows = cursor.fetchall()
-        conn.close()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            if active_only:
+                cursor.execute('SELECT * FROM algorithms WHERE is_active = 1 ORDER BY name')
+            else:
+                cursor.execute('SELECT * FROM algorithms ORDER BY name')
+            
+            rows = cursor.fetchall()
         
         columns = ['id', 'name', 'description', 'steps', 'trigger_keywords', 'is_default', 'is_active', 'created_at', 'updated_at']
         results = []
@@ -489,114 +1081,385 @@ class StorageService:
         
         updated_at = datetime.now().isoformat()
         
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            UPDATE algorithms SET name=?, description=?, steps=?, trigger_keywords=?, is_default=?, is_active=?, updated_at=?
-            WHERE id=?
-        ''', (
-            data.name, data.description, json.dumps(data.steps),
-            json.dumps(data.trigger_keywords), 1 if data.is_default else 0,
-            1 if data.is_active else 0, updated_at, algorithm_id
-        ))
-        
-        conn.commit()
-        conn.close()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                UPDATE algorithms SET name=?, description=?, steps=?, trigger_keywords=?, is_default=?, is_active=?, updated_at=?
+                WHERE id=?
+            ''', (
+                data.name, data.description, json.dumps(data.steps),
+                json.dumps(data.trigger_keywords), 1 if data.is_default else 0,
+                1 if data.is_active else 0, updated_at, algorithm_id
+            ))
         
         return self.get_algorithm(algorithm_id)
     
     def delete_algorithm(self, algorithm_id: str) -> bool:
         """Видалити алгоритм"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('DELETE FROM algorithms WHERE id = ?', (algorithm_id,))
-        deleted = cursor.rowcount > 0
-        
-        conn.commit()
-        conn.close()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('DELETE FROM algorithms WHERE id = ?', (algorithm_id,))
+            deleted = cursor.rowcount > 0
         
         return deleted
     
     # === Історія дзвінків ===
     
-    def create_call_record(self, data: CallRecordCreate) -> Dict:
-        """Створити запис дзвінка"""
-        record = CallRecordCreate(**data.__dict__ if hasattr(data, '__dict__') else data)
-        
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO call_history (id, timestamp, caller_phone, transcript, classification, status, response_text, executor, duration_seconds, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
+    _INSERT_CALL_RECORD = '''
+        INSERT INTO call_history (id, timestamp, caller_phone, transcript, classification, status, response_text, executor, duration_seconds, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    '''
+    
+    @staticmethod
+    def _call_record_row(record: CallRecordCreate) -> tuple:
+        return (
             record.id, record.timestamp, record.caller_phone, record.transcript,
             json.dumps(record.classification), record.status, record.response_text,
             record.executor, 0, datetime.now().isoformat()
-        ))
+        )
+    
+    def create_call_record(self, data: CallRecordCreate) -> Dict:
+        """Створити запис дзвінка"""
+        record = CallRecordCreate(**data.__dict__ if hasattr(data, '__dict__') else data)
         
-        conn.commit()
-        conn.close()
+        with self._connection() as conn:
+            conn.execute(self._INSERT_CALL_RECORD, self._call_record_row(record))
         
         return asdict(record)
     
-    def get_call_history(self, limit: int = 50, offset: int = 0) -> List[Dict]:
-        """Отримати історію дзвінків"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
+    def create_call_records(self, records: List[CallRecordCreate]) -> int:
+        """
+        Створити пакет записів дзвінків однією транзакцією
         
-        cursor.execute('''
-            SELECT * FROM call_history
-            ORDER BY timestamp DESC
-            LIMIT ? OFFSET ?
-        ''', (limit, offset))
+        Returns:
+            Кількість записаних записів
+        """
+        with self._connection() as conn:
+            conn.executemany(self._INSERT_CALL_RECORD, [self._call_record_row(record) for record in records])
+        return len(records)
+    
+    def get_call_history(self, limit: int = 50, offset: int = 0,
+                         before: Optional[Tuple[str, str]] = None,
+                         status: Optional[str] = None,
+                         caller_phone: Optional[str] = None,
+                         category: Optional[str] = None,
+                         problem: Optional[str] = None,
+                         urgency: Optional[str] = None,
+                         executor: Optional[str] = None,
+                         min_confidence: Optional[float] = None,
+                         max_confidence: Optional[float] = None,
+                         start: Optional[str] = None,
+                         end: Optional[str] = None) -> List[Dict]:
+        """
+        Отримати історію дзвінків (від нових до старих)
         
-        rows = cursor.fetchall()
-        conn.close()
+        Усі фільтри виконуються в SQL за індексованими колонками (поля
+        класифікації - генеровані колонки), без розбору JSON у Python.
+        Архівні місяці читаються лише тоді, коли сторінка доходить до них
+        (або діапазон start-end їх охоплює).
+        
+        Args:
+            limit: Розмір сторінки
+            offset: Зміщення (вартість росте з глибиною - краще before)
+            before: (timestamp, id) останнього запису попередньої сторінки -
+                    keyset-пагінація за індексом, однаково швидка на будь-якій глибині
+            status: Фільтр за статусом
+            caller_phone: Фільтр за номером абонента
+            category: ID категорії класифікатора
+            problem: Проблема (група категорій)
+            urgency: Терміновість (emergency, short, standard, info)
+            executor: Виконавець
+            min_confidence, max_confidence: Межі впевненості класифікації
+            start, end: Діапазон часу (ISO, end не включно)
+        """
+        conditions, params = [], []
+        for column, value in (
+            ("status", status), ("caller_phone", caller_phone), ("classifier_id", category),
+            ("problem", problem), ("urgency", urgency), ("executor", executor),
+        ):
+            if value:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if min_confidence is not None:
+            conditions.append("confidence >= ?")
+            params.append(min_confidence)
+        if max_confidence is not None:
+            conditions.append("confidence <= ?")
+            params.append(max_confidence)
+        if start:
+            conditions.append("timestamp >= ?")
+            params.append(start)
+        if end:
+            conditions.append("timestamp < ?")
+            params.append(end)
+        if before:
+            conditions.append("(timestamp, id) < (?, ?)")
+            params.extend(before)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        
+        def select(conn, schema: str, page_limit: int, page_offset: int) -> list:
+            return conn.execute(f'''
+                SELECT {', '.join(self.HISTORY_COLUMNS)} FROM {schema}.call_history
+                {where}
+                ORDER BY timestamp DESC, id DESC
+                LIMIT ? OFFSET ?
+            ''', (*params, page_limit, page_offset)).fetchall()
+        
+        with self._connection() as conn:
+            # Архіви, що можуть містити сторінку: до end та до курсора
+            months = self._archive_months(conn, start, min(filter(None, (end, before and before[0])), default=None))
+            if not months:
+                rows = select(conn, "main", limit, offset)
+            else:
+                # Розділи від нових до старих; сторінка зливається за (timestamp, id).
+                # У гарячому розділі можуть бути записи архівних місяців, що
+                # надійшли після архівування, тому він читається завжди
+                wanted, rows = limit + offset, []
+                for month in [None] + months:
+                    if month and len(rows) >= wanted and (rows[wanted - 1][1] or "") >= shift_month(month, 1):
+                        break
+                    schema = self._attach_archive(conn, month) if month else "main"
+                    if schema is None:
+                        continue
+                    rows.extend(select(conn, schema, wanted, 0))
+                    rows.sort(key=lambda row: (row[1] or "", row[0]), reverse=True)
+                    del rows[wanted:]
+                rows = rows[offset:]
         
-        columns = ['id', 'timestamp', 'caller_phone', 'transcript', 'classification', 'status', 'response_text', 'executor', 'duration_seconds', 'created_at']
         results = []
         for row in rows:
-            result = self._row_to_dict(row, columns)
+            result = self._row_to_dict(row, self.HISTORY_COLUMNS)
             result['classification'] = json.loads(result['classification'] or '{}')
             results.append(result)
         
         return results
     
-    def get_calls_count(self, status: Optional[str] = None) -> int:
-        """Отримати кількість дзвінків"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
+    def get_call_history_chunk(self, after: Optional[tuple] = None, limit: int = 500) -> List[Dict]:
+        """
+        Порція історії дзвінків у порядку (ORDER_KEY, id)
         
-        if status:
-            cursor.execute('SELECT COUNT(*) FROM call_history WHERE status = ?', (status,))
-        else:
-            cursor.execute('SELECT COUNT(*) FROM call_history')
+        Keyset-пагінація: наступна порція починається після останнього
+        (timestamp, id) попередньої, тому вартість не росте з номером
+        порції, а вставки під час обходу не зсувають позицію. Записи без
+        timestamp йдуть першими (як з порожнім рядком).
         
-        count = cursor.fetchone()[0]
-        conn.close()
+        Args:
+            after: (timestamp, id) останнього обробленого запису
+            limit: Розмір порції
+        """
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            after_timestamp, after_id = after or ("", "")
+            # Окрема умова на ключ - пошук за індексом виразу (порівняння пар його не використовує)
+            cursor.execute(f'''
+                SELECT id, timestamp, transcript, classification, status, executor
+                FROM call_history
+                WHERE {self.ORDER_KEY} >= ? AND ({self.ORDER_KEY}, id) > (?, ?)
+                ORDER BY {self.ORDER_KEY}, id
+                LIMIT ?
+            ''', (after_timestamp or "", after_timestamp or "", after_id, limit))
+            rows = cursor.fetchall()
+        
+        columns = ['id', 'timestamp', 'transcript', 'classification', 'status', 'executor']
+        results = []
+        for row in rows:
+            result = self._row_to_dict(row, columns)
+            result['classification'] = json.loads(result['classification'] or '{}')
+            results.append(result)
+        return results
+    
+    # Колонки експорту; classification - мінімізований JSON (NULL, якщо
+    # текст не є JSON), тож NDJSON вставляє його без розбору в Python
+    EXPORT_COLUMNS = [
+        column if column != 'classification'
+        else "CASE WHEN json_valid(classification) THEN json(classification) END"
+        for column in HISTORY_COLUMNS
+    ]
+    
+    def export_call_history(self, start: Optional[str] = None, end: Optional[str] = None,
+                            status: Optional[str] = None,
+                            batch_size: Optional[int] = None) -> Iterator[List[tuple]]:
+        """
+        Потоковий обхід історії для експорту - порції кортежів HISTORY_COLUMNS
+        
+        Записи йдуть за (ORDER_KEY, id) від старих до нових курсором SQLite
+        (fetchmany), тож у пам'яті лише одна порція незалежно від обсягу;
+        записи без timestamp - першими і лише без start. Фільтри - в SQL за
+        індексами (ORDER_KEY, id) / (status, ORDER_KEY, id).
+        Архівні місяці читаються по черзі, кожен зливається з записами
+        того ж місяця в гарячому розділі (надійшли після архівування).
+        
+        Генератор має власне з'єднання: відповідь споживається з різних
+        потоків, а з'єднання пулу прив'язані до свого. Поки експорт
+        читає архів місяця, перенесення в цей архів чекає (або
+        повторюється наступним проходом архівування).
+        
+        Args:
+            start, end: Діапазон часу (ISO, end не включно)
+            status: Фільтр за статусом
+            batch_size: Записів на порцію (за замовчуванням EXPORT_BATCH_SIZE)
+        """
+        batch_size = batch_size or settings.EXPORT_BATCH_SIZE
+        conn = sqlite3.connect(self.db_path, timeout=settings.SQLITE_BUSY_TIMEOUT, check_same_thread=False)
+        try:
+            def select(schema: str, lower: Optional[str], upper: Optional[str]):
+                conditions, params = [], []
+                for condition, value in (("status = ?", status), (f"{self.ORDER_KEY} >= ?", lower),
+                                         (f"{self.ORDER_KEY} < ?", upper)):
+                    if value:
+                        conditions.append(condition)
+                        params.append(value)
+                where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+                cursor = conn.execute(f'''
+                    SELECT {', '.join(self.EXPORT_COLUMNS)} FROM {schema}.call_history
+                    {where}
+                    ORDER BY {self.ORDER_KEY}, id
+                ''', params)
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        return
+                    yield from rows
+            
+            def merged(month: str, lower: Optional[str], upper: Optional[str]):
+                # Гарячий розділ читається першим: запис, перенесений між
+                # двома запитами, потрапить в обидва і відкинеться як дубль
+                hot = select("main", lower, upper)
+                first = next(hot, None)
+                schema = "archive_" + month.replace("-", "_")
+                conn.execute(f"ATTACH DATABASE ? AS {schema}", (self.archive_path(month),))
+                previous = None
+                for row in heapq.merge(select(schema, lower, upper), itertools.chain([first] if first else [], hot),
+                                       key=lambda row: (row[1] or "", row[0])):
+                    if row[0] != previous:
+                        yield row
+                    previous = row[0]
+                conn.execute(f"DETACH DATABASE {schema}")
+            
+            def rows():
+                position = start
+                months = conn.execute('''
+                    SELECT month FROM call_history_archives
+                    WHERE deleted_at IS NULL AND month >= ? AND (? IS NULL OR month < ?)
+                    ORDER BY month
+                ''', ((start or "")[:7], end, end)).fetchall()
+                for (month,) in months:
+                    if not os.path.exists(self.archive_path(month)):
+                        continue
+                    if not position or position < month:
+                        yield from select("main", position, month)
+                        position = month
+                    upper = min(filter(None, (end, shift_month(month, 1))))
+                    yield from merged(month, position, upper)
+                    position = upper
+                if not end or not position or position < end:
+                    yield from select("main", position, end)
+            
+            iterator = rows()
+            while True:
+                batch = list(itertools.islice(iterator, batch_size))
+                if not batch:
+                    break
+                yield batch
+        finally:
+            conn.close()
+    
+    def update_call_classifications(self, updates: List[Dict], job: Optional[Dict] = None) -> int:
+        """
+        Оновити класифікацію записів історії однією транзакцією
+        
+        Args:
+            updates: [{"id", "classification", "status", "executor"}]
+            job: Контрольна точка перекласифікації, що зберігається в тій
+                 самій транзакції (після збою обхід продовжується з неї)
+        
+        Returns:
+            Кількість оновлених записів
+        """
+        with self._connection() as conn:
+            cursor = conn.executemany('''
+                UPDATE call_history SET classification=?, status=?, executor=?
+                WHERE id=?
+            ''', [
+                (json.dumps(update['classification']), update['status'], update['executor'], update['id'])
+                for update in updates
+            ])
+            updated = cursor.rowcount
+            if job is not None:
+                self._save_reclassification_job(conn, job)
+        return updated
+    
+    RECLASSIFICATION_JOB_COLUMNS = ['id', 'status', 'reference_fingerprint', 'cursor_timestamp', 'cursor_id', 'processed',
+                                    'changed', 'total', 'error', 'started_at', 'updated_at', 'finished_at']
+    
+    def _save_reclassification_job(self, conn, job: Dict):
+        conn.execute(f'''
+            INSERT OR REPLACE INTO reclassification_jobs
+            ({', '.join(self.RECLASSIFICATION_JOB_COLUMNS)})
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            job['id'], job['status'], job.get('reference_fingerprint'), job.get('cursor_timestamp'),
+            job.get('cursor_id'), job.get('processed', 0), job.get('changed', 0), job.get('total', 0),
+            job.get('error'), job.get('started_at'), datetime.now().isoformat(), job.get('finished_at')
+        ))
+    
+    def save_reclassification_job(self, job: Dict):
+        """Зберегти стан задачі перекласифікації"""
+        with self._connection() as conn:
+            self._save_reclassification_job(conn, job)
+    
+    def get_reclassification_job(self, job_id: Optional[str] = None) -> Optional[Dict]:
+        """Задача перекласифікації за ID (або остання)"""
+        columns = self.RECLASSIFICATION_JOB_COLUMNS
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            if job_id:
+                cursor.execute(f'SELECT {", ".join(columns)} FROM reclassification_jobs WHERE id = ?', (job_id,))
+            else:
+                cursor.execute(f'SELECT {", ".join(columns)} FROM reclassification_jobs ORDER BY started_at DESC LIMIT 1')
+            row = cursor.fetchone()
+        
+        if row:
+            return self._row_to_dict(row, columns)
+        return None
+    
+    def get_calls_count(self, status: Optional[str] = None) -> int:
+        """Отримати кількість дзвінків (з лічильників call_stats)"""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            if status:
+                cursor.execute('SELECT COALESCE(SUM(calls), 0) FROM call_stats WHERE status = ?', (status,))
+            else:
+                cursor.execute('SELECT COALESCE(SUM(calls), 0) FROM call_stats')
+            
+            count = cursor.fetchone()[0]
         
         return count
     
     def get_average_response_time(self) -> Optional[float]:
         """Отримати середній час відповіді"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT AVG(duration_seconds) FROM call_history WHERE duration_seconds > 0')
-        avg = cursor.fetchone()[0]
-        conn.close()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('SELECT SUM(duration_sum), SUM(duration_count) FROM call_stats')
+            duration_sum, duration_count = cursor.fetchone()
         
-        return float(avg) if avg else None
+        return duration_sum / duration_count if duration_count else None
     
     def get_statistics(self) -> Dict:
-        """Отримати повну статистику"""
-        total = self.get_calls_count()
-        resolved = self.get_calls_count(status="resolved")
-        escalated = self.get_calls_count(status="escalated")
-        avg_time = self.get_average_response_time()
+        """Отримати повну статистику (один запит до лічильників)"""
+        with self._connection() as conn:
+            rows = conn.execute('SELECT status, calls, duration_sum, duration_count FROM call_stats').fetchall()
+        
+        calls = {status: count for status, count, _, _ in rows}
+        total = sum(calls.values())
+        resolved = calls.get("resolved", 0)
+        escalated = calls.get("escalated", 0)
+        duration_count = sum(row[3] for row in rows)
+        avg_time = sum(row[2] for row in rows) / duration_count if duration_count else None
         
         return {
             "total_calls": total,
@@ -606,6 +1469,514 @@ class StorageService:
             "avg_response_time": avg_time or 3.5
         }
 
+    
+    def get_call_timeseries(self, start: str, end: str, interval: str = "hour",
+                            group_by: Optional[str] = None) -> List[Dict]:
+        """
+        Часовий ряд дзвінків з агрегатів call_rollups
+        
+        Args:
+            start: Початок (ISO, інтервал, що його містить, включно)
+            end: Кінець (ISO, не включно)
+            interval: minute, hour або day
+            group_by: None, category, urgency або executor
+        
+        Returns:
+            [{"bucket", "group"?, "calls", "escalated", "escalation_rate"}] за часом
+        """
+        if interval not in self.ROLLUP_BUCKETS:
+            raise ValueError(f"Невідомий інтервал: {interval}")
+        if group_by is not None and group_by not in self._ROLLUP_DIMENSIONS:
+            raise ValueError(f"Невідомий вимір: {group_by}")
+        
+        group_column = f", {group_by}" if group_by else ""
+        with self._connection() as conn:
+            rows = conn.execute(f'''
+                SELECT bucket{group_column}, SUM(calls), SUM(escalated)
+                FROM call_rollups
+                WHERE bucket_size = ? AND bucket >= ? AND bucket < ?
+                GROUP BY bucket{group_column}
+                HAVING SUM(calls) > 0
+                ORDER BY bucket{group_column}
+            ''', (interval, start[:self.ROLLUP_BUCKETS[interval]], end)).fetchall()
+        
+        results = []
+        for row in rows:
+            calls, escalated = row[-2], row[-1]
+            point = {"bucket": row[0]}
+            if group_by:
+                point["group"] = row[1]
+            point.update({
+                "calls": calls,
+                "escalated": escalated,
+                "escalation_rate": round(escalated / calls, 4),
+            })
+            results.append(point)
+        return results
+    
+    def search_call_history(self, query: str, limit: int = 20, offset: int = 0,
+                            phrase: bool = False, order: str = "rank",
+                            start: Optional[str] = None, end: Optional[str] = None,
+                            status: Optional[str] = None) -> List[Dict]:
+        """
+        Повнотекстовий пошук в історії дзвінків
+        
+        Порядок rank - bm25 серед SEARCH_RANK_WINDOW найновіших збігів:
+        частотне слово може бути в мільйонах записів, і ранжування всіх
+        коштувало б секунди, а диспетчеру потрібні свіжі звернення.
+        Порядок recent читає індекс від нових записів і зупиняється на limit.
+        Кожен архівний місяць має власний індекс FTS5: архіви читаються,
+        якщо вікно ранжування (rank) чи сторінка (recent) до них доходить.
+        
+        Args:
+            query: Текст запиту ("дерево впало на машину")
+            limit, offset: Сторінка результатів
+            phrase: Точна фраза (інакше - усі слова в будь-яких формах)
+            order: rank - за релевантністю (bm25), recent - від нових до старих
+            start, end: Діапазон часу (ISO, end не включно)
+            status: Фільтр за статусом
+        
+        Returns:
+            Записи з фрагментами (transcript_snippet, response_snippet) та score
+        """
+        if order not in ("rank", "recent"):
+            raise ValueError(f"Невідомий порядок: {order}")
+        match = build_search_query(query, phrase=phrase)
+        if not match:
+            return []
+        
+        conditions, params = ["call_history_fts MATCH :match"], {"match": match}
+        for condition, name, value in (("h.timestamp >= :start", "start", start),
+                                       ("h.timestamp < :end", "end", end),
+                                       ("h.status = :status", "status", status)):
+            if value:
+                conditions.append(condition)
+                params[name] = value
+        window = settings.SEARCH_RANK_WINDOW if order == "rank" else 0
+        
+        with self._connection() as conn:
+            months = self._archive_months(conn, start, end)
+            if not months:
+                rows, _ = self._search_partition(conn, "main", conditions, params, order, limit, offset, window)
+            else:
+                # Результати розділів зливаються за часом (recent) або за bm25 (rank)
+                wanted, rows = limit + offset, []
+                for month in [None] + months:
+                    if (order == "recent" and month and len(rows) >= wanted
+                            and (rows[wanted - 1][1] or "") >= shift_month(month, 1)):
+                        break
+                    schema = self._attach_archive(conn, month) if month else "main"
+                    if schema is None:
+                        continue
+                    partition_rows, matched = self._search_partition(conn, schema, conditions, params, order, wanted, 0, window)
+                    rows.extend(partition_rows)
+                    if order == "recent":
+                        rows.sort(key=lambda row: (row[1] or "", row[0]), reverse=True)
+                    else:
+                        rows.sort(key=lambda row: row[-1])
+                    del rows[wanted:]
+                    if window:
+                        # Вікно ранжування вичерпано новішими розділами
+                        window -= matched
+                        if window <= 0:
+                            break
+                rows = rows[offset:]
+        
+        columns = ['id', 'timestamp', 'status', 'executor', 'category', 'problem', 'urgency',
+                   'transcript_snippet', 'response_snippet', 'score']
+        results = []
+        for row in rows:
+            result = self._row_to_dict(row, columns)
+            # bm25 у SQLite від'ємний: більше значення - кращий збіг
+            if result['score'] is not None:
+                result['score'] = round(-result['score'], 4)
+            results.append(result)
+        return results
+    
+    def _search_partition(self, conn, schema: str, conditions: List[str], params: Dict, order: str,
+                          limit: int, offset: int, window: int) -> Tuple[list, int]:
+        """
+        Пошук в одному розділі історії (main або приєднаний архів)
+        
+        Returns:
+            (рядки, кількість збігів у вікні ранжування)
+        """
+        conditions, params = list(conditions), dict(params)
+        tables = f"{schema}.call_history_fts JOIN {schema}.call_history h ON h.rowid = call_history_fts.rowid"
+        
+        if "start" in params or "end" in params:
+            # Межі rowid записів діапазону (з індексу за часом): FTS5
+            # пропускає документи поза ними, а не перевіряє кожен збіг
+            time_range = "timestamp >= :start" + (" AND timestamp < :end" if "end" in params else "")
+            low, high = conn.execute(
+                f"SELECT MIN(rowid), MAX(rowid) FROM {schema}.call_history WHERE {time_range}",
+                {"start": params.get("start", ""), "end": params.get("end")}
+            ).fetchone()
+            if low is None:
+                return [], 0
+            conditions.append("call_history_fts.rowid BETWEEN :low AND :high")
+            params.update({"low": low, "high": high})
+        
+        matched = 0
+        if order == "rank" and window:
+            # Нижня межа rowid вікна: FTS5 пропускає старіші документи
+            matched, window_low = conn.execute(f'''
+                SELECT COUNT(*), MIN(rowid) FROM (
+                    SELECT call_history_fts.rowid AS rowid FROM {tables}
+                    WHERE {" AND ".join(conditions)}
+                    ORDER BY call_history_fts.rowid DESC
+                    LIMIT :window
+                )
+            ''', {**params, "window": window}).fetchone()
+            if not matched:
+                return [], 0
+            conditions.append("call_history_fts.rowid >= :window_low")
+            params["window_low"] = window_low
+        # rowid зростає з часом вставки, тож recent не потребує сортування;
+        # bm25 обчислюється лише для rank (кожне слово - прохід його списку документів)
+        order_by, score = ("rank", "rank") if order == "rank" else ("call_history_fts.rowid DESC", "NULL")
+        
+        open_mark, close_mark, tokens = SEARCH_SNIPPET
+        params.update({"open": open_mark, "close": close_mark, "tokens": tokens, "limit": limit, "offset": offset})
+        rows = conn.execute(f'''
+            SELECT h.id, h.timestamp, h.status, h.executor, h.classifier_id, h.problem, h.urgency,
+                   snippet(call_history_fts, 0, :open, :close, '…', :tokens),
+                   snippet(call_history_fts, 1, :open, :close, '…', :tokens),
+                   {score}
+            FROM {tables}
+            WHERE {" AND ".join(conditions)}
+            ORDER BY {order_by}
+            LIMIT :limit OFFSET :offset
+        ''', params).fetchall()
+        return rows, matched
+    
+    def delete_minute_rollups(self, before: str) -> int:
+        """Видалити хвилинні агрегати до дати (годинні та денні лишаються)"""
+        with self._connection() as conn:
+            cursor = conn.execute(
+                "DELETE FROM call_rollups WHERE bucket_size = 'minute' AND bucket < ?", (before,)
+            )
+            return cursor.rowcount
+    
+    # ============================================
+    # Архівні розділи історії (по файлу SQLite на місяць)
+    # ============================================
+    
+    # SQLite за замовчуванням дозволяє 10 приєднаних баз на з'єднання
+    ARCHIVE_MAX_ATTACHED = 8
+    
+    # Пауза між порціями архівування: обробник зайнятості SQLite чекає на
+    # блокування з інтервалами до 100 мс, без паузи наступна порція
+    # захоплювала б запис раніше за письменника, що чекає
+    ARCHIVE_BATCH_PAUSE = 0.1
+    
+    # Умова тригерів видалення: записи, перенесені в архів, лишаються в
+    # лічильниках та агрегатах (EXISTS - тригер спрацьовує і без рядка прапорця)
+    _ARCHIVE_GATE = "WHEN NOT EXISTS (SELECT 1 FROM call_history_control WHERE archiving)"
+    
+    def _archive_gated_triggers(self) -> Dict[str, str]:
+        """Тригери видалення call_stats та call_rollups, що не спрацьовують під час архівування"""
+        return {
+            "trg_call_stats_delete": f'''
+                CREATE TRIGGER trg_call_stats_delete AFTER DELETE ON call_history
+                {self._ARCHIVE_GATE}
+                BEGIN {self._CALL_STATS_REMOVE.format(row="OLD")} END
+            ''',
+            "trg_call_rollups_delete": f'''
+                CREATE TRIGGER trg_call_rollups_delete AFTER DELETE ON call_history
+                {self._ARCHIVE_GATE}
+                BEGIN {self._rollup_remove_sql("OLD")} END
+            ''',
+        }
+    
+    def _gate_archive_triggers(self, conn):
+        """
+        Перестворити тригери видалення без умови архівування (бази, де
+        архівування знімало їх на кожну порцію) - одна зміна схеми при старті
+        """
+        conn.execute("BEGIN IMMEDIATE")
+        for name, sql in self._archive_gated_triggers().items():
+            current = conn.execute(
+                "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?", (name,)
+            ).fetchone()
+            if current and "call_history_control" not in current[0]:
+                conn.execute(f"DROP TRIGGER {name}")
+                conn.execute(sql)
+        conn.commit()
+    
+    def archive_path(self, month: str) -> str:
+        """Файл архіву місяця ("YYYY-MM")"""
+        return os.path.join(self.archive_dir, f"call_history_{month}.db")
+    
+    def _archive_months(self, conn, start: Optional[str] = None, end: Optional[str] = None) -> List[str]:
+        """Наявні архівні місяці, що перетинаються з [start, end), від нових до старих"""
+        rows = conn.execute('''
+            SELECT month FROM call_history_archives
+            WHERE deleted_at IS NULL AND month >= ? AND (? IS NULL OR month < ?)
+            ORDER BY month DESC
+        ''', ((start or "")[:7], end, end)).fetchall()
+        return [row[0] for row in rows]
+    
+    def _attach_archive(self, conn, month: str) -> Optional[str]:
+        """
+        Приєднати архів місяця до з'єднання потоку
+        
+        Архів лишається приєднаним для наступних запитів; понад
+        ARCHIVE_MAX_ATTACHED від'єднується архів з найменшим номером.
+        
+        Returns:
+            Ім'я схеми (archive_YYYY_MM) або None, якщо файлу немає
+        """
+        schema = "archive_" + month.replace("-", "_")
+        attached = [row[1] for row in conn.execute("PRAGMA database_list") if row[1].startswith("archive_")]
+        if schema in attached:
+            return schema
+        path = self.archive_path(month)
+        if not os.path.exists(path):
+            print(f"[Storage] ⚠️ Архів {month} не знайдено: {path}")
+            return None
+        if len(attached) >= self.ARCHIVE_MAX_ATTACHED:
+            conn.execute(f"DETACH DATABASE {attached[0]}")
+        conn.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+        return schema
+    
+    def _detach_archives(self, conn):
+        """Від'єднати архіви від з'єднання потоку (BEGIN IMMEDIATE блокує й приєднані бази)"""
+        for row in conn.execute("PRAGMA database_list").fetchall():
+            if row[1].startswith("archive_"):
+                conn.execute(f"DETACH DATABASE {row[1]}")
+    
+    def _open_archive(self, month: str) -> sqlite3.Connection:
+        """Окреме з'єднання з архівом місяця (схема створюється для нового файлу)"""
+        os.makedirs(self.archive_dir, exist_ok=True)
+        conn = sqlite3.connect(self.archive_path(month), timeout=settings.SQLITE_BUSY_TIMEOUT)
+        # Архів фіксується до видалення записів з гарячого розділу - з fsync
+        conn.execute("PRAGMA synchronous=FULL")
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'call_history'").fetchone():
+            self._create_call_history(conn)
+            self._create_search_index(conn)
+            conn.commit()
+        return conn
+    
+    def _archive_call_stats(self, month: str) -> List[tuple]:
+        """Лічильники call_stats за записами архіву місяця"""
+        if not os.path.exists(self.archive_path(month)):
+            return []
+        archive = sqlite3.connect(self.archive_path(month), timeout=settings.SQLITE_BUSY_TIMEOUT)
+        try:
+            return archive.execute(self._CALL_STATS_AGGREGATE).fetchall()
+        finally:
+            archive.close()
+    
+    def archive_call_history(self, before: str, batch_size: Optional[int] = None,
+                             should_stop: Optional[Callable[[], bool]] = None) -> Dict[str, int]:
+        """
+        Перенести записи місяців до before ("YYYY-MM") в архівні бази
+        
+        Кожен місяць - окремий файл SQLite (archive_dir/call_history_YYYY-MM.db)
+        з тією ж схемою, індексами та власним індексом FTS5, тож читання
+        історії та пошук працюють з ним так само, як з гарячою таблицею.
+        
+        Args:
+            before: Перший місяць, що лишається в гарячому розділі
+            batch_size: Записів на порцію (за замовчуванням ARCHIVE_BATCH_SIZE)
+            should_stop: Перевіряється між порціями (зупинка сервера)
+        
+        Returns:
+            {місяць: перенесено записів}
+        """
+        batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+        moved = {}
+        while not (should_stop and should_stop()):
+            with self._connection() as conn:
+                oldest = conn.execute(
+                    "SELECT MIN(timestamp) FROM call_history WHERE timestamp >= '0000' AND timestamp < ?", (before,)
+                ).fetchone()[0]
+            if oldest is None:
+                break
+            month = oldest[:7]
+            if not MONTH_RE.match(month):
+                print(f"[Storage] ⚠️ Архівування зупинено: час запису не в форматі ISO ({oldest})")
+                break
+            count = self._archive_month(month, batch_size, should_stop)
+            moved[month] = moved.get(month, 0) + count
+            if not count:
+                break
+        return moved
+    
+    def _archive_month(self, month: str, batch_size: int, should_stop: Optional[Callable[[], bool]] = None) -> int:
+        """
+        Перенести місяць в архів порціями
+        
+        Порція:
+        1. BEGIN IMMEDIATE на гарячій базі - інші письменники чекають, тож
+           записи порції не змінюються до їх видалення
+        2. порція копіюється в архів (upsert за id) і фіксується
+        3. порція видаляється з call_history; прапорець archiving у
+           call_history_control встановлюється лише на час видалення в тій
+           самій транзакції, тож тригери call_stats і call_rollups не
+           віднімають архівні дзвінки (інші з'єднання прапорця не бачать,
+           схема не змінюється - підготовлені запити лишаються дійсними),
+           індекс FTS5 гарячого розділу очищується своїм тригером
+        Збій між 2 і 3 лишає копію в обох базах - повторний запуск
+        перезаписує її в архіві та видаляє з гарячого розділу. Блокування
+        запису тримається лише на час порції, між порціями - пауза.
+        """
+        start, end = month, shift_month(month, 1)
+        columns = ", ".join(self.HISTORY_COLUMNS)
+        updates = ", ".join(f"{column} = excluded.{column}" for column in self.HISTORY_COLUMNS[1:])
+        chunk = "timestamp >= ? AND timestamp < ? AND (timestamp, id) <= (?, ?)"
+        moved = 0
+        
+        with self._connection() as conn:
+            self._detach_archives(conn)
+        archive = self._open_archive(month)
+        try:
+            archive.execute("ATTACH DATABASE ? AS hot", (self.db_path,))
+            while not (should_stop and should_stop()):
+                with self._connection() as conn:
+                    conn.execute("BEGIN IMMEDIATE")
+                    last = conn.execute('''
+                        SELECT timestamp, id FROM call_history
+                        WHERE timestamp >= ? AND timestamp < ?
+                        ORDER BY timestamp, id LIMIT 1 OFFSET ?
+                    ''', (start, end, batch_size - 1)).fetchone() or conn.execute('''
+                        SELECT timestamp, id FROM call_history
+                        WHERE timestamp >= ? AND timestamp < ?
+                        ORDER BY timestamp DESC, id DESC LIMIT 1
+                    ''', (start, end)).fetchone()
+                    if last is None:
+                        break
+                    params = (start, end, *last)
+                    
+                    archive.execute(f'''
+                        INSERT INTO call_history ({columns})
+                        SELECT {columns} FROM hot.call_history WHERE {chunk}
+                        ON CONFLICT(id) DO UPDATE SET {updates}
+                    ''', params)
+                    archive.commit()
+                    
+                    conn.execute("UPDATE call_history_control SET archiving = 1 WHERE id = 1")
+                    moved += conn.execute(f"DELETE FROM call_history WHERE {chunk}", params).rowcount
+                    conn.execute("UPDATE call_history_control SET archiving = 0 WHERE id = 1")
+                    
+                    conn.execute('''
+                        INSERT INTO call_history_archives (month, rows, archived_at) VALUES (?, ?, ?)
+                        ON CONFLICT(month) DO UPDATE SET
+                            rows = excluded.rows, archived_at = excluded.archived_at, deleted_at = NULL
+                    ''', (month, archive.execute("SELECT COUNT(*) FROM call_history").fetchone()[0],
+                          datetime.now().isoformat()))
+                time.sleep(self.ARCHIVE_BATCH_PAUSE)
+            
+            # Архів більше не змінюється - індекс FTS5 зливається в один сегмент
+            archive.execute("INSERT INTO call_history_fts (call_history_fts) VALUES ('optimize')")
+            archive.commit()
+        finally:
+            archive.close()
+        
+        print(f"[Storage] Архів {month}: перенесено {moved} записів ({self.archive_path(month)})")
+        return moved
+    
+    def delete_call_archives(self, before: str) -> List[str]:
+        """
+        Видалити архіви місяців до before ("YYYY-MM") - політика зберігання
+        
+        Дзвінки архіву віднімаються з лічильників call_stats. Агрегати
+        часових рядів (call_rollups) лишаються: статистика за минулі
+        періоди доступна і без записів, а місяць лишається в каталозі
+        (deleted_at), щоб перебудова агрегатів його не стерла.
+        
+        Returns:
+            Видалені місяці
+        """
+        with self._connection() as conn:
+            months = [row[0] for row in conn.execute(
+                "SELECT month FROM call_history_archives WHERE deleted_at IS NULL AND month < ? ORDER BY month",
+                (before,)
+            )]
+            self._detach_archives(conn)
+        
+        for month in months:
+            totals = self._archive_call_stats(month)
+            with self._connection() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                self._add_call_stats(conn, totals, sign=-1)
+                conn.execute(
+                    "UPDATE call_history_archives SET rows = 0, deleted_at = ? WHERE month = ?",
+                    (datetime.now().isoformat(), month)
+                )
+            # Файл видаляється після фіксації: збій між ними лишає лише зайвий файл
+            path = self.archive_path(month)
+            if os.path.exists(path):
+                os.remove(path)
+            print(f"[Storage] Архів {month} видалено (політика зберігання)")
+        return months
+    
+    def get_call_archives(self) -> List[Dict]:
+        """Архівні місяці історії: кількість записів та розмір файлу"""
+        with self._connection() as conn:
+            rows = conn.execute(
+                "SELECT month, rows, archived_at, deleted_at FROM call_history_archives ORDER BY month"
+            ).fetchall()
+        
+        results = []
+        for row in rows:
+            archive = self._row_to_dict(row, ['month', 'rows', 'archived_at', 'deleted_at'])
+            path = self.archive_path(archive['month'])
+            archive['size_bytes'] = os.path.getsize(path) if os.path.exists(path) else 0
+            results.append(archive)
+        return results
+
+
+class AsyncStorageService:
+    """
+    Асинхронний фасад StorageService для обробників FastAPI
+    
+    Ті самі методи, що й у StorageService, але як корутини: виклик
+    виконується у виділених потоках бази даних, event loop не блокується.
+    - Записи (create_, update_, delete_, save_) - один потік-письменник:
+      SQLite допускає одного письменника, черга виконавця впорядковує їх
+    - Читання - невеликий пул потоків (у WAL читачі не чекають на запис)
+    Кожен потік має власне персистентне з'єднання. Синхронний
+    StorageService лишається для скриптів та фонових задач.
+    """
+    
+    WRITE_PREFIXES = ("create_", "update_", "delete_", "save_")
+    
+    def __init__(self, store: StorageService, read_threads: Optional[int] = None):
+        self.sync = store
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="storage-write")
+        self._readers = ThreadPoolExecutor(
+            max_workers=read_threads or settings.STORAGE_READ_THREADS,
+            thread_name_prefix="storage-read"
+        )
+    
+    def __getattr__(self, name: str):
+        method = getattr(self.sync, name)
+        if name.startswith("_") or not callable(method):
+            raise AttributeError(name)
+        executor = self._writer if name.startswith(self.WRITE_PREFIXES) else self._readers
+        
+        @functools.wraps(method)
+        async def call(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(executor, functools.partial(method, *args, **kwargs))
+        
+        # Обгортка створюється один раз на метод
+        setattr(self, name, call)
+        return call
+    
+    @property
+    def threads(self) -> int:
+        """Кількість запущених потоків пулів (пули створюють потоки за потребою)"""
+        return len(self._writer._threads) + len(self._readers._threads)
+    
+    def close(self):
+        """Дочекатися поставлених запитів та закрити з'єднання"""
+        self._writer.shutdown(wait=True)
+        self._readers.shutdown(wait=True)
+        self.sync.close()
+
 
 # Глобальний екземпляр сховища
 storage = StorageService()
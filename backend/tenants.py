@@ -0,0 +1,324 @@
+"""
+Тенанти (окремі гарячі лінії)
+Кожна лінія (місто, РДА, комунальні служби) має власні довідники,
+історію дзвінків, класифікатор та аудіо відповідей. Класифікатор і
+аудіо завантажуються ліниво та витісняються LRU в межах бюджету пам'яті
+"""
+import hmac
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Set
+
+from config import settings
+from archival import HistoryArchiver
+from call_writer import CallRecordWriter
+from classifier import QueryClassifier, classifier
+from incidents import IncidentIndex, incident_index
+from reclassification import ReclassificationJob
+from storage import AsyncStorageService, StorageService, storage
+
+
+# ID тенанта стає частиною шляху до бази - лише безпечні символи
+TENANT_ID_RE = re.compile(r"^[a-z0-9][a-z0-9_-]{0,63}$")
+
+# Скільки синтезованих відповідей зберігати на тенанта
+RESPONSE_PACK_SIZE = 256
+
+# Оцінка пам'яті одного потоку тенанта (стек, стан інтерпретатора, буфери)
+THREAD_BYTES = 256 * 1024
+
+# Як часто оновлювати оцінку пам'яті тенанта, що використовується, секунд
+MEMORY_REFRESH_SECONDS = 30
+
+
+class Tenant:
+    """
+    Набір даних однієї гарячої лінії
+
+    - storage: власна SQLite база (довідники та історія), async_storage -
+      її асинхронний фасад для обробників, call_writer - відкладений
+      пакетний запис історії дзвінків, archiver - перенесення старих
+      місяців історії в архівні бази
+    - reclassification: фонова перекласифікація історії тенанта його
+      класифікатором
+    - classifier: компілюється з довідника тенанта при першому зверненні
+    - incidents: власний індекс інцидентів
+    - background_tasks: фонові asyncio задачі тенанта (попередній синтез
+      відповідей інцидентів); посилання тримаються до завершення задачі
+    - пакет аудіо відповідей: синтезована відповідь кешується за текстом
+    """
+
+    def __init__(self, tenant_id: str, store: StorageService,
+                 query_classifier: Optional[QueryClassifier] = None,
+                 incidents: Optional[IncidentIndex] = None):
+        self.id = tenant_id
+        self.storage = store
+        self.async_storage = AsyncStorageService(store)
+        self.call_writer = CallRecordWriter(store)
+        self.archiver = HistoryArchiver(store)
+        self.reclassification = ReclassificationJob(store, lambda: self.classifier)
+        self.incidents = incidents or IncidentIndex()
+        self.background_tasks: Set = set()
+        self.sessions = 0  # відкриті WebSocket сесії
+        self.last_used = time.monotonic()
+        self._classifier = query_classifier
+        self._lock = threading.Lock()
+        self._responses: "OrderedDict[str, object]" = OrderedDict()
+        self._responses_bytes = 0
+        # Оцінка пам'яті для бюджету реєстру (memory_bytes читає розміри файлів бази)
+        self.memory_estimate = 0
+        self._memory_refreshed = 0.0
+
+    @property
+    def loaded(self) -> bool:
+        return self._classifier is not None
+
+    @property
+    def classifier(self) -> QueryClassifier:
+        """Класифікатор тенанта (компілюється при першому зверненні)"""
+        if self._classifier is None:
+            with self._lock:
+                if self._classifier is None:
+                    print(f"[Tenants] Завантаження класифікатора тенанта {self.id}")
+                    self._classifier = QueryClassifier(source=self.storage)
+                    # Класифікатор - основна частина пам'яті: оцінку оновить наступний запит
+                    self._memory_refreshed = 0.0
+        return self._classifier
+
+    def response_audio(self, text: str, synthesize: Callable[[str], object]):
+        """
+        Аудіо відповіді з пакета тенанта (синтез лише при першому використанні)
+
+        Викликається поза event loop - синтез блокуючий.
+        """
+        with self._lock:
+            audio = self._responses.get(text)
+            if audio is not None:
+                self._responses.move_to_end(text)
+                return audio
+
+        audio = synthesize(text)
+        with self._lock:
+            if text not in self._responses:
+                self._responses[text] = audio
+                self._responses_bytes += len(audio)
+                while len(self._responses) > RESPONSE_PACK_SIZE:
+                    _, evicted = self._responses.popitem(last=False)
+                    self._responses_bytes -= len(evicted)
+        return audio
+
+    def threads(self) -> int:
+        """Живі фонові потоки тенанта"""
+        threads = (self.archiver.threads + self.call_writer.threads + self.async_storage.threads
+                   + int(self.reclassification.running))
+        if self._classifier is not None:
+            threads += self._classifier.threads
+        return threads
+
+    def memory_bytes(self) -> int:
+        """Оцінка пам'яті: класифікатор, пакет аудіо, потоки та з'єднання SQLite"""
+        size = self._responses_bytes + self.threads() * THREAD_BYTES + self.storage.memory_bytes()
+        if self._classifier is not None:
+            size += self._classifier.memory_bytes()
+        return size
+
+    @property
+    def memory_stale(self) -> bool:
+        return time.monotonic() - self._memory_refreshed >= MEMORY_REFRESH_SECONDS
+
+    def refresh_memory(self) -> int:
+        """Оновити оцінку пам'яті для бюджету реєстру"""
+        self.memory_estimate = self.memory_bytes()
+        self._memory_refreshed = time.monotonic()
+        return self.memory_estimate
+
+    @property
+    def idle(self) -> bool:
+        """
+        Тенант можна закрити: давно не використовувався, немає сесій,
+        фонових задач, незаписаних дзвінків та відкритих інцидентів
+        (інциденти живуть лише в пам'яті)
+        """
+        return (time.monotonic() - self.last_used >= settings.TENANT_IDLE_SECONDS
+                and self.sessions == 0 and not self.background_tasks
+                and not self.reclassification.running and self.call_writer.pending == 0
+                and not self.incidents.summary()["open"])
+
+    def unload(self):
+        """Звільнити класифікатор та аудіо (база залишається на диску)"""
+        with self._lock:
+            self._classifier = None
+            self._responses.clear()
+            self._responses_bytes = 0
+
+    def close(self):
+        """Зупинити фонові потоки, дописати буфер дзвінків і закрити з'єднання з базою"""
+        # Перекласифікація зупиняється після поточної порції (продовження - resume)
+        self.reclassification.cancel()
+        self.reclassification.wait()
+        self.archiver.close()
+        self.call_writer.close()
+        self.async_storage.close()
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "loaded": self.loaded,
+            "classifier_version": self._classifier.version if self._classifier is not None else None,
+            "responses_cached": len(self._responses),
+            "sessions": self.sessions,
+            "threads": self.threads(),
+            "memory_bytes": self.memory_estimate,
+            "open_incidents": self.incidents.summary()["open"],
+            "call_writer": self.call_writer.stats(),
+            "archiver": self.archiver.stats(),
+        }
+
+
+class TenantRegistry:
+    """
+    Реєстр тенантів з LRU-витісненням
+
+    Тенант за замовчуванням використовує глобальні storage, classifier
+    та індекс інцидентів і ніколи не витісняється. Решта тенантів
+    створюються при першому запиті. Оцінка пам'яті тенанта враховує і
+    його потоки та з'єднання SQLite; якщо сума перевищує
+    TENANT_MEMORY_BUDGET_MB, найдавніше використані тенанти:
+    - простоюючі (Tenant.idle) закриваються та видаляються з реєстру -
+      потоки, пули та з'єднання звільняються, наступний запит створить
+      тенант заново;
+    - решта лише вивантажують класифікатор та аудіо (об'єкт тенанта з
+      сесіями та відкритими інцидентами лишається). Сесії, що вже
+      тримають класифікатор, працюють далі - пам'ять звільняється після
+      їх завершення.
+
+    Бюджет рахується за кешованими оцінками пам'яті тенантів: вони
+    оновлюються поза блокуванням реєстру при відкритті тенанта, після
+    завантаження класифікатора та не частіше ніж раз на
+    MEMORY_REFRESH_SECONDS, а також після витіснення.
+    """
+
+    def __init__(self, default: Tenant, data_dir: str, budget_bytes: int):
+        self.default = default
+        self.data_dir = data_dir
+        self.budget_bytes = budget_bytes
+        self._tenants: "OrderedDict[str, Tenant]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.closed = 0
+
+    def configured_ids(self) -> List[str]:
+        """Тенанти з налаштувань (TENANT_IDS) та з бази на диску"""
+        ids = {tenant_id.strip() for tenant_id in settings.TENANT_IDS.split(",") if tenant_id.strip()}
+        if os.path.isdir(self.data_dir):
+            ids.update(name[:-3] for name in os.listdir(self.data_dir) if name.endswith(".db"))
+        return sorted(tenant_id for tenant_id in ids if TENANT_ID_RE.match(tenant_id))
+
+    def get(self, tenant_id: Optional[str] = None) -> Tenant:
+        """
+        Тенант за ID (None - тенант за замовчуванням)
+
+        Raises:
+            ValueError: недопустимий ID
+            KeyError: тенант не налаштований
+        """
+        if not tenant_id or tenant_id == self.default.id:
+            if self.default.memory_stale:
+                self.default.refresh_memory()
+            return self.default
+
+        with self._lock:
+            tenant = self._tenants.get(tenant_id)
+            if tenant is not None:
+                self._tenants.move_to_end(tenant_id)
+            else:
+                if not TENANT_ID_RE.match(tenant_id):
+                    raise ValueError(f"Недопустимий ID тенанта: {tenant_id}")
+                if tenant_id not in self.configured_ids():
+                    raise KeyError(tenant_id)
+
+                os.makedirs(self.data_dir, exist_ok=True)
+                tenant = Tenant(tenant_id, StorageService(os.path.join(self.data_dir, f"{tenant_id}.db")))
+                tenant.archiver.start()
+                self._tenants[tenant_id] = tenant
+
+            tenant.last_used = time.monotonic()
+
+        if tenant.memory_stale:
+            tenant.refresh_memory()
+        with self._lock:
+            self._enforce_budget(keep=tenant)
+        return tenant
+
+    def has_access(self, tenant_id: Optional[str], api_key: str) -> bool:
+        """
+        Чи відкриває ключ доступ до тенанта (TENANT_API_KEYS)
+
+        Тенант за замовчуванням доступний усім клієнтам; тенант без
+        ключа в налаштуваннях - лише адміністратору (перевіряє викликач).
+        """
+        if not tenant_id or tenant_id == self.default.id:
+            return True
+        for entry in settings.TENANT_API_KEYS.split(","):
+            name, _, key = entry.strip().partition(":")
+            if name == tenant_id and key:
+                return hmac.compare_digest(key.encode(), api_key.encode())
+        return False
+
+    def _enforce_budget(self, keep: Tenant):
+        """Витіснити найдавніше використані тенанти, поки пам'ять перевищує бюджет"""
+        total = self.default.memory_estimate + sum(tenant.memory_estimate for tenant in self._tenants.values())
+        if total <= self.budget_bytes:
+            return
+        for tenant in list(self._tenants.values()):
+            if total <= self.budget_bytes:
+                break
+            if tenant is keep:
+                continue
+            size = tenant.memory_estimate
+            if tenant.idle:
+                del self._tenants[tenant.id]
+                # Зупинка потоків чекає на них - поза блокуванням реєстру
+                threading.Thread(target=tenant.close, name=f"tenant-close-{tenant.id}", daemon=True).start()
+                total -= size
+                self.closed += 1
+                print(f"[Tenants] Тенант {tenant.id} закрито ({size / 1024 / 1024:.1f} MB)")
+            elif tenant.loaded:
+                tenant.unload()
+                total -= size - tenant.refresh_memory()
+                self.evictions += 1
+                print(f"[Tenants] Тенант {tenant.id} вивантажено ({size / 1024 / 1024:.1f} MB)")
+
+    def close(self):
+        """Дописати буфери записів дзвінків і закрити з'єднання з базами всіх тенантів"""
+        with self._lock:
+            for tenant in [self.default] + list(self._tenants.values()):
+                tenant.close()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            tenants = [self.default] + list(self._tenants.values())
+        for tenant in tenants:
+            tenant.refresh_memory()
+        with self._lock:
+            return {
+                "default": self.default.id,
+                "budget_bytes": self.budget_bytes,
+                "memory_bytes": sum(tenant.memory_estimate for tenant in tenants),
+                "evictions": self.evictions,
+                "closed": self.closed,
+                "configured": self.configured_ids(),
+                "tenants": [tenant.to_dict() for tenant in tenants],
+            }
+
+
+# Глобальний реєстр: тенант за замовчуванням - наявні глобальні сервіси
+default_tenant = Tenant(settings.DEFAULT_TENANT_ID, storage, classifier, incident_index)
+tenant_registry = TenantRegistry(
+    default_tenant,
+    settings.TENANT_DATA_DIR,
+    int(settings.TENANT_MEMORY_BUDGET_MB * 1024 * 1024)
+)
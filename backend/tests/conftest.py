@@ -0,0 +1,5 @@
+"""Модулі backend імпортуються з кореня (як у benchmarks/)"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,60 @@
+"""
+Архівування історії не змінює схему гарячої бази та зберігає лічильники
+"""
+import sqlite3
+
+import pytest
+
+from storage import CallRecordCreate, StorageService
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = StorageService(str(tmp_path / "hot.db"))
+    store.create_call_records([
+        CallRecordCreate(transcript=f"дзвінок {i}", status="escalated" if i % 3 == 0 else "resolved",
+                         timestamp=f"2024-0{1 + i % 2}-1{i % 10}T10:00:00")
+        for i in range(20)
+    ] + [CallRecordCreate(transcript="свіжий", timestamp="2026-10-01T10:00:00")])
+    yield store
+    store.close()
+
+
+def _schema_version(store: StorageService) -> int:
+    with store._connection() as conn:
+        return conn.execute("PRAGMA schema_version").fetchone()[0]
+
+
+def test_archiving_keeps_schema_and_counters(store):
+    stats = store.get_statistics()
+    rollups = store.get_call_timeseries("2024-01-01", "2024-03-01", interval="day")
+    schema_version = _schema_version(store)
+
+    moved = store.archive_call_history("2024-03", batch_size=3)
+    assert moved == {"2024-01": 10, "2024-02": 10}
+    # Кожна порція видаляє записи без DROP/CREATE TRIGGER
+    assert _schema_version(store) == schema_version
+    assert store.get_statistics() == stats
+    assert store.get_call_timeseries("2024-01-01", "2024-03-01", interval="day") == rollups
+
+    # Поза архівуванням видалення знову віднімається з лічильників
+    with store._connection() as conn:
+        conn.execute("DELETE FROM call_history WHERE transcript = 'свіжий'")
+    assert store.get_statistics()["total_calls"] == stats["total_calls"] - 1
+
+
+def test_old_delete_triggers_are_gated_on_start(tmp_path):
+    path = str(tmp_path / "old.db")
+    StorageService(path).close()
+    conn = sqlite3.connect(path)
+    conn.execute("DROP TRIGGER trg_call_stats_delete")
+    conn.execute("CREATE TRIGGER trg_call_stats_delete AFTER DELETE ON call_history BEGIN SELECT 1; END")
+    conn.commit()
+    conn.close()
+
+    store = StorageService(path)
+    with store._connection() as conn:
+        sql = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'trg_call_stats_delete'").fetchone()[0]
+    assert "call_history_control" in sql
+    store.close()
+
@@ -0,0 +1,62 @@
+"""
+AudioBuffer: зрізи без копіювання та кодування WAV, що читається стандартним wave
+"""
+import io
+import wave
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from audio_buffer import AudioBuffer
+
+
+def _stereo(frames: int = 100) -> AudioBuffer:
+    samples = np.arange(frames * 2, dtype=np.int16).reshape(-1, 2)
+    return AudioBuffer.from_array(samples, sample_rate=8000, channels=2)
+
+
+def test_pcm_slices_are_frames_without_copy():
+    buffer = _stereo()
+    part = buffer[10:20]
+    assert part.num_frames == 10
+    assert part.as_array()[0].tolist() == [20, 21]
+    # Зріз ділить пам'ять з вихідним масивом
+    assert np.shares_memory(part.as_array(), buffer.as_array())
+    assert buffer[-5:].num_frames == 5
+    with pytest.raises(ValueError):
+        buffer[::2]
+
+
+def test_container_slices_and_chunks_are_bytes():
+    buffer = AudioBuffer.from_bytes(bytes(range(10)), format="webm")
+    assert buffer[2:5].tobytes() == bytes([2, 3, 4])
+    assert [bytes(chunk) for chunk in buffer.chunks(4)] == [bytes(range(4)), bytes(range(4, 8)), bytes([8, 9])]
+    assert buffer.tobytes() is buffer.view.obj
+
+
+def test_float_pcm_is_clipped_to_int16():
+    buffer = AudioBuffer.from_array(np.array([0.0, 0.5, -2.0, 2.0], dtype=np.float32), sample_rate=16000)
+    assert buffer.to_pcm16().as_array().tolist() == [0, 16383, -32767, 32767]
+
+
+def test_encode_wav_roundtrip():
+    buffer = _stereo()
+    encoded = buffer.encode_wav()
+    assert encoded.format == "wav"
+    assert encoded.nbytes == 44 + buffer.nbytes
+
+    with wave.open(io.BytesIO(encoded.tobytes())) as wav:
+        assert (wav.getnchannels(), wav.getsampwidth(), wav.getframerate()) == (2, 2, 8000)
+        assert wav.readframes(wav.getnframes()) == buffer.tobytes()
+
+    # Розбір WAV назад у PCM - зріз без копіювання
+    pcm = encoded._wav_pcm()
+    assert (pcm.format, pcm.sample_rate, pcm.channels) == ("pcm_s16", 8000, 2)
+    assert pcm.tobytes() == buffer.tobytes()
+
+
+def test_matching_wav_decodes_without_ffmpeg():
+    mono = AudioBuffer.from_array(np.arange(160, dtype=np.int16), sample_rate=16000)
+    decoded = AudioBuffer.from_bytes(mono.encode_wav().tobytes(), format="wav").decode(16000)
+    assert decoded.as_array().tolist() == list(range(160))
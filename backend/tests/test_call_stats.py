@@ -0,0 +1,84 @@
+"""
+Лічильники call_stats оновлюються тригерами разом з історією
+"""
+import sqlite3
+
+import pytest
+
+from storage import CallRecordCreate, StorageService
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = StorageService(str(tmp_path / "stats.db"))
+    store.create_call_records([
+        CallRecordCreate(transcript=f"дзвінок {i}", status=["resolved", "escalated", None][i % 3],
+                         timestamp=f"2024-05-0{1 + i % 9}T10:00:00")
+        for i in range(20)
+    ])
+    # Тривалість записується після розмови - оновленням
+    with store._connection() as conn:
+        conn.execute("""
+            UPDATE call_history SET duration_seconds =
+                CASE CAST(substr(transcript, 9) AS INTEGER) % 4 WHEN 1 THEN 30 WHEN 2 THEN NULL WHEN 3 THEN 45 ELSE 0 END
+        """)
+    yield store
+    store.close()
+
+
+def _counters(store: StorageService):
+    with store._connection() as conn:
+        return sorted(tuple(row) for row in conn.execute(
+            "SELECT status, calls, duration_sum, duration_count FROM call_stats WHERE calls != 0"
+        ))
+
+
+def _recomputed(store: StorageService):
+    """Ті самі лічильники агрегацією всієї історії"""
+    with store._connection() as conn:
+        return sorted(tuple(row) for row in conn.execute(store._CALL_STATS_AGGREGATE))
+
+
+def test_insert_update_delete_keep_counters_exact(store):
+    assert _counters(store) == _recomputed(store)
+    stats = store.get_statistics()
+    assert stats["total_calls"] == 20
+    assert stats["ai_resolved"] == 7 and stats["escalated"] == 7
+
+    with store._connection() as conn:
+        conn.execute("UPDATE call_history SET status = 'escalated' WHERE status = 'resolved' AND transcript LIKE '%1'")
+        conn.execute("UPDATE call_history SET duration_seconds = 60 WHERE duration_seconds IS NULL")
+        # Зміна інших колонок лічильники не чіпає
+        conn.execute("UPDATE call_history SET transcript = transcript || '!'")
+    assert _counters(store) == _recomputed(store)
+
+    with store._connection() as conn:
+        conn.execute("DELETE FROM call_history WHERE status IS NULL")
+    assert _counters(store) == _recomputed(store)
+    assert store.get_statistics()["total_calls"] == 14
+
+
+def test_average_duration_counts_only_positive(store):
+    with store._connection() as conn:
+        total, count = conn.execute(
+            "SELECT SUM(duration_seconds), COUNT(*) FROM call_history WHERE duration_seconds > 0"
+        ).fetchone()
+    assert store.get_statistics()["avg_response_time"] == pytest.approx(total / count)
+
+
+def test_counters_are_filled_for_existing_history(tmp_path, store):
+    expected = _counters(store)
+    path = store.db_path
+    store.close()
+
+    # База до появи тригерів: лічильників немає, історія є
+    conn = sqlite3.connect(path)
+    for trigger in ("trg_call_stats_insert", "trg_call_stats_update", "trg_call_stats_delete"):
+        conn.execute(f"DROP TRIGGER {trigger}")
+    conn.execute("DELETE FROM call_stats")
+    conn.commit()
+    conn.close()
+
+    reopened = StorageService(path)
+    assert _counters(reopened) == expected
+    reopened.close()
@@ -0,0 +1,74 @@
+"""
+Потік запису дзвінків переживає скасовані очікування та помилки
+"""
+import asyncio
+import time
+
+import pytest
+
+from call_writer import CallRecordWriter
+from storage import CallRecordCreate, StorageService
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = StorageService(str(tmp_path / "calls.db"))
+    yield store
+    store.close()
+
+
+def _transcripts(store: StorageService):
+    return {row["transcript"] for row in store.get_call_history(limit=100)}
+
+
+def test_cancelled_durable_write_keeps_writer_alive(store):
+    writer = CallRecordWriter(store, flush_ms=10_000)
+    # Потік запису не візьме пакет, поки тримаємо блокування (Condition реентерабельний)
+    with writer._condition:
+        cancelled = writer.submit(CallRecordCreate(transcript="скасовано"), durable=True)
+        assert cancelled.cancel()
+
+    writer.submit(CallRecordCreate(transcript="наступний"), durable=True).result(timeout=5)
+    # Скасовано лише очікування - запис збережено
+    assert _transcripts(store) == {"скасовано", "наступний"}
+    writer.close(5)
+
+
+def test_unexpected_error_fails_batch_and_keeps_writer_alive(store, monkeypatch):
+    writer = CallRecordWriter(store, flush_ms=10_000)
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("пошкоджено")
+
+    monkeypatch.setattr(writer, "_write_batch", broken)
+    with pytest.raises(RuntimeError):
+        writer.submit(CallRecordCreate(transcript="втрачено"), durable=True).result(timeout=5)
+
+    monkeypatch.undo()
+    writer.submit(CallRecordCreate(transcript="після помилки"), durable=True).result(timeout=5)
+    assert _transcripts(store) == {"після помилки"}
+    writer.close(5)
+
+
+def test_remaining_records_keep_their_enqueue_time(store):
+    writer = CallRecordWriter(store, batch_size=2, flush_ms=1000)
+    with writer._condition:
+        for i in range(3):
+            writer.submit(CallRecordCreate(transcript=f"запис {i}"))
+        time.sleep(0.8)
+
+    # Третій запис чекає вже 0.8 с - після повного пакета відлік не починається заново
+    time.sleep(0.5)
+    assert writer.pending == 0
+    assert len(_transcripts(store)) == 3
+    writer.close(5)
+
+
+def test_write_waits_for_space_off_the_event_loop(store):
+    writer = CallRecordWriter(store, batch_size=10, flush_ms=200, max_pending=1)
+    writer.submit(CallRecordCreate(transcript="перший"))
+    assert writer.full()
+
+    asyncio.run(writer.write(CallRecordCreate(transcript="другий"), durable=True))
+    assert _transcripts(store) == {"перший", "другий"}
+    writer.close(5)
@@ -0,0 +1,24 @@
+"""
+Каскад класифікації вмикається явно: без нього нерозпізнаний запит іде оператору
+"""
+from classifier import QueryClassifier, classify_queries, classify_query
+from config import settings
+
+ITEMS = [
+    {"id": "water", "problem": "Водопостачання", "type": "Вода", "subtype": "Немає води",
+     "keywords": ["вода", "водопостачання"], "response": "Заявку передано",
+     "executor": "Водоканал", "urgency": "short", "response_time": 8},
+    {"id": "light", "problem": "Електропостачання", "type": "Світло", "subtype": "Немає світла",
+     "keywords": ["світло", "електрика"], "response": "Заявку передано",
+     "executor": "Обленерго", "urgency": "short", "response_time": 8},
+]
+
+
+def test_disabled_cascade_keeps_keyword_routing(monkeypatch):
+    monkeypatch.setattr(settings, "NLU_CASCADE_ENABLED", False)
+    query_classifier = QueryClassifier([dict(item) for item in ITEMS])
+    query = "у нас відключили електропостачання"
+
+    assert classify_query(query, query_classifier).needs_operator
+    assert [result.needs_operator for result in classify_queries([query], query_classifier)] == [True]
+    assert query_classifier.cascade_stats.total == 0
@@ -0,0 +1,67 @@
+"""
+Пакетна класифікація: JSON та NDJSON на вході, потік NDJSON у порядку запитів
+"""
+import json
+import uuid
+
+import pytest
+
+pytest.importorskip("httpx")
+from fastapi.testclient import TestClient
+
+import main_fixed
+from classifier import classification_to_dict, classify_query
+from config import settings
+
+
+@pytest.fixture(scope="module")
+def client():
+    return TestClient(main_fixed.app)
+
+
+def _auth():
+    # Окремий клієнт на тест - ліміт запитів не перетинається
+    return (f"batch-{uuid.uuid4().hex[:8]}", "secret")
+
+
+def _lines(response):
+    assert response.headers["content-type"].startswith(main_fixed.NDJSON_MEDIA_TYPE)
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_json_batch_streams_results_in_order(client, monkeypatch):
+    monkeypatch.setattr(settings, "CLASSIFY_BATCH_CHUNK_SIZE", 2)
+    queries = ["немає опалення", {"text": "немає води"}, "", {"text": 5}, "прорвало трубу"]
+    response = client.post("/api/classify/batch", json={"queries": queries}, auth=_auth())
+    assert response.status_code == 200
+
+    lines = _lines(response)
+    assert [line["index"] for line in lines] == list(range(len(queries)))
+    assert "error" in lines[2] and "error" in lines[3]
+    for line, text in ((lines[0], "немає опалення"), (lines[1], "немає води"), (lines[4], "прорвало трубу")):
+        assert line["query"] == text
+        assert line["classification"] == classification_to_dict(classify_query(text, main_fixed.classifier))
+
+
+def test_ndjson_body_is_read_line_by_line(client):
+    body = "\n".join(['"немає опалення"', "не json", "", '{"text": "немає води"}']) + "\n"
+    response = client.post("/api/classify/batch", content=body.encode(), auth=_auth(),
+                           headers={"Content-Type": main_fixed.NDJSON_MEDIA_TYPE})
+    assert response.status_code == 200
+
+    lines = _lines(response)
+    # Порожні рядки пропускаються, некоректний JSON - помилка на своїй позиції
+    assert [line["index"] for line in lines] == [0, 1, 2]
+    assert lines[0]["query"] == "немає опалення"
+    assert "error" in lines[1]
+    assert lines[2]["query"] == "немає води"
+
+
+def test_batch_limits(client, monkeypatch):
+    monkeypatch.setattr(settings, "CLASSIFY_BATCH_MAX_QUERIES", 2)
+    assert client.post("/api/classify/batch", json={"queries": ["а", "б", "в"]}, auth=_auth()).status_code == 413
+    response = client.post("/api/classify/batch", content=b'"a"\n"b"\n"c"\n', auth=_auth(),
+                           headers={"Content-Type": main_fixed.NDJSON_MEDIA_TYPE})
+    assert response.status_code == 413
+    assert client.post("/api/classify/batch", json={"queries": []}, auth=_auth()).status_code == 400
+    assert client.post("/api/classify/batch", json={"text": "а"}, auth=_auth()).status_code == 400
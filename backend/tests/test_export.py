@@ -0,0 +1,79 @@
+"""
+Потоковий експорт історії: NDJSON, CSV та Parquet від старих записів до нових
+"""
+import csv
+import io
+import json
+
+import pytest
+
+from history_export import COLUMNS, PYARROW_AVAILABLE, export_chunks
+from storage import CallRecordCreate, StorageService
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = StorageService(str(tmp_path / "export.db"))
+    store.create_call_records([
+        CallRecordCreate(transcript=f"дзвінок {i}", status="escalated" if i % 2 else "resolved",
+                         classification={"type": "Вода", "confidence": 0.5},
+                         timestamp=f"2024-0{1 + i % 3}-1{i}T10:00:00")
+        for i in range(6)
+    ] + [
+        CallRecordCreate(transcript='кома, "лапки"\nі новий рядок', timestamp="2026-10-01T10:00:00"),
+        CallRecordCreate(transcript="без часу", timestamp=None),
+    ])
+    assert sum(store.archive_call_history("2024-03").values()) == 4
+    yield store
+    store.close()
+
+
+def _export(store: StorageService, export_format: str, **filters) -> bytes:
+    return b"".join(export_chunks(export_format, store.export_call_history(batch_size=2, **filters)))
+
+
+def _ndjson(store: StorageService, **filters):
+    return [json.loads(line) for line in _export(store, "ndjson", **filters).decode("utf-8").splitlines()]
+
+
+def test_ndjson_keeps_order_across_batches_and_archive(store):
+    records = _ndjson(store)
+    assert [record["transcript"] for record in records] == [
+        "без часу", "дзвінок 0", "дзвінок 3", "дзвінок 1", "дзвінок 4", "дзвінок 2", "дзвінок 5",
+        'кома, "лапки"\nі новий рядок',
+    ]
+    assert set(records[0]) == set(COLUMNS)
+    # classification вставлено як JSON-об'єкт, а не як рядок
+    assert records[1]["classification"] == {"type": "Вода", "confidence": 0.5}
+
+
+def test_filters_apply_to_archive_and_hot_rows(store):
+    escalated = _ndjson(store, status="escalated", start="2024-02-01", end="2026-01-01")
+    assert [record["transcript"] for record in escalated] == ["дзвінок 1", "дзвінок 5"]
+    # Записи без timestamp - лише без start
+    assert "без часу" not in {record["transcript"] for record in _ndjson(store, start="2024-01-01")}
+
+
+def test_csv_has_header_and_quotes_text(store):
+    rows = list(csv.reader(io.StringIO(_export(store, "csv").decode("utf-8"))))
+    assert rows[0] == COLUMNS
+    assert len(rows) == 9
+    transcript = COLUMNS.index("transcript")
+    assert rows[-1][transcript] == 'кома, "лапки"\nі новий рядок'
+    assert json.loads(rows[2][COLUMNS.index("classification")])["type"] == "Вода"
+
+
+def test_unknown_format_is_rejected(store):
+    with pytest.raises(ValueError):
+        _export(store, "xml")
+
+
+@pytest.mark.skipif(not PYARROW_AVAILABLE, reason="pyarrow не встановлено")
+def test_parquet_round_trip(store):
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(io.BytesIO(_export(store, "parquet")))
+    assert table.column_names == COLUMNS
+    assert table.num_rows == 8
+    assert [record["transcript"] for record in _ndjson(store)] == table.column("transcript").to_pylist()
+    assert table.schema.field("duration_seconds").type == "int64"
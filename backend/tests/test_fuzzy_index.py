@@ -0,0 +1,62 @@
+"""
+Індекс нечітких збігів знаходить те саме, що й перебір усіх ключових слів
+"""
+import random
+
+import pytest
+
+from config import settings
+from keyword_index import DeletionIndex, KeywordIndex, fuzzy_keyword_match, keyword_features, keyword_score
+
+ALPHABET = "абвгдекоилнрст"
+
+
+def _word(rng: random.Random, low: int, high: int) -> str:
+    return "".join(rng.choice(ALPHABET) for _ in range(rng.randint(low, high)))
+
+
+def _typo(rng: random.Random, word: str) -> str:
+    """Заміна, видалення або вставка одного символу"""
+    pos = rng.randrange(len(word))
+    char = rng.choice(ALPHABET)
+    return rng.choice([
+        word[:pos] + char + word[pos + 1:],
+        word[:pos] + word[pos + 1:],
+        word[:pos] + char + word[pos:],
+    ])
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_matches_brute_force(seed):
+    rng = random.Random(seed)
+    keywords = {pattern_id: _word(rng, 3, 12) for pattern_id in range(400)}
+    index = DeletionIndex(keywords)
+
+    samples = list(keywords.values())
+    tokens = [_word(rng, 1, 14) for _ in range(200)]
+    tokens += [_typo(rng, rng.choice(samples)) for _ in range(200)]
+    tokens += [_typo(rng, _typo(rng, rng.choice(samples))) for _ in range(200)]
+    # Ключове слово як основа довшого слова запиту
+    tokens += [_typo(rng, rng.choice(samples)) + _word(rng, 1, 4) for _ in range(200)]
+
+    for token in tokens:
+        expected = {pattern_id for pattern_id, keyword in keywords.items() if fuzzy_keyword_match(keyword, (token,))}
+        assert index.search([token], set()) == expected, token
+
+
+def test_short_and_multiword_keywords_are_not_indexed():
+    index = DeletionIndex({0: "кіт", 1: "вул шевченка", 2: "ліхтар"})
+    assert list(index.keywords) == [2]
+    assert index.search(["лихтар"], set()) == {2}
+    assert index.search(["ліхтарі"], set()) == {2}
+
+
+def test_zero_weight_keeps_baseline_score(monkeypatch):
+    monkeypatch.setattr(settings, "FUZZY_KEYWORD_WEIGHT", 0.0)
+    item = {"id": "light", "type": "Освітлення", "subtype": "Не горить", "keywords": ["ліхтар"]}
+    index = KeywordIndex([item])
+    assert index._fuzzy is None
+    # Помилка розпізнавання не дає оцінки, як і в базовому алгоритмі
+    assert keyword_features("лихтар", item) == (0, False, False, 0)
+    assert index.features("лихтар") == {}
+    assert index.scores("ліхтар") == {0: keyword_score(1, False, False)}
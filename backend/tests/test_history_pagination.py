@@ -0,0 +1,71 @@
+"""
+Keyset-пагінація історії: курсор (timestamp, id) не губить і не повторює записи
+"""
+import pytest
+
+from storage import CallRecordCreate, StorageService, uuid7
+
+TIE = "2024-02-10T10:00:00"
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = StorageService(str(tmp_path / "history.db"))
+    # Багато записів з однаковим timestamp - порядок визначає id
+    records = [CallRecordCreate(transcript=f"тиша {i}", timestamp=TIE, status="resolved") for i in range(7)]
+    records += [CallRecordCreate(transcript=f"січень {i}", timestamp=f"2024-01-0{i + 1}T09:00:00",
+                                 status="escalated" if i % 2 else "resolved") for i in range(5)]
+    records += [CallRecordCreate(transcript=f"березень {i}", timestamp=TIE.replace("02", "03", 1), status="resolved")
+                for i in range(3)]
+    store.create_call_records(records)
+    yield store
+    store.close()
+
+
+def _walk(store: StorageService, limit: int, **filters):
+    pages, before = [], None
+    while True:
+        page = store.get_call_history(limit=limit, before=before, **filters)
+        pages.append(page)
+        if len(page) < limit:
+            return pages
+        before = (page[-1]["timestamp"], page[-1]["id"])
+
+
+def _expected(store: StorageService, **filters):
+    rows = store.get_call_history(limit=1000, **filters)
+    assert rows == sorted(rows, key=lambda row: (row["timestamp"], row["id"]), reverse=True)
+    return [row["id"] for row in rows]
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 7, 20])
+def test_cursor_pages_cover_history_once(store, limit):
+    ids = [row["id"] for page in _walk(store, limit) for row in page]
+    assert ids == _expected(store)
+    assert len(ids) == 15
+
+
+def test_cursor_with_filter(store):
+    ids = [row["id"] for page in _walk(store, 2, status="escalated") for row in page]
+    assert ids == _expected(store, status="escalated")
+    assert len(ids) == 2
+
+
+def test_cursor_inside_timestamp_tie(store):
+    tied = [row for row in store.get_call_history(limit=1000) if row["timestamp"] == TIE]
+    middle = tied[3]
+    page = store.get_call_history(limit=100, before=(TIE, middle["id"]))
+    assert [row["id"] for row in page[:3]] == [row["id"] for row in tied[4:]]
+
+
+def test_cursor_across_archived_months(store):
+    expected = _expected(store)
+    store.archive_call_history("2024-03", batch_size=2)
+    ids = [row["id"] for page in _walk(store, 4) for row in page]
+    assert ids == expected
+
+
+def test_uuid7_is_ordered():
+    ids = [uuid7() for _ in range(1000)]
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(ids)
@@ -0,0 +1,127 @@
+"""
+Ключові слова, тип та підтип нормалізуються так само, як запит
+"""
+import time
+
+import pytest
+
+from classifier import TFIDF_AVAILABLE, ClassifierSnapshot, QueryClassifier, classification_to_dict
+from config import settings
+from keyword_index import KeywordIndex, keyword_features
+from text_utils import normalize_query
+
+ITEMS = [
+    {"id": "meat", "problem": "Торгівля", "type": "Продукти", "subtype": "М’ясо неналежної якості",
+     "keywords": ["м’ясо", "зіпсований"], "response": "Передано до Держпродспоживслужби",
+     "executor": "Держпродспоживслужба", "urgency": "standard", "response_time": 24},
+    {"id": "street", "problem": "Благоустрій", "type": "Освітлення", "subtype": "Не горить ліхтар",
+     "keywords": ["вул. Шевченка", "ліхтар"], "response": "Заявку прийнято",
+     "executor": "Міськсвітло", "urgency": "short", "response_time": 8},
+    {"id": "other", "problem": "Інше", "type": "Інше", "subtype": "Інше",
+     "keywords": ["довідка"], "response": "Оператор зв'яжеться з вами",
+     "executor": "Оператор", "urgency": "info", "response_time": 48},
+]
+
+
+@pytest.fixture(scope="module")
+def classifier():
+    return QueryClassifier([dict(item) for item in ITEMS])
+
+
+@pytest.mark.parametrize("query, position", [
+    ("м’ясо", 0),
+    ("мʼясо", 0),
+    ("М'ЯСО", 0),
+    ("вул. Шевченка", 1),
+    ("Вул Шевченка!", 1),
+])
+def test_keyword_with_apostrophe_or_punctuation_is_found(query, position):
+    features = KeywordIndex(ITEMS).features(normalize_query(query))
+    assert features[position][0] == 1
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("мʼясо", "meat"),
+    ("вул. Шевченка, ліхтар", "street"),
+])
+def test_classify_exact_keyword_text(classifier, query, expected):
+    result = classifier.classify(query, backend="keyword")
+    assert result.id == expected
+    assert result.confidence > 0.3
+
+
+def test_index_matches_direct_search():
+    index = KeywordIndex(ITEMS)
+    for query in ("м'ясо зіпсоване", "вул шевченка не горить ліхтар", "м'ясо неналежної якості"):
+        expected = {idx: list(keyword_features(query, item)) for idx, item in enumerate(ITEMS)
+                    if any(keyword_features(query, item))}
+        assert index.features(query) == expected
+
+
+@pytest.mark.skipif(not TFIDF_AVAILABLE, reason="TF-IDF бекенд потребує numpy та scipy")
+def test_tfidf_vocabulary_is_normalized(classifier):
+    assert classifier.classify("мʼясо", backend="tfidf").id == "meat"
+
+
+def test_ties_break_by_insertion_order():
+    tied = [dict(ITEMS[2], id=f"tie{i}", problem=problem, subtype="Інше") for i, problem in enumerate(["Я", "Б", "А"])]
+    query_classifier = QueryClassifier(tied)
+    assert query_classifier.snapshot.best_match("довідка")[0]["id"] == "tie0"
+
+    # Оновлена категорія (у дельті) зберігає місце, нова стає в кінець
+    query_classifier.upsert_item(dict(tied[0], response="Оновлено"))
+    query_classifier.upsert_item(dict(tied[2], id="tie3"))
+    assert query_classifier.snapshot.best_match("довідка")[0]["response"] == "Оновлено"
+    assert [item["id"] for item in query_classifier.snapshot.source_items()] == ["tie0", "tie1", "tie2", "tie3"]
+
+    # Повторно додана категорія - як нова
+    query_classifier.remove_item("tie0")
+    query_classifier.upsert_item(tied[0])
+    assert query_classifier.snapshot.best_match("довідка")[0]["id"] == "tie1"
+
+    # Компактування зберігає той самий порядок
+    compacted = query_classifier.snapshot._patched(list(query_classifier.snapshot.delta.items),
+                                                   query_classifier.snapshot.removed,
+                                                   query_classifier.snapshot._sequence, 0)
+    assert [item["id"] for item in compacted.items] == ["tie1", "tie2", "tie3", "tie0"]
+
+
+def test_cache_key_is_normalized_but_original_query_is_classified():
+    query_classifier = QueryClassifier([dict(item) for item in ITEMS])
+    seen = []
+
+    def classify_func(snapshot, texts):
+        seen.extend(texts)
+        return query_classifier._classify_batch(snapshot, texts, "keyword")
+
+    results = query_classifier._classify_cached(["Зіпсований М’ЯСО!", "зіпсований  м'ясо"], "spy", classify_func)
+    assert seen == ["Зіпсований М’ЯСО!"]
+    assert results[0] is results[1]
+    assert results[0].id == "meat"
+
+
+def test_result_dict_reports_backend(classifier):
+    assert classification_to_dict(classifier.classify("ліхтар", backend="keyword"))["backend"] == "keyword"
+
+
+def test_embedding_rebuilds_are_coalesced(monkeypatch):
+    monkeypatch.setattr(settings, "NLU_EMBEDDINGS_ENABLED", True)
+    built = []
+
+    def embeddings(snapshot, previous=None):
+        built.append(snapshot.version)
+        time.sleep(0.2)
+        return object()
+
+    monkeypatch.setattr(ClassifierSnapshot, "embeddings", embeddings)
+    query_classifier = QueryClassifier([dict(item) for item in ITEMS])
+    for i in range(5):
+        query_classifier.upsert_item(dict(ITEMS[2], response=f"Відповідь {i}"))
+    thread = query_classifier._embeddings_thread
+    thread.join(5)
+
+    # Проміжні знімки пропущено: щонайбільше той, що вже будувався, та останній
+    assert len(built) <= 2
+    assert built[-1] == query_classifier.version
+    assert query_classifier._embedded is query_classifier.snapshot
+    assert query_classifier.threads == 0
@@ -0,0 +1,33 @@
+"""
+Адреса з транскрипту: без типу вулиці назва має бути схожою на власну назву
+"""
+import pytest
+
+from location_extractor import SAMPLE_GAZETTEER_PATH, Gazetteer, LocationExtractor
+
+
+@pytest.fixture(scope="module")
+def extractor():
+    return LocationExtractor(Gazetteer.load(SAMPLE_GAZETTEER_PATH))
+
+
+@pytest.mark.parametrize("text", [
+    "дякую за перемоги 5",
+    "Дякую за перемоги 5",
+    "за миру 3 роки нічого не змінилось",
+    "садова 10 років без ремонту",
+])
+def test_common_words_with_numbers_are_not_addresses(extractor, text):
+    assert extractor.extract(text) is None
+
+
+@pytest.mark.parametrize("text, street, building", [
+    ("Хрещатик 5", "Хрещатик", "5"),
+    ("живу на хрещатику 5 квартира 12", "Хрещатик", "5"),
+    ("біля садової 10 прорвало трубу", "Садова", "10"),
+    ("проспект перемоги 7", "Перемоги", "7"),
+])
+def test_addresses_without_ambiguity(extractor, text, street, building):
+    address = extractor.extract(text)
+    assert address is not None
+    assert (address.street, address.building) == (street, building)
@@ -0,0 +1,87 @@
+"""
+Перекласифікація прив'язана до класифікатора тенанта та відбитка його довідника
+"""
+import pytest
+
+from classifier import QueryClassifier
+from reclassification import STATUS_CANCELLED, STATUS_COMPLETED, ReclassificationJob
+from storage import CallRecordCreate, StorageService
+
+ITEMS = [
+    {"id": "water", "problem": "Водопостачання", "type": "Вода", "subtype": "Немає води",
+     "keywords": ["вода", "водопостачання"], "response": "Заявку передано",
+     "executor": "Водоканал", "urgency": "short", "response_time": 8},
+    {"id": "light", "problem": "Електропостачання", "type": "Світло", "subtype": "Немає світла",
+     "keywords": ["світло", "світла", "електрика"], "response": "Заявку передано",
+     "executor": "Обленерго", "urgency": "short", "response_time": 8},
+]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = StorageService(str(tmp_path / "tenant.db"))
+    store.create_call_records([CallRecordCreate(transcript=f"немає світла {i}") for i in range(5)])
+    yield store
+    store.close()
+
+
+def test_fingerprint_depends_on_content_not_process_version():
+    first = QueryClassifier([dict(item) for item in ITEMS])
+    second = QueryClassifier([dict(item) for item in reversed(ITEMS)])
+    assert first.version != second.version
+    assert first.snapshot.fingerprint() == second.snapshot.fingerprint()
+
+    changed = dict(ITEMS[0], executor="Інший виконавець")
+    second.upsert_item(changed)
+    assert first.snapshot.fingerprint() != second.snapshot.fingerprint()
+
+
+def test_job_uses_tenant_classifier(store):
+    query_classifier = QueryClassifier([dict(item) for item in ITEMS])
+    job = ReclassificationJob(store, lambda: query_classifier)
+    job.start()
+    job.wait(10)
+
+    progress = job.progress()
+    assert progress["status"] == STATUS_COMPLETED
+    assert progress["changed"] == 5
+    assert progress["reference_fingerprint"] == query_classifier.snapshot.fingerprint()
+    assert not progress["stale"]
+    assert {row["executor"] for row in store.get_call_history(limit=10)} == {"Обленерго"}
+
+
+def test_resume_after_reference_change_starts_over(store):
+    query_classifier = QueryClassifier([dict(item) for item in ITEMS])
+    job = ReclassificationJob(store, lambda: query_classifier)
+    unfinished = {
+        "id": "old", "status": STATUS_CANCELLED, "reference_fingerprint": "інший довідник",
+        "cursor_timestamp": "9999", "cursor_id": "z", "processed": 5, "changed": 0, "total": 5,
+        "started_at": "2026-01-01T00:00:00",
+    }
+    store.save_reclassification_job(unfinished)
+    # Новий екземпляр (як після перезапуску) бачить застарілу задачу
+    assert ReclassificationJob(store, lambda: query_classifier).progress()["stale"]
+
+    job.start(resume=True)
+    job.wait(10)
+    progress = job.progress()
+    assert progress["id"] != "old"
+    assert progress["processed"] == 5
+    assert progress["changed"] == 5
+    assert not progress["stale"]
+
+
+def test_records_without_timestamp_are_reclassified(tmp_path):
+    store = StorageService(str(tmp_path / "nulls.db"))
+    store.create_call_records([CallRecordCreate(transcript=f"немає світла {i}", timestamp=None) for i in range(3)]
+                              + [CallRecordCreate(transcript="немає світла", timestamp="2024-01-01T10:00:00")])
+    query_classifier = QueryClassifier([dict(item) for item in ITEMS])
+    job = ReclassificationJob(store, lambda: query_classifier)
+    job.start()
+    job.wait(10)
+
+    assert job.progress()["processed"] == 4
+    assert {row["executor"] for row in store.get_call_history(limit=10)} == {"Обленерго"}
+    # Експорт також не пропускає записи без timestamp
+    assert sum(len(batch) for batch in store.export_call_history(batch_size=2)) == 4
+    store.close()
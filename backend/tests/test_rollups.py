@@ -0,0 +1,96 @@
+"""
+Часові ряди з агрегатів call_rollups збігаються з агрегацією історії
+"""
+from collections import defaultdict
+
+import pytest
+
+from storage import CallRecordCreate, StorageService
+
+CATEGORIES = [("water", "short", "Водоканал"), ("heat", "standard", "Теплоенерго"), ("light", "emergency", "Обленерго")]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = StorageService(str(tmp_path / "rollups.db"))
+    records = []
+    for i in range(40):
+        category, urgency, executor = CATEGORIES[i % 3]
+        records.append(CallRecordCreate(
+            transcript=f"дзвінок {i}",
+            timestamp=f"2024-06-{1 + i % 3:02d}T{8 + i % 5:02d}:{i % 2 * 30:02d}:00",
+            classification={"id": category, "urgency": urgency},
+            status="escalated" if i % 4 == 0 else "resolved",
+            executor=executor,
+        ))
+    # Некоректна класифікація не ламає агрегати
+    records.append(CallRecordCreate(transcript="зламаний", timestamp="2024-06-02T09:00:00",
+                                    classification=None, status="resolved"))
+    store.create_call_records(records)
+    yield store
+    store.close()
+
+
+def _expected(store: StorageService, interval: str, group_by=None):
+    """Той самий ряд перебором історії"""
+    length = StorageService.ROLLUP_BUCKETS[interval]
+    totals = defaultdict(lambda: [0, 0])
+    for row in store.get_call_history(limit=1000):
+        classification = row["classification"] or {}
+        group = {"category": classification.get("id"), "urgency": classification.get("urgency"),
+                 "executor": row["executor"]}.get(group_by) or ""
+        key = (row["timestamp"][:length], group)
+        totals[key][0] += 1
+        totals[key][1] += row["status"] == "escalated"
+    points = []
+    for (bucket, group), (calls, escalated) in sorted(totals.items()):
+        point = {"bucket": bucket}
+        if group_by:
+            point["group"] = group
+        point.update({"calls": calls, "escalated": escalated, "escalation_rate": round(escalated / calls, 4)})
+        points.append(point)
+    return points
+
+
+def _series(store: StorageService, interval: str, group_by=None):
+    return store.get_call_timeseries("2024-06-01", "2024-07-01", interval=interval, group_by=group_by)
+
+
+@pytest.mark.parametrize("interval", ["minute", "hour", "day"])
+@pytest.mark.parametrize("group_by", [None, "category", "urgency", "executor"])
+def test_timeseries_matches_history(store, interval, group_by):
+    assert _series(store, interval, group_by) == _expected(store, interval, group_by)
+
+
+def test_updates_and_deletes_move_calls_between_buckets(store):
+    rows = store.get_call_history(limit=5)
+    store.update_call_classifications([
+        {"id": row["id"], "classification": {"id": "light", "urgency": "emergency"},
+         "status": "escalated", "executor": "Обленерго"}
+        for row in rows
+    ])
+    with store._connection() as conn:
+        conn.execute("UPDATE call_history SET timestamp = '2024-06-03T23:59:00' WHERE transcript = 'дзвінок 1'")
+        conn.execute("DELETE FROM call_history WHERE transcript LIKE 'дзвінок 2%'")
+
+    for group_by in (None, "category", "executor"):
+        for interval in ("minute", "day"):
+            assert _series(store, interval, group_by) == _expected(store, interval, group_by)
+
+
+def test_range_and_validation(store):
+    day = store.get_call_timeseries("2024-06-02T12:00:00", "2024-06-03", interval="day")
+    # Початок округлюється до інтервалу, кінець не включно
+    assert [point["bucket"] for point in day] == ["2024-06-02"]
+    with pytest.raises(ValueError):
+        store.get_call_timeseries("2024-06-01", "2024-07-01", interval="week")
+    with pytest.raises(ValueError):
+        store.get_call_timeseries("2024-06-01", "2024-07-01", group_by="status")
+
+
+def test_pruning_minutes_keeps_hours_and_days(store):
+    hours, days = _series(store, "hour"), _series(store, "day")
+    assert store.delete_minute_rollups("2024-06-02") > 0
+    assert [point["bucket"][:10] for point in _series(store, "minute")][0] == "2024-06-02"
+    assert _series(store, "hour") == hours
+    assert _series(store, "day") == days
@@ -0,0 +1,81 @@
+"""
+Повнотекстовий пошук історії (FTS5): форми слів, фрагменти та синхронізація з історією
+"""
+import pytest
+
+from storage import SEARCH_SNIPPET, CallRecordCreate, StorageService, build_search_query
+
+OPEN, CLOSE, _ = SEARCH_SNIPPET
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = StorageService(str(tmp_path / "search.db"))
+    store.create_call_records([
+        CallRecordCreate(transcript="На вулиці впали дерева на машини", timestamp="2024-07-01T10:00:00",
+                         response_text="Комунальна служба прибере дерево", status="resolved"),
+        CallRecordCreate(transcript="дерево впало на машину біля школи", timestamp="2024-07-02T10:00:00",
+                         status="escalated"),
+        CallRecordCreate(transcript="немає м’яса в магазині", timestamp="2024-07-03T10:00:00", status="resolved"),
+        CallRecordCreate(transcript="деревообробний цех шумить", timestamp="2024-07-04T10:00:00", status="resolved"),
+    ])
+    yield store
+    store.close()
+
+
+def _transcripts(store: StorageService, query: str, **kwargs):
+    ids = {row["id"] for row in store.search_call_history(query, **kwargs)}
+    return {row["transcript"] for row in store.get_call_history(limit=100) if row["id"] in ids}
+
+
+def test_word_forms_match_without_prefix_noise(store):
+    assert _transcripts(store, "дерево впало на машину") == {
+        "На вулиці впали дерева на машини", "дерево впало на машину біля школи",
+    }
+
+
+def test_apostrophes_and_fts_syntax_in_query(store):
+    assert _transcripts(store, "м'ясо") == {"немає м’яса в магазині"}
+    # Оператори FTS5 у тексті користувача - звичайні слова
+    assert build_search_query('дерево" OR NOT "школи').count('"дерево"') == 1
+    assert store.search_call_history('"') == []
+
+
+def test_phrase_filters_and_order(store):
+    assert _transcripts(store, "впало на машину", phrase=True) == {"дерево впало на машину біля школи"}
+    assert _transcripts(store, "дерево", status="escalated") == {"дерево впало на машину біля школи"}
+    assert _transcripts(store, "дерево", start="2024-07-02") == {"дерево впало на машину біля школи"}
+
+    recent = store.search_call_history("дерево", order="recent")
+    assert [row["timestamp"] for row in recent] == ["2024-07-02T10:00:00", "2024-07-01T10:00:00"]
+    assert all(row["score"] is None for row in recent)
+    assert all(row["score"] is not None for row in store.search_call_history("дерево"))
+    with pytest.raises(ValueError):
+        store.search_call_history("дерево", order="oldest")
+
+
+def test_snippets_mark_matches(store):
+    row = next(row for row in store.search_call_history("дерево") if row["timestamp"].startswith("2024-07-01"))
+    assert f"{OPEN}дерева{CLOSE}" in row["transcript_snippet"]
+    assert f"{OPEN}дерево{CLOSE}" in row["response_snippet"]
+
+
+def test_index_follows_updates_and_deletes(store):
+    with store._connection() as conn:
+        conn.execute("UPDATE call_history SET transcript = 'прорвало трубу' WHERE transcript LIKE 'дерево%'")
+        conn.execute("UPDATE call_history SET response_text = 'Бригаду направлено' WHERE transcript LIKE 'На вулиці%'")
+    assert _transcripts(store, "дерево") == {"На вулиці впали дерева на машини"}
+    assert _transcripts(store, "труба") == {"прорвало трубу"}
+    assert _transcripts(store, "бригада") == {"На вулиці впали дерева на машини"}
+
+    with store._connection() as conn:
+        conn.execute("DELETE FROM call_history WHERE transcript = 'прорвало трубу'")
+    assert _transcripts(store, "труба") == set()
+    # Індекс збігається з історією (інакше SQLite кидає помилку)
+    with store._connection() as conn:
+        conn.execute("INSERT INTO call_history_fts(call_history_fts) VALUES ('integrity-check')")
+
+
+def test_search_reads_archived_months(store):
+    assert store.archive_call_history("2024-08", batch_size=1) == {"2024-07": 4}
+    assert len(store.search_call_history("дерево впало на машину")) == 2
@@ -0,0 +1,70 @@
+"""
+Витіснення тенантів: простоюючі закриваються, зайняті лише вивантажуються
+"""
+import threading
+
+import pytest
+
+from config import settings
+from storage import StorageService
+from tenants import Tenant, TenantRegistry
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "TENANT_IDS", "first,second")
+    monkeypatch.setattr(settings, "TENANT_IDLE_SECONDS", 0)
+    default = Tenant("default", StorageService(str(tmp_path / "default.db")))
+    registry = TenantRegistry(default, str(tmp_path / "tenants"), budget_bytes=0)
+    yield registry
+    registry.close()
+
+
+def test_idle_tenant_is_closed_and_dropped(registry):
+    first = registry.get("first")
+    assert first.memory_bytes() > 0  # з'єднання та потоки входять в оцінку
+
+    registry.get("second")
+    assert registry.closed == 1
+    assert [tenant["id"] for tenant in registry.stats()["tenants"]] == ["default", "second"]
+    for thread in threading.enumerate():
+        if thread.name == "tenant-close-first":
+            thread.join(5)
+    assert first.threads() == 0
+    # Наступний запит створює тенант заново
+    assert registry.get("first") is not first
+
+
+def test_tenant_with_session_is_only_unloaded(registry):
+    first = registry.get("first")
+    first.sessions = 1
+    assert first.classifier is not None
+    assert first.loaded
+
+    registry.get("second")
+    assert registry.closed == 0
+    assert registry.evictions == 1
+    assert not first.loaded
+    assert registry.get("first") is first
+
+
+def test_budget_uses_cached_estimates(registry, monkeypatch):
+    first = registry.get("first")
+    estimate = first.memory_estimate
+    assert estimate > 0
+
+    calls = []
+    monkeypatch.setattr(first, "memory_bytes", lambda: calls.append(1) or estimate)
+    first.sessions = 1
+    registry.get("first")
+    assert calls == []
+
+
+def test_tenant_access_requires_its_key(registry, monkeypatch):
+    monkeypatch.setattr(settings, "TENANT_API_KEYS", "first:secret, second:")
+    assert registry.has_access(None, "")
+    assert registry.has_access("default", "")
+    assert registry.has_access("first", "secret")
+    assert not registry.has_access("first", "wrong")
+    # Тенант без ключа - лише для адміністратора
+    assert not registry.has_access("second", "")
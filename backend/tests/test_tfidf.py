@@ -0,0 +1,58 @@
+"""
+TF-IDF бекенд: символьні n-грами, косинусна схожість та поріг TFIDF_MIN_SIMILARITY
+"""
+import pytest
+
+from classifier import TFIDF_AVAILABLE, QueryClassifier, TfidfBackend
+from config import settings
+
+pytestmark = pytest.mark.skipif(not TFIDF_AVAILABLE, reason="TF-IDF бекенд потребує numpy та scipy")
+
+ITEMS = [
+    {"id": "water", "problem": "Водопостачання", "type": "Вода", "subtype": "Немає води",
+     "keywords": ["вода", "водопостачання"], "response": "Заявку передано",
+     "executor": "Водоканал", "urgency": "short", "response_time": 8},
+    {"id": "heat", "problem": "Теплопостачання", "type": "Опалення", "subtype": "Холодні батареї",
+     "keywords": ["опалення", "батареї"], "response": "Заявку передано",
+     "executor": "Теплоенерго", "urgency": "short", "response_time": 8},
+]
+
+
+def test_similarity_is_cosine():
+    backend = TfidfBackend(ITEMS)
+    sims = backend.similarities([TfidfBackend._category_text(ITEMS[0]), "опалення батареї"])
+    assert sims.shape == (2, 2)
+    assert sims[0, 0] == pytest.approx(1.0)
+    assert 0.0 <= sims.min() and sims.max() <= 1.0 + 1e-9
+    assert sims[1, 1] > sims[1, 0]
+
+
+def test_typos_and_forms_match_by_ngrams():
+    backend = TfidfBackend(ITEMS)
+    matches = backend.best_matches(["немає водопостачаня", "холодні батареях"])
+    assert [idx for idx, _ in matches] == [0, 1]
+
+
+def test_empty_reference_has_no_match():
+    assert TfidfBackend([]).best_matches(["вода"]) == [(-1, 0.0)]
+
+
+def test_threshold_sends_weak_matches_to_operator(monkeypatch):
+    query_classifier = QueryClassifier([dict(item) for item in ITEMS])
+    query = "немає водопостачаня"
+    similarity = TfidfBackend(ITEMS).best_matches([query])[0][1]
+
+    monkeypatch.setattr(settings, "TFIDF_MIN_SIMILARITY", similarity - 0.01)
+    result = query_classifier.classify(query, backend="tfidf")
+    assert (result.id, result.needs_operator, result.backend) == ("water", False, "tfidf")
+    assert result.confidence == pytest.approx(min(0.95, 0.5 + similarity / 2))
+
+    monkeypatch.setattr(settings, "TFIDF_MIN_SIMILARITY", similarity + 0.01)
+    query_classifier.cache.clear()
+    assert query_classifier.classify(query, backend="tfidf").needs_operator
+
+
+def test_unrelated_query_is_below_threshold(monkeypatch):
+    monkeypatch.setattr(settings, "TFIDF_MIN_SIMILARITY", 0.2)
+    query_classifier = QueryClassifier([dict(item) for item in ITEMS])
+    assert query_classifier.classify("коли буде концерт", backend="tfidf").needs_operator
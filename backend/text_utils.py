@@ -0,0 +1,77 @@
+"""
+Нормалізація тексту запитів
+Спільні правила для кешу класифікатора та пошуку
+"""
+import re
+import unicodedata
+
+
+# Варіанти апострофа, що зустрічаються в українських текстах та після ASR
+APOSTROPHES = "'’‘ʼʹ`´′＇"
+_APOSTROPHE_TABLE = str.maketrans({char: "'" for char in APOSTROPHES})
+
+# Усе, крім літер, цифр, апострофа та дефіса, вважається розділювачем
+_SEPARATOR_RE = re.compile(r"[^\w'\-]+|_+")
+# Апостроф і дефіс значущі лише всередині слова
+_EDGE_RE = re.compile(r"(?<!\w)['\-]+|['\-]+(?!\w)")
+
+
+def normalize_apostrophes(text: str) -> str:
+    """Звести всі варіанти апострофа до U+0027"""
+    return text.translate(_APOSTROPHE_TABLE)
+
+
+def normalize_query(text: str) -> str:
+    """
+    Канонічна форма запиту
+
+    NFKC, casefold, єдиний апостроф, пунктуація замінюється пробілами,
+    пробіли згортаються. "Немає  опалення!!!" і "немає опалення" дають
+    однаковий результат.
+    """
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = normalize_apostrophes(text)
+    text = _SEPARATOR_RE.sub(" ", text)
+    text = _EDGE_RE.sub(" ", text)
+    return " ".join(text.split())
+
+
+# Закінчення відмінків іменників та прикметників (довші перевіряються першими)
+_UK_ENDINGS = sorted([
+    "ями", "ами", "ові", "еві", "єві", "ого", "ому", "ими", "іми", "ої", "ою", "ею", "єю",
+    "ах", "ях", "ам", "ям", "ом", "ем", "єм", "ів", "їв", "ий", "ій", "их", "ьої", "ьою",
+    "а", "я", "у", "ю", "і", "ї", "е", "є", "о", "и", "ь",
+], key=len, reverse=True)
+
+UK_MIN_STEM = 3
+
+
+def stem_uk(word: str) -> str:
+    """
+    Легкий стемер для українських назв: відкидає закінчення відмінка
+
+    Не повний морфологічний аналіз - достатньо, щоб "Шевченка",
+    "Шевченку" та "Шевченко" або "Соборна" і "Соборній" давали одну
+    основу. Основа не коротша за UK_MIN_STEM літер.
+    """
+    word = normalize_apostrophes(word.casefold())
+    for ending in _UK_ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= UK_MIN_STEM:
+            return word[:-len(ending)]
+    return word
+
+
+def uk_word_forms(word: str) -> list:
+    """
+    Словоформи з тією ж основою, що й слово (stem_uk)
+
+    Основа та основа з кожним закінченням зі списку - усі слова, які
+    stem_uk зводить до цієї основи ("вулиця" -> "вулиц", "вулиці",
+    "вулицю", ...). Для коротких слів - лише саме слово.
+    """
+    word = normalize_apostrophes(word.casefold())
+    stem = stem_uk(word)
+    if len(word) < UK_MIN_STEM:
+        return [word]
+    return list(dict.fromkeys([word, stem] + [stem + ending for ending in _UK_ENDINGS]))
+
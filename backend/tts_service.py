@@ -3,12 +3,10 @@ TTS Service - Text-to-Speech для української мови
 Підтримує: Edge TTS (Microsoft), Fish Speech (GPU)
 """
 import asyncio
-import io
-import wave
-import tempfile
-import os
 from typing import Tuple
 
+from audio_buffer import AudioBuffer
+
 # Спроба імпорту edge-tts (основний TTS без GPU)
 try:
     import edge_tts
@@ -74,6 +72,20 @@ class TTSService:
         Returns:
             Tuple[bytes, int]: (MP3/WAV байти, sample rate)
         """
+        audio = self.synthesize_audio(text, voice)
+        return audio.tobytes(), audio.sample_rate
+    
+    def synthesize_audio(self, text: str, voice: str = "default") -> AudioBuffer:
+        """
+        Синтез мовлення з тексту у AudioBuffer
+        
+        Args:
+            text: Текст українською мовою
+            voice: Голос (female, male, default)
+            
+        Returns:
+            AudioBuffer: закодоване аудіо (MP3 або WAV) з sample rate
+        """
         # Пріоритет 1: Fish Speech (якщо є GPU)
         if self.fish_speech_model is not None:
             try:
@@ -90,9 +102,9 @@ class TTSService:
         
         # Fallback: генерація тиші
         print("[TTS] Жоден TTS движок не доступний!")
-        return self._generate_silence(), self.sample_rate
+        return self._generate_silence()
     
-    def _synthesize_edge_tts(self, text: str, voice: str = "default") -> Tuple[bytes, int]:
+    def _synthesize_edge_tts(self, text: str, voice: str = "default") -> AudioBuffer:
         """Синтез через Microsoft Edge TTS"""
         import concurrent.futures
         
@@ -103,28 +115,24 @@ class TTSService:
             async def _generate():
                 communicate = edge_tts.Communicate(text, voice_name)
                 
-                with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as tmp:
-                    tmp_path = tmp.name
-                
-                await communicate.save(tmp_path)
-                
-                with open(tmp_path, "rb") as f:
-                    audio_bytes = f.read()
-                
-                os.unlink(tmp_path)
-                return audio_bytes
+                # Збираємо MP3 фрагменти у пам'яті, без тимчасового файлу
+                audio_data = bytearray()
+                async for chunk in communicate.stream():
+                    if chunk["type"] == "audio":
+                        audio_data += chunk["data"]
+                return audio_data
             
             return asyncio.run(_generate())
         
         # Запускаємо в окремому потоці, щоб уникнути конфлікту event loop
         with concurrent.futures.ThreadPoolExecutor() as executor:
             future = executor.submit(_run_in_thread)
-            audio_bytes = future.result(timeout=30)
+            audio_data = future.result(timeout=30)
         
         print(f"[TTS] Edge TTS синтезував: {text[:50]}...")
-        return audio_bytes, self.sample_rate
+        return AudioBuffer.from_bytes(audio_data, format="mp3", sample_rate=self.sample_rate)
     
-    def _synthesize_fish_speech(self, text: str, voice: str = "default") -> Tuple[bytes, int]:
+    def _synthesize_fish_speech(self, text: str, voice: str = "default") -> AudioBuffer:
         """Синтез через Fish Speech (GPU)"""
         audio = self.fish_speech_model.synthesize(
             text=text,
@@ -132,43 +140,17 @@ class TTSService:
             language="uk"
         )
         
-        wav_bytes = self._audio_to_wav(audio)
+        wav = self._audio_to_wav(audio)
         print(f"[TTS] Fish Speech синтезував: {text[:50]}...")
-        return wav_bytes, 44100
+        return wav
     
-    def _audio_to_wav(self, audio) -> bytes:
+    def _audio_to_wav(self, audio) -> AudioBuffer:
         """Конвертація numpy array в WAV"""
-        import numpy as np
-        buffer = io.BytesIO()
-        
-        with wave.open(buffer, 'wb') as wav_file:
-            wav_file.setnchannels(1)
-            wav_file.setsampwidth(2)
-            wav_file.setframerate(44100)
-            
-            audio_normalized = np.clip(audio, -1.0, 1.0)
-            audio_int16 = (audio_normalized * 32767).astype(np.int16)
-            wav_file.writeframes(audio_int16.tobytes())
-        
-        buffer.seek(0)
-        return buffer.read()
+        return AudioBuffer.from_array(audio, sample_rate=44100).encode_wav()
     
-    def _generate_silence(self) -> bytes:
+    def _generate_silence(self) -> AudioBuffer:
         """Генерація тихого аудіо як fallback"""
-        import numpy as np
-        duration = 1.0
-        num_samples = int(self.sample_rate * duration)
-        audio = np.zeros(num_samples, dtype=np.int16)
-        
-        buffer = io.BytesIO()
-        with wave.open(buffer, 'wb') as wav_file:
-            wav_file.setnchannels(1)
-            wav_file.setsampwidth(2)
-            wav_file.setframerate(self.sample_rate)
-            wav_file.writeframes(audio.tobytes())
-        
-        buffer.seek(0)
-        return buffer.read()
+        return AudioBuffer.silence(1.0, self.sample_rate).encode_wav()
     
     def get_available_voices(self) -> dict:
         """Отримати список доступних голосів"""
@@ -187,12 +169,17 @@ def synthesize_speech(text: str, voice: str = "default") -> Tuple[bytes, int]:
     return tts_service.synthesize(text, voice)
 
 
+def synthesize_speech_buffer(text: str, voice: str = "default") -> AudioBuffer:
+    """Синтезувати мовлення з тексту у AudioBuffer"""
+    return tts_service.synthesize_audio(text, voice)
+
+
 def synthesize_to_file(text: str, output_path: str, voice: str = "default") -> bool:
     """Синтезувати мовлення та зберегти у файл"""
     try:
-        audio_bytes, _ = tts_service.synthesize(text, voice)
+        audio = tts_service.synthesize_audio(text, voice)
         with open(output_path, 'wb') as f:
-            f.write(audio_bytes)
+            audio.write_to(f)
         return True
     except Exception as e:
         print(f"[TTS] Помилка збереження: {e}")